@@ -0,0 +1,72 @@
+"""Shared set-up for the benchmark scripts.
+
+Boots Django with the project settings against a throwaway test
+database and shared cache, so benchmarks never touch ``db.sqlite3``
+or cached pages.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent / 'blogicum'
+
+
+def setup_django(database_file=None):
+    """Boot Django; the test database is kept in memory by default."""
+    sys.path.insert(0, str(PROJECT_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blogicum.settings')
+
+    import django
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    if database_file is not None:
+        settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = (
+            str(database_file)
+        )
+    settings.DEBUG = False
+    settings.METRICS_DIR = tempfile.mkdtemp(prefix='blogicum-metrics-')
+    settings.CACHES['shared']['LOCATION'] = Path(
+        tempfile.mkdtemp(prefix='blogicum-cache-')
+    ) / 'cache.sqlite3'
+    settings.INVALIDATION_BUS = {
+        **settings.INVALIDATION_BUS,
+        'OPTIONS': {'path': Path(settings.METRICS_DIR) / 'changes.sqlite3'},
+    }
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def seed_posts(n_posts, comments_per_post=0, text_words=300):
+    """Create ``n_posts`` visible posts with comments and return them."""
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from blog.models import Category, Comment, Location, Post
+
+    author = User.objects.create_user('bench_author', password='bench')
+    category = Category.objects.create(
+        title='Bench', description='Bench', slug='bench'
+    )
+    location = Location.objects.create(name='Bench')
+    now = timezone.now()
+    text = ' '.join(['lorem'] * text_words)
+    Post.objects.bulk_create(
+        Post(
+            title=f'Post {i}', text=text, author=author, category=category,
+            location=location, pub_date=now - timezone.timedelta(minutes=i),
+            comments_count=comments_per_post,
+        )
+        for i in range(n_posts)
+    )
+    # SQLite does not return primary keys from bulk_create().
+    posts = list(Post.objects.order_by('-pub_date'))
+    Comment.objects.bulk_create(
+        Comment(post=post, author=author, text='Comment ' * 20)
+        for post in posts
+        for _ in range(comments_per_post)
+    )
+    return posts
@@ -0,0 +1,125 @@
+"""Measure cache hit latencies per tier and the local hit ratio.
+
+Usage: python benchmarks/cache_tiers.py [--repeat N] [--keys N]
+    [--local-size BYTES]
+
+Gets are timed for values the size of a scope version, a post card and
+a whole page: from the memory of the process, from the shared cache
+after a local miss, straight from the shared cache and, for reference,
+from Django's local memory cache. A skewed stream of gets over
+``--keys`` pages then shows how often the local tier answers when it
+holds only part of them, and what it evicted.
+"""
+import argparse
+import random
+import time
+
+from bootstrap import setup_django
+
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, percent):
+    """Return the nearest-rank percentile of ``sorted_values``."""
+    rank = max(1, round(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def values():
+    from django.http import HttpResponse
+
+    return {
+        'version': time.time_ns(),
+        'card': 'x' * 2000,
+        'page': HttpResponse('x' * 30000),
+    }
+
+
+def time_gets(cache, key, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cache.get(key)
+        timings.append((time.perf_counter() - started) * 10 ** 6)
+    timings.sort()
+    return [percentile(timings, percent) for percent in PERCENTILES]
+
+
+def tiers():
+    from django.core.cache import caches
+    from django.core.cache.backends.locmem import LocMemCache
+
+    from blog.cache_backends import TieredCache
+
+    return {
+        'local': TieredCache('bench-local', {}),
+        # Nothing fits in the process: every get reads the shared cache.
+        'shared via tier': TieredCache(
+            'bench-shared', {'OPTIONS': {'MAX_SIZE': 0}}
+        ),
+        'shared': caches['shared'],
+        'locmem': LocMemCache('bench-locmem', {}),
+    }
+
+
+def skewed_gets(keys, local_size, repeat, seed):
+    from blog.cache_backends import TieredCache
+
+    cache = TieredCache('bench-skewed', {'OPTIONS': {
+        'MAX_SIZE': local_size, 'MAX_ENTRY_SIZE': local_size,
+    }})
+    page = 'x' * 30000
+    cache.set_many({f'page:{number}': page for number in range(keys)})
+    cache._local.clear()
+    cache._local.stats.clear()
+    generator = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    started = time.perf_counter()
+    for number in generator.choices(range(keys), weights, k=repeat):
+        cache.get(f'page:{number}')
+    return cache.stats(), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5000)
+    parser.add_argument('--keys', type=int, default=2000)
+    parser.add_argument(
+        '--local-size', type=int, default=16 * 1024 * 1024,
+        help='Bytes kept in the process for the skewed gets.'
+    )
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.core.cache import cache
+
+    cache.clear()
+    print(f'{"tier":<18}{"value":<10}' + ''.join(
+        f'{f"p{percent} us":>10}' for percent in PERCENTILES
+    ))
+    for name, tier in tiers().items():
+        for kind, value in values().items():
+            tier.set(f'bench:{kind}', value, None)
+            timings = time_gets(tier, f'bench:{kind}', args.repeat)
+            print(f'{name:<18}{kind:<10}' + ''.join(
+                f'{timing:>10.1f}' for timing in timings
+            ))
+
+    stats, elapsed = skewed_gets(
+        args.keys, args.local_size, args.repeat, args.seed
+    )
+    hits = stats.get('local_hits', 0)
+    print(
+        f'\n{args.repeat} skewed gets over {args.keys} pages of 30 KB with '
+        f'{args.local_size // 1024} KB in the process: '
+        f'{hits / args.repeat:.1%} local hits, '
+        f'{args.repeat / elapsed:.0f} gets/s'
+    )
+    for name, count in sorted(stats.items()):
+        print(f'  {name:<20}{count:>10}')
+    cache.clear()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Compare full page responses with 304 answers to conditional GETs.
+
+Usage: python benchmarks/conditional_get.py [--posts N] [--repeat N]
+"""
+import argparse
+import time
+
+from bootstrap import seed_posts, setup_django
+
+
+def measure(client, url, repeat, **headers):
+    from django.core.cache import cache
+
+    size = 0
+    started = time.process_time()
+    for _ in range(repeat):
+        if not headers:
+            # Unconditional requests are measured with a cold page cache.
+            cache.clear()
+        response = client.get(url, **headers)
+        size += len(response.content)
+    elapsed = time.process_time() - started
+    return response.status_code, size / repeat, elapsed / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=200)
+    parser.add_argument('--comments', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+
+    post = seed_posts(args.posts, args.comments)[0]
+    client = Client()
+    urls = (
+        '/',
+        f'/posts/{post.id}/',
+        f'/category/{post.category.slug}/',
+        f'/profile/{post.author.username}/',
+    )
+    print(f'{"url":<28}{"status":>7}{"bytes":>10}{"cpu ms":>10}')
+    for url in urls:
+        full = measure(client, url, args.repeat)
+        etag = client.get(url)['ETag']
+        conditional = measure(
+            client, url, args.repeat, HTTP_IF_NONE_MATCH=etag
+        )
+        for status, size, cpu in (full, conditional):
+            print(f'{url:<28}{status:>7}{size:>10.0f}{cpu:>10.2f}')
+        print(
+            f'{"":<28}saved {full[1] - conditional[1]:.0f} bytes and '
+            f'{full[2] - conditional[2]:.2f} ms of CPU per request'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Compare full-text search with the ``icontains`` scans it replaces.
+
+Usage: python benchmarks/search.py [--posts N] [--repeat N]
+
+Seeding a million posts takes a few minutes; pass a smaller ``--posts``
+for a quick run.
+"""
+import argparse
+import itertools
+import random
+import time
+
+from bootstrap import setup_django
+
+BATCH_SIZE = 10000
+
+
+def seed_search_posts(n_posts, words_per_post, vocabulary_size, seed=0):
+    """Create posts whose words follow a Zipf-like distribution."""
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from blog.models import Category, Post
+
+    rng = random.Random(seed)
+    # Words of equal length, so that no word is a substring of another.
+    vocabulary = [f'w{i:06d}' for i in range(vocabulary_size)]
+    weights = list(itertools.accumulate(
+        1 / rank for rank in range(1, vocabulary_size + 1)
+    ))
+    author = User.objects.create_user('bench_author', password='bench')
+    category = Category.objects.create(
+        title='Bench', description='Bench', slug='bench'
+    )
+    now = timezone.now()
+    for start in range(0, n_posts, BATCH_SIZE):
+        Post.objects.bulk_create(
+            Post(
+                title=' '.join(
+                    rng.choices(vocabulary, cum_weights=weights, k=5)
+                ),
+                text=' '.join(
+                    rng.choices(
+                        vocabulary, cum_weights=weights, k=words_per_post
+                    )
+                ),
+                author=author, category=category,
+                pub_date=now - timezone.timedelta(minutes=i),
+            )
+            for i in range(start, min(start + BATCH_SIZE, n_posts))
+        )
+    return vocabulary
+
+
+def measure(run, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = run()
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--words', type=int, default=60)
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db.models import Q
+
+    from blog.constants import POSTS_LIMIT
+    from blog.search import search_posts
+    from blog.views import get_base_post_queryset
+
+    started = time.perf_counter()
+    vocabulary = seed_search_posts(args.posts, args.words, args.vocabulary)
+    elapsed = time.perf_counter() - started
+    print(f'seeded {args.posts} posts in {elapsed:.0f} s')
+
+    queries = {
+        'common word': vocabulary[0],
+        'mid word': vocabulary[100],
+        'rare word': vocabulary[-1],
+        'two words': f'{vocabulary[10]} {vocabulary[1000]}',
+    }
+    posts = get_base_post_queryset().defer('text', 'text_html')
+
+    def icontains(query):
+        matches = posts
+        for term in query.split():
+            matches = matches.filter(
+                Q(title__icontains=term) | Q(text__icontains=term)
+            )
+        return matches
+
+    print(f'{"query":<14}{"engine":<11}{"matches":>9}{"count ms":>11}'
+          f'{"page ms":>10}')
+    for label, query in queries.items():
+        for engine, matches in (
+            ('icontains', icontains(query)),
+            ('fts5', search_posts(posts, query)),
+        ):
+            count, count_ms = measure(matches.count, args.repeat)
+            _, page_ms = measure(
+                lambda: list(matches[:POSTS_LIMIT]), args.repeat
+            )
+            print(f'{label:<14}{engine:<11}{count:>9}{count_ms:>11.1f}'
+                  f'{page_ms:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
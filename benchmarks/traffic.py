@@ -0,0 +1,519 @@
+"""Drive a mix of page views and form posts and report latencies.
+
+Usage:
+    python benchmarks/traffic.py [--mix NAME | --mix feed=4,comment=1]
+        [--requests N] [--save results.json] [--baseline results.json]
+    python benchmarks/traffic.py --url http://127.0.0.1:8000
+        --username NAME --password SECRET [--concurrency N]
+
+Without ``--url`` the WSGI application runs in this process against a
+throwaway database filled by ``generate_data``; requests then run one
+at a time. With ``--url`` the requests go to a running server, which
+should hold data already, from as many threads as ``--concurrency``.
+
+Every request goes through the whole stack, middleware and CSRF checks
+included. Latencies are wall-clock times until the body has been read.
+A stored ``--baseline`` is compared with the new results; with
+``--max-regression`` the script exits with status 1 when the p95 of any
+action grows by more than that many percent.
+"""
+import argparse
+import http.client
+import io
+import json
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.cookies import SimpleCookie
+from pathlib import Path
+from urllib.parse import urlencode, urlsplit
+from uuid import uuid4
+
+from bootstrap import setup_django
+
+PERCENTILES = (50, 95, 99)
+FEED_PAGES = 5
+
+# Named mixes of actions and their weights. Actions whose names end in
+# ``_user`` and the form posts are sent by logged-in users.
+MIXES = {
+    'anonymous': {
+        'feed': 40, 'detail': 35, 'category': 10, 'profile': 10, 'page': 5,
+    },
+    'logged-in': {
+        'feed_user': 35, 'detail_user': 35, 'profile_user': 10,
+        'comment': 15, 'upload': 5,
+    },
+    'mixed': {
+        'feed': 30, 'detail': 25, 'category': 8, 'profile': 7, 'page': 5,
+        'feed_user': 8, 'detail_user': 7, 'comment': 7, 'upload': 3,
+    },
+}
+
+
+def percentile(sorted_values, percent):
+    """Return the nearest-rank percentile of ``sorted_values``."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    summary = {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'mean_ms': sum(latencies) / len(latencies) if latencies else 0.0,
+    }
+    for percent in PERCENTILES:
+        summary[f'p{percent}_ms'] = percentile(latencies, percent)
+    return summary
+
+
+def encode_multipart(fields, files):
+    """Return the content type and body of a ``multipart/form-data`` form."""
+    boundary = uuid4().hex
+    body = io.BytesIO()
+    for name, value in fields.items():
+        body.write(
+            f'--{boundary}\r\nContent-Disposition: form-data;'
+            f' name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, (filename, content_type, content) in files.items():
+        body.write(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}";'
+            f' filename="{filename}"\r\nContent-Type: {content_type}'
+            '\r\n\r\n'.encode()
+        )
+        body.write(content + b'\r\n')
+    body.write(f'--{boundary}--\r\n'.encode())
+    return f'multipart/form-data; boundary={boundary}', body.getvalue()
+
+
+class WSGITransport:
+    """Call the Django WSGI application in this process."""
+
+    def __init__(self):
+        from django.core.handlers.wsgi import WSGIHandler
+
+        self.app = WSGIHandler()
+
+    def send(self, method, path, query, headers, body):
+        from wsgiref.util import setup_testing_defaults
+
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.input': io.BytesIO(body),
+            'CONTENT_LENGTH': str(len(body)),
+        }
+        for name, value in headers.items():
+            key = name.upper().replace('-', '_')
+            if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = f'HTTP_{key}'
+            environ[key] = value
+        setup_testing_defaults(environ)
+        started = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            started['status'] = int(status.split()[0])
+            started['headers'] = response_headers
+
+        result = self.app(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            result.close()
+        return started['status'], started['headers'], content
+
+    def close(self):
+        pass
+
+
+class HTTPTransport:
+    """Send requests to a running server over a kept-alive connection."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.connection = None
+
+    def send(self, method, path, query, headers, body, retry=True):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port)
+        target = self.prefix + path + (f'?{query}' if query else '')
+        try:
+            self.connection.request(method, target, body or None, headers)
+            response = self.connection.getresponse()
+            content = response.read()
+        except (http.client.HTTPException, ConnectionError):
+            # The server closed a kept-alive connection.
+            self.close()
+            if not retry:
+                raise
+            return self.send(method, path, query, headers, body, False)
+        if response.will_close:
+            self.close()
+        return response.status, response.getheaders(), content
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class Session:
+    """A browser of one user: keeps cookies and sends CSRF tokens."""
+
+    def __init__(self, transport):
+        self.transport = transport
+        self.cookies = {}
+
+    def request(self, method, path, params=None, data=None, files=None):
+        headers = {}
+        query, body = '', b''
+        if method == 'GET':
+            query = urlencode(params or {})
+        elif files:
+            headers['Content-Type'], body = encode_multipart(
+                self._with_token(data), files
+            )
+        else:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            body = urlencode(self._with_token(data)).encode()
+        if self.cookies:
+            headers['Cookie'] = '; '.join(
+                f'{name}={value}' for name, value in self.cookies.items()
+            )
+        status, response_headers, content = self.transport.send(
+            method, path, query, headers, body
+        )
+        for name, value in response_headers:
+            if name.lower() == 'set-cookie':
+                for morsel in SimpleCookie(value).values():
+                    self.cookies[morsel.key] = morsel.value
+        return status, content
+
+    def _with_token(self, data):
+        # The token in the cookie is also a valid token for forms.
+        return {**(data or {}), 'csrfmiddlewaretoken': self.cookies.get(
+            'csrftoken', ''
+        )}
+
+    def log_in(self, username, password):
+        self.request('GET', '/auth/login/')
+        status, _ = self.request(
+            'POST', '/auth/login/',
+            data={'username': username, 'password': password},
+        )
+        if status != 302:
+            raise SystemExit(f'Could not log in as {username}.')
+
+
+class Targets:
+    """Posts, categories and profiles found by reading the feed."""
+
+    def __init__(self, session, category_session):
+        content = b''.join(
+            session.request('GET', '/', {'page': page})[1]
+            for page in range(1, FEED_PAGES + 1)
+        ).decode()
+        self.posts = sorted(set(re.findall(r'/posts/(\d+)/"', content)))
+        self.categories = sorted(set(
+            re.findall(r'/category/([-\w]+)/"', content)
+        ))
+        self.profiles = sorted(set(
+            re.findall(r'/profile/([^/"]+)/"', content)
+        ))
+        if not self.posts:
+            raise SystemExit('The feed shows no posts to request.')
+        self.category_id = None
+        if category_session is not None:
+            _, content = category_session.request('GET', '/lookup/categories/')
+            results = json.loads(content)['results']
+            self.category_id = results[0]['id'] if results else None
+
+
+def _image():
+    from PIL import Image
+
+    output = io.BytesIO()
+    Image.new('RGB', (640, 480), (90, 140, 200)).save(output, 'JPEG')
+    return output.getvalue()
+
+
+IMAGE = None
+
+
+def _upload(session, targets, rng):
+    fields = {
+        'title': f'Benchmark {rng.randrange(10 ** 6)}',
+        'text': 'Uploaded by the traffic benchmark.',
+        'pub_date': datetime.now().strftime('%Y-%m-%dT%H:%M'),
+        'is_published': 'on',
+    }
+    if targets.category_id is not None:
+        fields['category'] = targets.category_id
+    return session.request(
+        'POST', '/posts/create/', data=fields,
+        files={'image': ('bench.jpg', 'image/jpeg', IMAGE)},
+    )
+
+
+# Action: (logged in, expected status, request).
+ACTIONS = {
+    'feed': (False, 200, lambda session, targets, rng: session.request(
+        'GET', '/', {'page': rng.randint(1, FEED_PAGES)}
+    )),
+    'detail': (False, 200, lambda session, targets, rng: session.request(
+        'GET', f'/posts/{rng.choice(targets.posts)}/'
+    )),
+    'category': (False, 200, lambda session, targets, rng: session.request(
+        'GET', f'/category/{rng.choice(targets.categories)}/'
+    )),
+    'profile': (False, 200, lambda session, targets, rng: session.request(
+        'GET', f'/profile/{rng.choice(targets.profiles)}/'
+    )),
+    'page': (False, 200, lambda session, targets, rng: session.request(
+        'GET', rng.choice(('/pages/about/', '/pages/rules/'))
+    )),
+    'comment': (True, 302, lambda session, targets, rng: session.request(
+        'POST', f'/posts/{rng.choice(targets.posts)}/comment/',
+        data={'text': f'Benchmark comment {rng.randrange(10 ** 6)}'},
+    )),
+    'upload': (True, 302, _upload),
+}
+for _name in ('feed', 'detail', 'profile'):
+    ACTIONS[f'{_name}_user'] = (True, *ACTIONS[_name][1:])
+
+
+def parse_mix(value):
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name not in ACTIONS:
+            raise argparse.ArgumentTypeError(
+                f'Unknown action {name!r}; choose from {", ".join(ACTIONS)}.'
+            )
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Worker:
+    """Sends its share of the requests as one anonymous and one user."""
+
+    def __init__(self, make_transport, credentials, seed):
+        self.rng = random.Random(seed)
+        self.anonymous = Session(make_transport())
+        self.user = None
+        if credentials is not None:
+            self.user = Session(make_transport())
+            self.user.log_in(*credentials)
+
+    def run(self, targets, actions, weights, count, record):
+        for name in self.rng.choices(actions, weights, k=count):
+            logged_in, expected, send = ACTIONS[name]
+            session = self.user if logged_in else self.anonymous
+            started = time.perf_counter()
+            try:
+                status, _ = send(session, targets, self.rng)
+            except (OSError, http.client.HTTPException):
+                status = None
+            record(
+                name, (time.perf_counter() - started) * 1000,
+                status != expected,
+            )
+
+    def close(self):
+        for session in (self.anonymous, self.user):
+            if session is not None:
+                session.transport.close()
+
+
+def run(args, make_transport, credentials):
+    mix = args.mix
+    if credentials is None and any(ACTIONS[name][0] for name in mix):
+        raise SystemExit('Logged-in actions need --username and --password.')
+    actions, weights = list(mix), list(mix.values())
+    workers = [
+        Worker(make_transport, credentials, args.seed + number)
+        for number in range(args.concurrency)
+    ]
+    targets = Targets(workers[0].anonymous, workers[0].user)
+    if 'category' in mix and not targets.categories:
+        raise SystemExit('The feed links to no categories.')
+    for worker in workers:
+        worker.run(
+            targets, actions, weights, args.warmup // len(workers),
+            lambda *result: None,
+        )
+    results = {name: ([], [0]) for name in actions}
+    lock = threading.Lock()
+
+    def record(name, latency, failed):
+        with lock:
+            latencies, errors = results[name]
+            latencies.append(latency)
+            errors[0] += failed
+
+    share, extra = divmod(args.requests, len(workers))
+    started = time.perf_counter()
+    with ThreadPoolExecutor(len(workers)) as executor:
+        for number, worker in enumerate(workers):
+            executor.submit(
+                worker.run, targets, actions, weights,
+                share + (number < extra), record,
+            )
+    elapsed = time.perf_counter() - started
+    for worker in workers:
+        worker.close()
+    report = {
+        'actions': {
+            name: summarize(latencies, errors[0], elapsed)
+            for name, (latencies, errors) in results.items() if latencies
+        },
+        'total': summarize(
+            [value for latencies, _ in results.values()
+             for value in latencies],
+            sum(errors[0] for _, errors in results.values()), elapsed,
+        ),
+    }
+    report['config'] = {
+        'target': args.url or 'in-process', 'mix': mix,
+        'requests': args.requests, 'concurrency': args.concurrency,
+        'seed': args.seed,
+    }
+    return report
+
+
+def print_report(report):
+    columns = ('requests', 'errors', 'throughput', 'mean_ms') + tuple(
+        f'p{percent}_ms' for percent in PERCENTILES
+    )
+    print(f'{"action":<14}' + ''.join(f'{column:>12}' for column in columns))
+    rows = list(report['actions'].items()) + [('total', report['total'])]
+    for name, summary in rows:
+        print(f'{name:<14}' + ''.join(
+            f'{summary[column]:>12.1f}' if isinstance(summary[column], float)
+            else f'{summary[column]:>12}'
+            for column in columns
+        ))
+
+
+def compare(report, baseline, max_regression):
+    """Print the change of every measure and return the regressions."""
+    keys = ('throughput',) + tuple(f'p{percent}_ms' for percent in PERCENTILES)
+    print(f'\n{"vs baseline":<14}' + ''.join(f'{key:>12}' for key in keys))
+    regressions = []
+    rows = list(report['actions'].items()) + [('total', report['total'])]
+    for name, summary in rows:
+        old = (
+            baseline['total'] if name == 'total'
+            else baseline['actions'].get(name)
+        )
+        if old is None:
+            continue
+        changes = []
+        for key in keys:
+            change = (
+                (summary[key] - old[key]) / old[key] * 100 if old[key] else 0
+            )
+            changes.append(f'{change:>+11.1f}%')
+        print(f'{name:<14}' + ''.join(changes))
+        p95 = old['p95_ms']
+        if max_regression is not None and p95 and (
+            summary['p95_ms'] - p95
+        ) / p95 * 100 > max_regression:
+            regressions.append(name)
+    return regressions
+
+
+def seed(args):
+    from django.conf import settings
+    from django.core.management import call_command
+
+    settings.MEDIA_ROOT = tempfile.mkdtemp(prefix='blogicum-media-')
+    call_command(
+        'generate_data', users=args.users, posts=args.posts,
+        comments=args.comments, categories=10, locations=50,
+        seed=args.seed, prefix='bench', password='bench',
+        stdout=io.StringIO(),
+    )
+    return 'bench1', 'bench'
+
+
+def main():
+    global IMAGE
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--mix', type=parse_mix, default=MIXES['mixed'],
+        help=f'One of {", ".join(MIXES)} or weights like feed=4,comment=1.'
+    )
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--url', help='Root URL of a running server.')
+    parser.add_argument('--username')
+    parser.add_argument('--password')
+    parser.add_argument(
+        '--concurrency', type=int, default=1,
+        help='Simultaneous clients; only with --url.'
+    )
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--posts', type=int, default=5000)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument('--save', help='Write the results to this file.')
+    parser.add_argument('--baseline', help='Results to compare with.')
+    parser.add_argument(
+        '--max-regression', type=float,
+        help='Fail when a p95 grows by more than this many percent.'
+    )
+    args = parser.parse_args()
+    IMAGE = _image()
+
+    if args.url:
+        credentials = None
+        if args.username:
+            credentials = (args.username, args.password or '')
+
+        def make_transport():
+            return HTTPTransport(args.url)
+    else:
+        # Requests run one at a time, but thumbnails are stored from
+        # other threads: an in-memory database would refuse them.
+        args.concurrency = 1
+        setup_django(Path(tempfile.mkdtemp()) / 'traffic.sqlite3')
+        credentials = seed(args)
+        transport = WSGITransport()
+
+        def make_transport():
+            return transport
+    report = run(args, make_transport, credentials)
+    print_report(report)
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.max_regression)
+        if regressions:
+            print(f'p95 regressed for: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class BlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blog'
     verbose_name = 'Блог'
+
+    def ready(self):
+        from . import instrumentation, signals  # noqa: F401
+        from .search import install_after_migrate
+
+        post_migrate.connect(install_after_migrate, sender=self)
+        instrumentation.install()
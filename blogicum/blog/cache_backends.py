@@ -0,0 +1,541 @@
+"""A cache backend keeping recent entries in each process.
+
+``TieredCache`` answers from a least recently used set of entries held
+in the memory of the process, bounded by their pickled size, and falls
+back to a shared cache backend, whose entries it copies. Writes go to
+both tiers.
+
+Every write and deletion is published through the shared cache: a
+generation counter and, per generation, the keys that changed. Each
+process reads the counter at most once per ``CHECK_INTERVAL`` seconds
+and drops the entries that changed elsewhere, or all of them when it
+missed changes, so an entry stays stale in other processes for at most
+that long. Entries copied from the shared cache are also dropped after
+``LOCAL_TIMEOUT`` seconds, as their expiry there is unknown.
+
+The shared backend should implement ``add()`` and ``incr()`` atomically,
+as memcached and ``SQLiteCache`` do; for others, such as the file based
+cache, they are only atomic between the threads of a process.
+``SQLiteCache`` keeps entries in a database file, which stands in for
+memcached on a single host.
+
+Options:
+    SHARED: alias of the shared cache, ``'shared'`` by default.
+    MAX_SIZE: bytes of pickled values kept in the process.
+    MAX_ENTRY_SIZE: larger values are only kept in the shared cache.
+    LOCAL_TIMEOUT, CHECK_INTERVAL: seconds, as described above.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+from django.utils.functional import cached_property
+
+from . import metrics
+
+GENERATION_KEY = 'tiered:generation'
+CHANGES_KEY = 'tiered:changes:{}'
+# Seconds the keys changed by a generation are kept; a process that
+# reads the counter less often than that drops all its entries.
+CHANGES_TIMEOUT = 60 * 10
+# A process that missed more generations drops all its entries instead
+# of reading the keys they changed.
+MAX_MISSED_GENERATIONS = 100
+
+_tiers = {}
+_tiers_lock = threading.Lock()
+# Makes add() and incr() of the shared cache atomic within the process.
+_shared_lock = threading.Lock()
+_missing = object()
+
+
+class LocalTier:
+    """Pickled values by key, the least recently used first."""
+
+    def __init__(self, max_size, max_entry_size):
+        self.max_size = max_size
+        self.max_entry_size = max_entry_size
+        self.size = 0
+        self.stats = Counter()
+        # Last generation of the shared cache whose changes were applied
+        # and when to read the counter again.
+        self.generation = None
+        self.next_check = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, now):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and (
+                entry[0] <= now
+            ):
+                self._remove(key)
+                self._evicted('expired')
+                entry = None
+            if entry is None:
+                self.stats['local_misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats['local_hits'] += 1
+            return entry[1]
+
+    def set(self, key, data, expires_at, generation=_missing):
+        """Keep ``data``, unless ``generation`` is no longer the current one.
+
+        A value read from the shared cache under an older generation may
+        be one that changed since.
+        """
+        with self._lock:
+            if generation is not _missing and generation != self.generation:
+                return
+            self._remove(key)
+            if len(data) > self.max_entry_size:
+                return
+            self._entries[key] = (expires_at, data)
+            self.size += len(key) + len(data)
+            evicted = 0
+            while self.size > self.max_size:
+                old_key, (_, old_data) = self._entries.popitem(last=False)
+                self.size -= len(old_key) + len(old_data)
+                evicted += 1
+            if evicted:
+                self._evicted('size', evicted)
+
+    def discard(self, keys, reason=None):
+        with self._lock:
+            removed = sum(self._remove(key) for key in keys)
+            if reason is not None and removed:
+                self._evicted(reason, removed)
+
+    def clear(self, reason=None):
+        with self._lock:
+            if reason is not None and self._entries:
+                self._evicted(reason, len(self._entries))
+            self._entries.clear()
+            self.size = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.size -= len(key) + len(entry[1])
+        return True
+
+    def _evicted(self, reason, amount=1):
+        self.stats[f'evicted_{reason}'] += amount
+        metrics.inc(
+            'blog_local_cache_evictions_total', {'reason': reason}, amount
+        )
+
+
+def _get_tier(name, max_size, max_entry_size):
+    with _tiers_lock:
+        tier = _tiers.get(name)
+        if tier is None:
+            tier = _tiers[name] = LocalTier(max_size, max_entry_size)
+        return tier
+
+
+class TieredCache(BaseCache):
+    """A bounded cache in the process in front of a shared cache.
+
+    ``LOCATION`` names the set of entries in the process, which every
+    thread shares.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 300)
+        self.check_interval = options.get('CHECK_INTERVAL', 0.1)
+        max_size = options.get('MAX_SIZE', 32 * 1024 * 1024)
+        self._local = _get_tier(
+            location or 'default', max_size,
+            options.get('MAX_ENTRY_SIZE', max_size // 16),
+        )
+
+    @cached_property
+    def _shared(self):
+        return caches[self._shared_alias]
+
+    def _local_key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    def _shared_timeout(self, timeout):
+        return self.default_timeout if timeout is DEFAULT_TIMEOUT else timeout
+
+    def _keep(self, local_key, value, expires_at=None, generation=_missing):
+        now = time.time()
+        if expires_at is not None and expires_at <= now:
+            self._local.discard((local_key,))
+            return
+        latest = now + self.local_timeout
+        self._local.set(
+            local_key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            latest if expires_at is None else min(expires_at, latest),
+            generation,
+        )
+
+    def _check_changes(self):
+        """Drop the entries that other processes changed."""
+        local = self._local
+        now = time.monotonic()
+        if now < local.next_check:
+            return
+        local.next_check = now + self.check_interval
+        generation = self._shared.get(GENERATION_KEY, 0)
+        seen = local.generation
+        if generation == seen:
+            return
+        if seen is not None and (
+            0 < generation - seen <= MAX_MISSED_GENERATIONS
+        ):
+            numbers = range(seen + 1, generation + 1)
+            changes = self._shared.get_many(
+                [CHANGES_KEY.format(number) for number in numbers]
+            )
+            if len(changes) == len(numbers):
+                local.discard(
+                    (key for keys in changes.values() for key in keys),
+                    'invalidated',
+                )
+                local.generation = generation
+                return
+        local.clear('invalidated')
+        local.generation = generation
+
+    def _publish(self, local_keys):
+        """Tell other processes about changes made by this one.
+
+        Writes read the changes of others first, so that their own
+        change is usually the next generation, which needs no reading.
+        They update the local tier only afterwards: a value another
+        thread read before the change is kept before it, or not at all.
+        """
+        if not local_keys:
+            return
+        shared, local = self._shared, self._local
+        with _shared_lock:
+            try:
+                generation = shared.incr(GENERATION_KEY)
+            except ValueError:
+                # A new counter starts far ahead of the generations seen
+                # before the shared cache lost it.
+                start = time.time_ns() // 1000
+                if shared.add(GENERATION_KEY, start, None):
+                    local.generation = start
+                generation = shared.incr(GENERATION_KEY)
+        shared.set(
+            CHANGES_KEY.format(generation), list(local_keys), CHANGES_TIMEOUT
+        )
+        # The own changes of the process need not be read back.
+        if local.generation == generation - 1:
+            local.generation = generation
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        self._check_changes()
+        data = self._local.get(local_key, time.time())
+        if data is not None:
+            return pickle.loads(data)
+        # Changes applied by another thread during the read may concern
+        # the value read.
+        generation = self._local.generation
+        value = self._shared.get(key, _missing, version)
+        if value is _missing:
+            self._local.stats['shared_misses'] += 1
+            return default
+        self._local.stats['shared_hits'] += 1
+        self._keep(local_key, value, generation=generation)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._check_changes()
+        now = time.time()
+        found, missing = {}, {}
+        for key in keys:
+            local_key = self._local_key(key, version)
+            data = self._local.get(local_key, now)
+            if data is None:
+                missing[key] = local_key
+            else:
+                found[key] = pickle.loads(data)
+        if missing:
+            generation = self._local.generation
+            values = self._shared.get_many(missing, version)
+            self._local.stats['shared_hits'] += len(values)
+            self._local.stats['shared_misses'] += len(missing) - len(values)
+            for key, value in values.items():
+                self._keep(missing[key], value, generation=generation)
+            found.update(values)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._check_changes()
+        local_key = self._local_key(key, version)
+        self._shared.set(key, value, self._shared_timeout(timeout), version)
+        self._publish((local_key,))
+        self._keep(local_key, value, self.get_backend_timeout(timeout))
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        self._check_changes()
+        failed = self._shared.set_many(
+            data, self._shared_timeout(timeout), version
+        )
+        expires_at = self.get_backend_timeout(timeout)
+        local_keys = {
+            key: self._local_key(key, version) for key in data
+        }
+        self._publish(list(local_keys.values()))
+        for key, value in data.items():
+            if key not in failed:
+                self._keep(local_keys[key], value, expires_at)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._check_changes()
+        local_key = self._local_key(key, version)
+        with _shared_lock:
+            added = self._shared.add(
+                key, value, self._shared_timeout(timeout), version
+            )
+        if added:
+            self._publish((local_key,))
+            self._keep(local_key, value, self.get_backend_timeout(timeout))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local.discard((self._local_key(key, version),))
+        return self._shared.touch(
+            key, self._shared_timeout(timeout), version
+        )
+
+    def delete(self, key, version=None):
+        self._check_changes()
+        local_key = self._local_key(key, version)
+        deleted = self._shared.delete(key, version)
+        self._publish((local_key,))
+        self._local.discard((local_key,))
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        self._check_changes()
+        local_keys = [self._local_key(key, version) for key in keys]
+        self._shared.delete_many(keys, version)
+        self._publish(local_keys)
+        self._local.discard(local_keys)
+
+    def has_key(self, key, version=None):
+        self._check_changes()
+        local_key = self._local_key(key, version)
+        return (
+            self._local.get(local_key, time.time()) is not None
+            or self._shared.has_key(key, version)  # noqa: W601
+        )
+
+    def incr(self, key, delta=1, version=None):
+        self._check_changes()
+        local_key = self._local_key(key, version)
+        with _shared_lock:
+            value = self._shared.incr(key, delta, version)
+        self._publish((local_key,))
+        self._local.discard((local_key,))
+        return value
+
+    def decr(self, key, delta=1, version=None):
+        return self.incr(key, -delta, version)
+
+    def clear(self):
+        self._shared.clear()
+        self._local.clear()
+
+    def stats(self):
+        """Return the size of this process's entries and their counters."""
+        local = self._local
+        return {
+            'entries': len(local), 'size': local.size,
+            'max_size': local.max_size, **local.stats,
+        }
+
+
+class SQLiteCache(BaseCache):
+    """A cache in an SQLite database file, shared by the processes of a host.
+
+    ``LOCATION`` is the path of the file. Integers are stored as they are,
+    so that ``incr()`` is a single statement; other values are pickled.
+    Expired entries are deleted, and the oldest ones once there are more
+    than ``MAX_ENTRIES``, after every ``CULL_EVERY`` writes.
+    """
+
+    CULL_EVERY = 500
+    CHUNK_SIZE = 500
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = str(location)
+        self._pid = None
+        self._writes = 0
+
+    @property
+    def _database(self):
+        # A forked process needs a connection of its own.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            connection = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, '
+                'value BLOB NOT NULL, expires REAL)'
+            )
+            self._connection = connection
+        return self._connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _dumps(value):
+        if type(value) is int:
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loads(value):
+        return value if type(value) is int else pickle.loads(value)
+
+    def _written(self, amount=1):
+        self._writes += amount
+        if self._writes >= self.CULL_EVERY:
+            self._writes = 0
+            self._cull()
+
+    def _cull(self):
+        database = self._database
+        database.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count = database.execute('SELECT count(*) FROM cache').fetchone()[0]
+        if count > self._max_entries:
+            database.execute(
+                'DELETE FROM cache WHERE rowid IN (SELECT rowid FROM cache '
+                'ORDER BY rowid LIMIT ?)', (count // self._cull_frequency,)
+            )
+
+    def get(self, key, default=None, version=None):
+        row = self._database.execute(
+            'SELECT value FROM cache WHERE key = ? AND '
+            '(expires IS NULL OR expires > ?)',
+            (self._key(key, version), time.time()),
+        ).fetchone()
+        return default if row is None else self._loads(row[0])
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        found = {}
+        names = list(keys)
+        for start in range(0, len(names), self.CHUNK_SIZE):
+            chunk = names[start:start + self.CHUNK_SIZE]
+            rows = self._database.execute(
+                f'SELECT key, value FROM cache WHERE key IN '
+                f'({", ".join("?" * len(chunk))}) AND '
+                f'(expires IS NULL OR expires > ?)',
+                (*chunk, time.time()),
+            )
+            found.update(
+                (keys[name], self._loads(value)) for name, value in rows
+            )
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        database = self._database
+        database.execute('BEGIN IMMEDIATE')
+        try:
+            database.executemany(
+                'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+                'expires = excluded.expires',
+                [
+                    (self._key(key, version), self._dumps(value), expires)
+                    for key, value in data.items()
+                ],
+            )
+        except BaseException:
+            database.execute('ROLLBACK')
+            raise
+        database.execute('COMMIT')
+        self._written(len(data))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Replaces only an expired entry.
+        added = self._database.execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires WHERE cache.expires <= ?',
+            (
+                self._key(key, version), self._dumps(value),
+                self.get_backend_timeout(timeout), time.time(),
+            ),
+        ).rowcount
+        self._written()
+        return bool(added)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return bool(self._database.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND '
+            '(expires IS NULL OR expires > ?)',
+            (
+                self.get_backend_timeout(timeout), self._key(key, version),
+                time.time(),
+            ),
+        ).rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        row = self._database.execute(
+            "UPDATE cache SET value = value + ? WHERE key = ? AND "
+            "typeof(value) = 'integer' AND (expires IS NULL OR expires > ?) "
+            "RETURNING value",
+            (delta, self._key(key, version), time.time()),
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Key '{key}' not found")
+        return row[0]
+
+    def delete(self, key, version=None):
+        return bool(self._database.execute(
+            'DELETE FROM cache WHERE key = ?', (self._key(key, version),)
+        ).rowcount)
+
+    def delete_many(self, keys, version=None):
+        self._database.executemany(
+            'DELETE FROM cache WHERE key = ?',
+            [(self._key(key, version),) for key in keys],
+        )
+
+    def has_key(self, key, version=None):
+        return self.get(key, _missing, version) is not _missing
+
+    def clear(self):
+        self._database.execute('DELETE FROM cache')
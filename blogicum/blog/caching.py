@@ -0,0 +1,330 @@
+import hashlib
+import logging
+import math
+import random
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.utils.cache import add_never_cache_headers
+from django.views.decorators.http import condition
+
+from . import constants, metrics
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'blog:version:{}'
+PAGE_KEY = 'blog:page:{}:{}'
+LOCK_KEY = 'blog:lock:{}'
+LATEST_KEY = 'blog:latest:{}'
+PAGE_PARAMS = ('page', 'after', 'before', 'format')
+
+# Scopes every page depends on: category and location titles and
+# author names are rendered on every post card.
+TAXONOMY_SCOPE = 'taxonomy'
+AUTHORS_SCOPE = 'authors'
+INDEX_SCOPE = 'index'
+
+
+def category_scope(category_id):
+    return f'category:{category_id}'
+
+
+def profile_scope(user_id):
+    return f'profile:{user_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def viewer_scope(user_id):
+    return f'viewer:{user_id}'
+
+
+def _new_version():
+    # A version is the time of the last change in nanoseconds: it doubles
+    # as a Last-Modified value, and a version key lost from the cache can
+    # never be recreated with a value an older page was stored under.
+    return time.time_ns()
+
+
+def get_versions(scopes):
+    keys = {VERSION_KEY.format(scope): scope for scope in scopes}
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*scopes):
+    version = _new_version()
+    cache.set_many(
+        {VERSION_KEY.format(scope): version for scope in set(scopes)},
+        timeout=None,
+    )
+
+
+def _refresh_due(refresh_at, cost, now):
+    """Tell whether an entry should be computed again already.
+
+    Every reader refreshes an entry early with a chance that grows as
+    its expiry nears and with the time it took to compute, so one reader
+    usually refreshes it before the others find it expired.
+    """
+    if refresh_at is None:
+        return False
+    early = -cost * constants.CACHE_EARLY_REFRESH * math.log(
+        1 - random.random()
+    )
+    return now + early >= refresh_at
+
+
+def _latest(family):
+    if family is None:
+        return None
+    key = cache.get(LATEST_KEY.format(family))
+    return None if key is None else cache.get(key)
+
+
+def _wait(key):
+    deadline = time.monotonic() + constants.CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(constants.CACHE_LOCK_POLL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def _store(key, value, timeout, cost, family):
+    stored = {
+        key: (value, None if timeout is None else time.time() + timeout, cost)
+    }
+    if family is not None:
+        stored[LATEST_KEY.format(family)] = key
+    cache.set_many(stored, (
+        None if timeout is None else timeout + constants.CACHE_STALE_TIMEOUT
+    ))
+
+
+def get_or_compute(key, compute, timeout=None, family=None, keep=None):
+    """Return ``(value, result)`` for ``key``, calling ``compute`` if needed.
+
+    Only the worker holding the lock of a key computes it, while the
+    others serve its stale value or, when there is none, wait for the new
+    one. ``family`` names entries that replace one another, such as the
+    versions of a page: the latest entry of the family stands in for a
+    missing key. Entries are kept ``CACHE_STALE_TIMEOUT`` seconds past
+    ``timeout`` to be served stale, also when computing raises a
+    ``DatabaseError``. ``timeout`` may be a function, called once the
+    value is computed. ``keep(value)`` tells whether a new value may be
+    stored. ``result`` is ``'hit'``, ``'miss'``, ``'refresh'`` for an
+    expired value computed again, or ``'stale'``.
+    """
+    entry = cache.get(key)
+    if entry is not None and not _refresh_due(*entry[1:], time.time()):
+        return entry[0], 'hit'
+    lock = LOCK_KEY.format(key)
+    if not cache.add(lock, True, constants.CACHE_LOCK_TIMEOUT):
+        stale = entry or _latest(family)
+        if stale is not None:
+            return stale[0], 'stale'
+        waited = _wait(key)
+        if waited is not None:
+            return waited[0], 'hit'
+        # The holder of the lock takes too long: do not wait any more.
+        lock = None
+    try:
+        started = time.perf_counter()
+        value = compute()
+        cost = time.perf_counter() - started
+        if keep is None or keep(value):
+            _store(
+                key, value, timeout() if callable(timeout) else timeout,
+                cost, family,
+            )
+    except DatabaseError:
+        stale = entry or _latest(family)
+        if stale is None:
+            raise
+        logger.exception('Serving a stale value of %s', key)
+        return stale[0], 'stale'
+    finally:
+        if lock is not None:
+            cache.delete(lock)
+    return value, 'miss' if entry is None else 'refresh'
+
+
+def post_scopes(category_id, author_id):
+    return (INDEX_SCOPE, category_scope(category_id), profile_scope(author_id))
+
+
+def _page_address(request):
+    params = '&'.join(
+        f'{name}={request.GET[name]}'
+        for name in PAGE_PARAMS if name in request.GET
+    )
+    return f'{request.path}?{params}'
+
+
+def _page_family(owner, page):
+    return hashlib.md5(f'{owner}#{page}'.encode()).hexdigest()
+
+
+def _page_state(request, scopes):
+    """Return the viewer, versions, cache digests and address of a page.
+
+    The shared digest covers what every viewer sees; the viewer digest
+    adds the viewer, whose name is shown in the header. The result is
+    memoized on the request, as both the conditional GET validators and
+    the page cache need it.
+    """
+    state = getattr(request, '_blog_page_state', None)
+    if state is not None:
+        return state
+    scopes = (TAXONOMY_SCOPE, AUTHORS_SCOPE, *scopes)
+    if request.user.is_authenticated:
+        viewer = request.user.pk
+        versions = get_versions((*scopes, viewer_scope(viewer)))
+    else:
+        viewer = 'anonymous'
+        versions = get_versions(scopes)
+    page = _page_address(request)
+    shared_digest = hashlib.md5(
+        f'{page}#{".".join(map(str, versions[:len(scopes)]))}'.encode()
+    ).hexdigest()
+    viewer_digest = hashlib.md5(
+        f'{page}#{viewer}#{".".join(map(str, versions))}'.encode()
+    ).hexdigest()
+    request._blog_page_state = state = (
+        viewer, versions, shared_digest, viewer_digest, page
+    )
+    return state
+
+
+def cache_feed_page(request, scopes, render_page, shared=True):
+    """Return the cached response for a page or render and store it.
+
+    The key embeds the current version of every scope the page depends
+    on, so bumping a version makes the old entries unreachable. Parts
+    that differ between viewers are holes, filled in for each request by
+    ``HoleMiddleware``, so one entry serves every viewer. Pages whose
+    content differs for their viewer pass ``shared=False`` and get an
+    entry per viewer. Entries expire when the next deferred publication
+    goes live.
+
+    A page is rendered by one worker at a time; meanwhile, and when the
+    database fails, the others serve the page stored under the previous
+    versions (see ``get_or_compute``).
+    """
+    from .scheduling import seconds_until_next_publication
+
+    if request.method not in ('GET', 'HEAD'):
+        return render_page()
+    viewer, _, shared_digest, viewer_digest, page = _page_state(
+        request, scopes
+    )
+    owner = 'shared' if shared else viewer
+    key = PAGE_KEY.format(owner, shared_digest if shared else viewer_digest)
+
+    def get_timeout():
+        timeout = seconds_until_next_publication()
+        return None if timeout is None else int(timeout)
+
+    response, result = get_or_compute(
+        key, render_page, timeout=get_timeout,
+        family=_page_family(owner, page),
+        keep=lambda response: (
+            response.status_code == 200 and not response.cookies
+        ),
+    )
+    metrics.inc('blog_page_cache_requests_total', {'result': result})
+    if result == 'stale':
+        # Validators describe the current versions: a stale page must not
+        # be kept and revalidated by the client.
+        add_never_cache_headers(response)
+    return response
+
+
+def stale_on_database_error(view):
+    """Serve the latest cached page when the view fails on the database.
+
+    ``cache_feed_page`` only covers rendering; this also covers the
+    lookups a view makes before it, such as finding the post or the
+    category, and those of its ``conditional_page`` validators. The
+    page of the viewer comes before the one shared by every viewer.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except DatabaseError:
+            if request.method not in ('GET', 'HEAD'):
+                raise
+            page = _page_address(request)
+            viewer = (
+                request.user.pk if request.user.is_authenticated
+                else 'anonymous'
+            )
+            for owner in (viewer, 'shared'):
+                stale = _latest(_page_family(owner, page))
+                if stale is not None:
+                    break
+            else:
+                raise
+            logger.exception('Serving a stale page of %s', page)
+            metrics.inc('blog_page_cache_requests_total', {'result': 'stale'})
+            response = stale[0]
+            add_never_cache_headers(response)
+            return response
+
+    return wrapper
+
+
+def _page_validators(request, scopes):
+    from .scheduling import publication_window
+
+    _, versions, _, digest, _ = _page_state(request, scopes)
+    # Forms carry a token of the CSRF secret, which changes on login: a
+    # page revalidated from before would fail its next POST.
+    digest = hashlib.md5(
+        f'{digest}#{request.META.get("CSRF_COOKIE", "")}'.encode()
+    ).hexdigest()
+    last_published, next_published = publication_window()
+    next_timestamp = next_published.timestamp() if next_published else 0
+    last_modified = datetime.fromtimestamp(
+        max(versions) / 10 ** 9, tz=dt_timezone.utc
+    )
+    if last_published is not None:
+        last_modified = max(last_modified, last_published)
+    return f'{digest}-{next_timestamp:.0f}', last_modified
+
+
+def conditional_page(get_scopes):
+    """Answer conditional GETs from scope versions before the view runs.
+
+    ``get_scopes`` receives the view keyword arguments and returns the
+    scopes the page depends on, or ``None`` for a page that does not exist.
+    Besides the versions, the validators change whenever a deferred
+    publication goes live.
+    """
+    def validators(request, **kwargs):
+        if not hasattr(request, '_blog_validators'):
+            scopes = get_scopes(**kwargs)
+            request._blog_validators = (
+                (None, None) if scopes is None
+                else _page_validators(request, scopes)
+            )
+        return request._blog_validators
+
+    return condition(
+        etag_func=lambda request, **kwargs: validators(request, **kwargs)[0],
+        last_modified_func=lambda request, **kwargs: (
+            validators(request, **kwargs)[1]
+        ),
+    )
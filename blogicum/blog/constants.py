@@ -1,3 +1,25 @@
 MAX_LEN = 30
 MAX_LENGTH = 256
 POSTS_LIMIT = 10
+EXCERPT_WORDS = 10
+EXCERPT_MAX_LENGTH = 512
+COMMENTS_LIMIT = 50
+IMAGE_VARIANT_WIDTHS = (320, 640, 960, 1280)
+IMAGE_THUMBNAIL_WIDTH = 640
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_WORKERS = 2
+SEARCH_MAX_TERMS = 16
+LOOKUP_LIMIT = 20
+FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+USER_REGISTRY_SIZE = 10000
+# Seconds an expired cache entry may still be served while it is
+# computed again or when the database fails.
+CACHE_STALE_TIMEOUT = 60 * 5
+# Seconds after which the lock of a worker computing an entry lapses.
+CACHE_LOCK_TIMEOUT = 30
+# Seconds a worker waits for an entry computed by another one, and how
+# often it looks for it.
+CACHE_LOCK_WAIT = 2
+CACHE_LOCK_POLL = 0.05
+# Above 1, entries are refreshed earlier before they expire.
+CACHE_EARLY_REFRESH = 1.0
@@ -0,0 +1,115 @@
+"""Export of posts and comments as a stream of bytes.
+
+Rows are read in primary key order, a batch at a time, and written out
+as soon as each batch is read, so memory use does not depend on the
+number of rows and the first rows go out before the last are read.
+
+NDJSON lines have the record format of ``dumpdata``, which
+``import_data`` reads back. A CSV export holds a single model.
+"""
+import csv
+import io
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Post
+
+# Name: (model, exported fields). Stored renderings and picture copies
+# are left out; they are made again from the exported fields.
+EXPORTS = {
+    'posts': (Post, (
+        'title', 'text', 'pub_date', 'author', 'location', 'category',
+        'image', 'is_published', 'created_at', 'comments_count',
+    )),
+    'comments': (Comment, (
+        'text', 'post', 'author', 'is_published', 'created_at',
+    )),
+}
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+BATCH_SIZE = 2000
+# Compression otherwise takes longer than reading the rows.
+COMPRESS_LEVEL = 1
+
+
+def iter_batches(model, fields, batch_size=BATCH_SIZE):
+    """Yield lists of ``(pk, *values)`` tuples, by keyset pagination."""
+    columns = [model._meta.get_field(name).attname for name in fields]
+    rows = model.objects.order_by('pk').values_list('pk', *columns)
+    last_pk = None
+    while True:
+        batch = list(
+            (rows if last_pk is None else rows.filter(pk__gt=last_pk))
+            [:batch_size]
+        )
+        if not batch:
+            return
+        yield batch
+        last_pk = batch[-1][0]
+
+
+def _ndjson(names, batch_size):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for name in names:
+        model, fields = EXPORTS[name]
+        label = model._meta.label_lower
+        for batch in iter_batches(model, fields, batch_size):
+            yield ''.join(
+                encoder.encode({
+                    'model': label, 'pk': row[0],
+                    'fields': dict(zip(fields, row[1:])),
+                }) + '\n'
+                for row in batch
+            ).encode()
+
+
+def _csv(names, batch_size):
+    model, fields = EXPORTS[names[0]]
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(('id', *fields))
+    # The header goes out before the first query.
+    yield output.getvalue().encode()
+    for batch in iter_batches(model, fields, batch_size):
+        output.seek(0)
+        output.truncate()
+        writer.writerows(batch)
+        yield output.getvalue().encode()
+
+
+def _gzipped(chunks):
+    compressor = zlib.compressobj(COMPRESS_LEVEL, wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        # A sync flush per batch makes the compressed bytes of every
+        # batch available to the client at once.
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def export(names, format='ndjson', compress=False, batch_size=BATCH_SIZE):
+    """Return an iterator over the bytes of an export of ``names``.
+
+    Raises ``ValueError`` for unknown names and formats or for a CSV
+    export of several models.
+    """
+    unknown = set(names) - set(EXPORTS)
+    if unknown or not names:
+        raise ValueError(f'Choose exports among {", ".join(EXPORTS)}.')
+    if format not in FORMATS:
+        raise ValueError(f'Choose a format among {", ".join(FORMATS)}.')
+    if format == 'csv' and len(names) != 1:
+        raise ValueError('A CSV export holds a single model.')
+    chunks = (_ndjson if format == 'ndjson' else _csv)(names, batch_size)
+    return _gzipped(chunks) if compress else chunks
+
+
+def filename(names, format, compress, date):
+    extension = FORMATS[format][1] + ('.gz' if compress else '')
+    return f'{"-".join(names)}-{date:%Y%m%d}.{extension}'
+
+
+def content_type(format, compress):
+    return 'application/gzip' if compress else FORMATS[format][0]
@@ -1,9 +1,11 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserChangeForm
+from django.urls import reverse_lazy
 from django.utils import timezone
 
 from .models import Post, Comment
+from .widgets import LookupSelect
 
 
 class PostForm(forms.ModelForm):
@@ -21,7 +23,13 @@ class PostForm(forms.ModelForm):
         widgets = {
             'pub_date': forms.DateTimeInput(
                 format='%Y-%m-%dT%H:%M', attrs={'type': 'datetime-local'}
-            )
+            ),
+            'location': LookupSelect(
+                reverse_lazy('blog:lookup', args=('locations',))
+            ),
+            'category': LookupSelect(
+                reverse_lazy('blog:lookup', args=('categories',))
+            ),
         }
 
 
@@ -42,3 +50,6 @@ class EditCommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ['text', 'post']
+        widgets = {
+            'post': LookupSelect(reverse_lazy('blog:lookup', args=('posts',))),
+        }
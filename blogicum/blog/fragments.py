@@ -0,0 +1,82 @@
+"""Cached HTML of post cards and comment lists.
+
+Fragments are stored under keys that embed the versions of everything
+they show, so an edit makes the old entries unreachable instead of
+deleting them. A card depends on its post, including its number of
+comments, on category and location titles and on author names. A page
+of comments depends on its post and on author names.
+
+Fragments are the same for every viewer: the controls a viewer gets on
+their own comments are holes (see ``blog.holes``).
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import constants, metrics
+from .caching import AUTHORS_SCOPE, get_versions, post_scope, TAXONOMY_SCOPE
+
+CARD_KEY = 'blog:card:{}:{}'
+COMMENTS_KEY = 'blog:comments:{}:{}:{}'
+
+
+def _count(fragment, hits, misses):
+    for result, amount in (('hit', hits), ('miss', misses)):
+        if amount:
+            metrics.inc(
+                'blog_fragment_cache_requests_total',
+                {'fragment': fragment, 'result': result}, amount,
+            )
+
+
+def render_post_cards(posts):
+    """Return the HTML of the card of every post in ``posts``, in order.
+
+    Versions and cards are each read from the cache in one round trip;
+    missing cards are rendered and stored together.
+    """
+    posts = list(posts)
+    taxonomy, authors, *post_versions = get_versions((
+        TAXONOMY_SCOPE, AUTHORS_SCOPE,
+        *(post_scope(post.pk) for post in posts),
+    ))
+    keys = [
+        CARD_KEY.format(post.pk, f'{taxonomy}.{authors}.{version}')
+        for post, version in zip(posts, post_versions)
+    ]
+    cards = cache.get_many(keys)
+    rendered = {}
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            rendered[key] = render_to_string(
+                'includes/post_card.html', {'post': post}
+            )
+    if rendered:
+        cache.set_many(rendered, constants.FRAGMENT_CACHE_TIMEOUT)
+        cards.update(rendered)
+    _count('post_card', len(posts) - len(rendered), len(rendered))
+    return [mark_safe(cards[key]) for key in keys]
+
+
+def render_comment_list(post, get_comments, after=None):
+    """Return the HTML of a page of comments of ``post``.
+
+    ``get_comments`` is only called, with ``after``, when the page is not
+    in the cache: a cached page costs no query for its comments.
+    """
+    post_version, authors = get_versions(
+        (post_scope(post.pk), AUTHORS_SCOPE)
+    )
+    cursor = hashlib.md5((after or '').encode()).hexdigest()
+    key = COMMENTS_KEY.format(post.pk, f'{post_version}.{authors}', cursor)
+    html = cache.get(key)
+    _count('comment_list', html is not None, html is None)
+    if html is None:
+        html = render_to_string(
+            'includes/comment_list.html',
+            {'post': post, 'comments': get_comments(post, after=after)},
+        )
+        cache.set(key, html, constants.FRAGMENT_CACHE_TIMEOUT)
+    return mark_safe(html)
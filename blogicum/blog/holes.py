@@ -0,0 +1,97 @@
+"""Regions of a page that differ between viewers.
+
+Templates mark such regions with ``{% hole "name" param=value %}``, which
+renders a marker instead of the region. The rest of the page is then
+the same for every viewer and can be cached once for all of them.
+``HoleMiddleware`` replaces the markers of every response with the
+regions rendered for the current request.
+
+Parameters travel inside the marker, so they must be JSON values. The
+template of a hole sees them and the usual request context.
+"""
+import base64
+import json
+import re
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+MARKER = '<!--hole:{}:{}-->'
+MARKER_PATTERN = re.compile(r'<!--hole:([\w-]+):([\w-]*)-->')
+
+
+def _comment_form_context(request, **params):
+    from .forms import CommentForm
+
+    # A view that validated a comment shows its errors.
+    return {'form': getattr(request, 'comment_form', None) or CommentForm()}
+
+
+def _is_author(request, author_id, **params):
+    return request.user.pk == author_id
+
+
+# Name: (template, condition, extra context). A hole whose condition
+# returns false is left empty without rendering its template.
+HOLES = {
+    'header': ('includes/header.html', None, None),
+    'comment_form': (
+        'includes/comment_form.html',
+        lambda request, **params: request.user.is_authenticated,
+        _comment_form_context,
+    ),
+    'post_controls': ('includes/post_controls.html', _is_author, None),
+    'comment_controls': ('includes/comment_controls.html', _is_author, None),
+}
+
+
+def marker(name, params):
+    if name not in HOLES:
+        raise ValueError(f'Unknown hole {name!r}.')
+    encoded = base64.urlsafe_b64encode(
+        json.dumps(params, separators=(',', ':')).encode()
+    ).decode().rstrip('=')
+    return mark_safe(MARKER.format(name, encoded))
+
+
+def render_hole(request, name, params):
+    template_name, condition, get_context = HOLES[name]
+    if condition is not None and not condition(request, **params):
+        return ''
+    context = dict(params)
+    if get_context is not None:
+        context.update(get_context(request, **params))
+    return render_to_string(template_name, context, request=request)
+
+
+def fill_holes(html, request):
+    """Return ``html`` with every marker replaced by its region."""
+    def fill(match):
+        name, encoded = match.groups()
+        params = json.loads(
+            base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4))
+        )
+        return render_hole(request, name, params)
+
+    return MARKER_PATTERN.sub(fill, html)
+
+
+class HoleMiddleware:
+    """Fill the holes of HTML responses for the current viewer.
+
+    Must come after ``CommonMiddleware``, which measures the content.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            not response.streaming
+            and response.get('Content-Type', '').startswith('text/html')
+        ):
+            content = response.content.decode(response.charset)
+            if '<!--hole:' in content:
+                response.content = fill_holes(content, request)
+        return response
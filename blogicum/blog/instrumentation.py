@@ -0,0 +1,261 @@
+"""Per-request measurements of where the time goes.
+
+``InstrumentationMiddleware`` collects a ``RequestStats`` for every
+request: the number of queries and the time spent in each phase of the
+request. Phases are URL resolving, the view itself, database queries,
+template rendering, form rendering, file URL generation and, once the
+response is sent, serializing its body. Times are exclusive, so a query
+run by a lazy queryset while a template renders counts as database time
+only.
+
+Timings are sent in a ``Server-Timing`` header and logged as one JSON
+line per request by the ``blog.instrumentation`` logger. Budgets for a
+view are declared by URL name in ``settings.VIEW_BUDGETS``; requests that
+exceed them are logged as warnings.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, ExitStack
+
+from django.conf import settings
+from django.core.files.storage import get_storage_class
+from django.db import connections
+from django.template.base import Template
+from django_bootstrap5 import renderers
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+# Templates rendered by form widgets and ``django_bootstrap5`` tags.
+FORM_TEMPLATE_PREFIXES = ('django/forms/', 'django_bootstrap5/')
+# Phases in the order they are reported.
+PHASES = ('resolve', 'view', 'db', 'template', 'forms', 'images')
+
+# Budget keys and the measurements they limit.
+BUDGET_MEASURES = {
+    'queries': lambda stats: stats.queries,
+    'query_ms': lambda stats: stats.query_time * 1000,
+    'render_ms': lambda stats: stats.render_time * 1000,
+}
+
+
+class RequestStats:
+
+    def __init__(self):
+        self.view_name = None
+        self.queries = 0
+        self.timings = defaultdict(float)
+        self.started = time.perf_counter()
+        self.total = None
+        self._stack = []
+
+    def __repr__(self):
+        return (
+            f'<RequestStats {self.view_name}: {self.queries} queries,'
+            f' {self.query_time * 1000:.1f} ms in queries,'
+            f' {self.render_time * 1000:.1f} ms rendering>'
+        )
+
+    @property
+    def query_time(self):
+        return self.timings['db']
+
+    @property
+    def render_time(self):
+        return self.timings['template']
+
+    @contextmanager
+    def phase(self, name):
+        """Attribute the time spent in the block to ``name``.
+
+        Time spent in nested phases is only attributed to those.
+        """
+        frame = [time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[0]
+            self.timings[name] += elapsed - frame[1]
+            if self._stack:
+                self._stack[-1][1] += elapsed
+
+    def record_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        with self.phase('db'):
+            return execute(sql, params, many, context)
+
+    def finish(self):
+        """Stop the clock; time not spent in any phase is the view's."""
+        self.total = time.perf_counter() - self.started
+        self.timings['view'] = max(0.0, self.total - sum(
+            duration for name, duration in self.timings.items()
+            if name != 'view'
+        ))
+
+    def server_timing(self):
+        metrics = []
+        for name in PHASES:
+            if name in self.timings:
+                metric = f'{name};dur={self.timings[name] * 1000:.2f}'
+                if name == 'db':
+                    metric += f';desc="{self.queries} queries"'
+                metrics.append(metric)
+        metrics.append(f'total;dur={self.total * 1000:.2f}')
+        return ', '.join(metrics)
+
+    def as_log_record(self, request, response):
+        return {
+            'method': request.method,
+            'path': request.path,
+            'view': self.view_name,
+            'status': response.status_code,
+            'queries': self.queries,
+            'total_ms': round(self.total * 1000, 2),
+            **{
+                f'{name}_ms': round(duration * 1000, 2)
+                for name, duration in self.timings.items()
+            },
+        }
+
+    def over_budget(self, budget):
+        """Return a description of every measure above ``budget``."""
+        return [
+            f'{key} {BUDGET_MEASURES[key](self):.1f} > {limit}'
+            for key, limit in budget.items()
+            if BUDGET_MEASURES[key](self) > limit
+        ]
+
+
+def current_stats():
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def collect():
+    """Measure the work done by the current thread inside the block."""
+    stats = RequestStats()
+    previous, _local.stats = current_stats(), stats
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(stats.record_query)
+                )
+            yield stats
+    finally:
+        _local.stats = previous
+
+
+def _timed(func, phase):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stats = current_stats()
+        if stats is None:
+            return func(*args, **kwargs)
+        with stats.phase(phase):
+            return func(*args, **kwargs)
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+def _timed_render(render):
+    @functools.wraps(render)
+    def wrapper(self, context):
+        stats = current_stats()
+        if stats is None:
+            return render(self, context)
+        phase = 'template'
+        if self.name and self.name.startswith(FORM_TEMPLATE_PREFIXES):
+            phase = 'forms'
+        with stats.phase(phase):
+            return render(self, context)
+
+    wrapper.instrumented = True
+    return wrapper
+
+
+def install():
+    """Time the phases that are not views; called when the app is ready.
+
+    Wraps template rendering, the ``django_bootstrap5`` renderers behind
+    its form tags and the URL method of the media storage.
+    """
+    if getattr(Template.render, 'instrumented', False):
+        return
+    Template.render = _timed_render(Template.render)
+    for renderer in (
+        renderers.FormsetRenderer,
+        renderers.FormRenderer,
+        renderers.FieldRenderer,
+    ):
+        renderer.render = _timed(renderer.render, 'forms')
+    storage_class = get_storage_class()
+    storage_class.url = _timed(storage_class.url, 'images')
+
+
+class InstrumentationMiddleware:
+    """Collect ``request.stats``, report it and check the view budget.
+
+    Should come after every middleware that works before the view: the
+    time until ``process_view`` is then spent resolving the URL, and the
+    rest in the view.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with collect() as stats:
+            request.stats = stats
+            response = self.get_response(request)
+        stats.finish()
+        match = request.resolver_match
+        stats.view_name = match.view_name if match else None
+        response['Server-Timing'] = stats.server_timing()
+        view = stats.view_name or 'unresolved'
+        metrics.observe(
+            'blog_request_duration_seconds', stats.total,
+            {'view': view, 'status': str(response.status_code)},
+        )
+        metrics.inc('blog_db_queries_total', {'view': view}, stats.queries)
+        if logger.isEnabledFor(logging.INFO):
+            self._log_when_sent(request, response, stats)
+        budget = getattr(settings, 'VIEW_BUDGETS', {}).get(stats.view_name)
+        if budget:
+            exceeded = stats.over_budget(budget)
+            if exceeded:
+                logger.warning(
+                    '%s %s is over budget: %s', request.method,
+                    request.get_full_path(), ', '.join(exceeded),
+                )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        stats = request.stats
+        stats.timings['resolve'] = time.perf_counter() - stats.started
+
+    def _log_when_sent(self, request, response, stats):
+        # The body of a response is serialized by the server after the
+        # middleware returns, up to the moment it closes the response.
+        returned = time.perf_counter()
+        close = response.close
+
+        def close_and_log():
+            close()
+            record = stats.as_log_record(request, response)
+            record['serialize_ms'] = round(
+                (time.perf_counter() - returned) * 1000, 2
+            )
+            logger.info(json.dumps(record))
+
+        response.close = close_and_log
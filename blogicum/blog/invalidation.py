@@ -0,0 +1,294 @@
+"""Bus telling every worker process which rows changed.
+
+In-process caches subscribe to the changes of a model. Signals publish
+every change of a category, a location, a post or a user once its
+transaction commits; the transport carries it to the other processes,
+which apply what they received at the start of their next request, at
+most every ``POLL_INTERVAL`` seconds. A request therefore never sees an
+entry that another process dropped longer ago than that.
+
+A transport implements ``send(changes)`` and ``receive()``. Changes are
+``(model label, primary key)`` pairs; ``receive()`` returns the changes
+sent by other processes since its last call, or ``None`` when some may
+have been lost, in which case subscribers drop everything.
+``settings.INVALIDATION_BUS`` names the transport and its options. Both
+transports here only reach the processes of one host; one for several
+hosts implements the same two methods.
+"""
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_subscribers = defaultdict(list)
+_bus = None
+_bus_lock = threading.Lock()
+
+
+class SQLiteTransport:
+    """Changes kept as rows of a table in an SQLite database file.
+
+    Each process reads the rows added since it last looked. Rows older
+    than ``retention`` seconds are deleted, so a process that did not
+    look for that long may have missed changes.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, retention=600):
+        self.path = str(path)
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _connection(self):
+        # A forked process needs a connection and a name of its own.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._sender = uuid.uuid4().hex
+            self._last_id = None
+            self._received_at = None
+            self._sent = 0
+            self._database = sqlite3.connect(
+                self.path, timeout=5, isolation_level=None,
+                check_same_thread=False,
+            )
+            self._database.execute('PRAGMA journal_mode=WAL')
+            self._database.execute(
+                'CREATE TABLE IF NOT EXISTS changes ('
+                'id INTEGER PRIMARY KEY AUTOINCREMENT, sender TEXT NOT NULL, '
+                'model TEXT NOT NULL, pk TEXT NOT NULL, sent_at REAL NOT NULL)'
+            )
+        return self._database
+
+    def send(self, changes):
+        now = time.time()
+        with self._lock:
+            connection = self._connection()
+            connection.executemany(
+                'INSERT INTO changes (sender, model, pk, sent_at) '
+                'VALUES (?, ?, ?, ?)',
+                [
+                    (self._sender, label, json.dumps(pk), now)
+                    for label, pk in changes
+                ],
+            )
+            self._sent += 1
+            if self._sent % self.PRUNE_EVERY == 0:
+                connection.execute(
+                    'DELETE FROM changes WHERE sent_at < ?',
+                    (now - self.retention,),
+                )
+
+    def receive(self):
+        now = time.time()
+        with self._lock:
+            connection = self._connection()
+            if self._last_id is None or (
+                now - self._received_at > self.retention
+            ):
+                # Nothing was cached before the first look.
+                lost = self._last_id is not None
+                self._last_id = connection.execute(
+                    'SELECT coalesce(max(id), 0) FROM changes'
+                ).fetchone()[0]
+                self._received_at = now
+                return None if lost else []
+            rows = connection.execute(
+                'SELECT id, sender, model, pk FROM changes WHERE id > ? '
+                'ORDER BY id', (self._last_id,),
+            ).fetchall()
+            self._received_at = now
+            if rows:
+                self._last_id = rows[-1][0]
+            return [
+                (label, json.loads(pk))
+                for _, sender, label, pk in rows if sender != self._sender
+            ]
+
+
+class UnixSocketTransport:
+    """Changes sent as datagrams to a socket per process in ``directory``.
+
+    A datagram that does not fit in the queue of a process is replaced
+    by a marker file next to its socket, telling it that it missed
+    changes. Sockets of processes that exited are removed by senders.
+    """
+
+    CHANGES_PER_DATAGRAM = 500
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _socket(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._path = self.directory / (
+                f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock'
+            )
+            self._datagrams = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._datagrams.bind(str(self._path))
+            self._datagrams.setblocking(False)
+        return self._datagrams
+
+    def send(self, changes):
+        with self._lock:
+            sock = self._socket()
+            datagrams = [
+                json.dumps(
+                    changes[start:start + self.CHANGES_PER_DATAGRAM]
+                ).encode()
+                for start in range(
+                    0, len(changes), self.CHANGES_PER_DATAGRAM
+                )
+            ]
+            for path in self.directory.glob('*.sock'):
+                if path == self._path:
+                    continue
+                try:
+                    for datagram in datagrams:
+                        sock.sendto(datagram, str(path))
+                except (ConnectionRefusedError, FileNotFoundError):
+                    path.unlink(missing_ok=True)
+                except BlockingIOError:
+                    path.with_suffix('.lost').touch()
+
+    def receive(self):
+        with self._lock:
+            sock = self._socket()
+            changes = []
+            while True:
+                try:
+                    datagram = sock.recv(1 << 20)
+                except BlockingIOError:
+                    break
+                changes.extend(
+                    (label, pk) for label, pk in json.loads(datagram)
+                )
+            lost = self._path.with_suffix('.lost')
+            if lost.exists():
+                lost.unlink(missing_ok=True)
+                return None
+            return changes
+
+
+class _Bus:
+
+    def __init__(self, config):
+        self.config = config
+        self.transport = import_string(config['TRANSPORT'])(
+            **config.get('OPTIONS', {})
+        )
+        self.poll_interval = config.get('POLL_INTERVAL', 1.0)
+        self.next_poll = 0.0
+        self.lock = threading.Lock()
+
+
+def _get_bus():
+    global _bus
+    config = settings.INVALIDATION_BUS
+    bus = _bus
+    # Changed settings need a transport of their own.
+    if bus is None or bus.config is not config:
+        with _bus_lock:
+            if _bus is None or _bus.config is not config:
+                _bus = _Bus(config)
+            bus = _bus
+    return bus
+
+
+def subscribe(label, callback):
+    """Call ``callback`` with the primary keys of changed rows of a model.
+
+    ``label`` is the lower case label of the model, such as
+    ``'auth.user'``. ``callback`` receives a set of primary keys, or
+    ``None`` when changes may have been lost.
+    """
+    _subscribers[label].append(callback)
+
+
+def _deliver(changes):
+    if changes is None:
+        for callbacks in list(_subscribers.values()):
+            for callback in callbacks:
+                callback(None)
+        return
+    by_label = defaultdict(set)
+    for label, pk in changes:
+        by_label[label].add(pk)
+    for label, pks in by_label.items():
+        for callback in _subscribers.get(label, ()):
+            callback(pks)
+
+
+def _send(changes):
+    try:
+        _get_bus().transport.send(changes)
+    except Exception:
+        logger.exception('Could not send changes %r', changes)
+    else:
+        metrics.inc(
+            'blog_invalidation_changes_total', {'result': 'sent'},
+            len(changes),
+        )
+    _deliver(changes)
+
+
+def publish(instance):
+    """Send the change of ``instance`` to every process once committed."""
+    # The primary key of a deleted instance is cleared after the signals.
+    changes = [(instance._meta.label_lower, instance.pk)]
+    transaction.on_commit(lambda: _send(changes))
+
+
+def poll():
+    """Apply the changes received from other processes, when it is time."""
+    bus = _get_bus()
+    if time.monotonic() < bus.next_poll:
+        return
+    with bus.lock:
+        if time.monotonic() < bus.next_poll:
+            return
+        changes = bus.transport.receive()
+        bus.next_poll = time.monotonic() + bus.poll_interval
+        if changes is None:
+            metrics.inc('blog_invalidation_changes_total', {'result': 'lost'})
+        elif changes:
+            metrics.inc(
+                'blog_invalidation_changes_total', {'result': 'received'},
+                len(changes),
+            )
+        if changes != []:
+            _deliver(changes)
+
+
+class InvalidationMiddleware:
+    """Apply the changes made by other processes before each request.
+
+    Should come first, before any middleware that reads an in-process
+    cache.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        poll()
+        return self.get_response(request)
@@ -0,0 +1,44 @@
+"""Prefix lookups behind the choice widgets of post and comment forms.
+
+Lookups are range conditions on an indexed column, so that every request
+reads at most a page of index entries whatever the size of the table.
+"""
+from django.db.models import Q
+
+from . import constants
+
+# Sorts after any character that may follow the prefix.
+_MAX_CHAR = '\U0010ffff'
+
+
+def prefix_variants(prefix):
+    """Return the prefix as typed and with its first letter capitalized.
+
+    Range conditions are case sensitive; this keeps typing in lower case
+    working for names that start with a capital letter.
+    """
+    prefix = prefix.strip()
+    return list(dict.fromkeys((prefix, prefix[:1].upper() + prefix[1:])))
+
+
+def prefix_condition(field, prefix):
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': prefix + _MAX_CHAR})
+
+
+def lookup(queryset, field, prefix, limit=constants.LOOKUP_LIMIT):
+    """Return up to ``limit`` objects whose ``field`` starts with ``prefix``.
+
+    Also returns whether more objects match. Each variant of the prefix
+    is looked up by its own query, which walks the index in order and
+    stops after ``limit + 1`` rows.
+    """
+    found = {}
+    for variant in prefix_variants(prefix):
+        rows = queryset.filter(
+            prefix_condition(field, variant)
+        ).order_by(field, 'pk')[:limit + 1]
+        found.update((obj.pk, obj) for obj in rows)
+    objects = sorted(
+        found.values(), key=lambda obj: (getattr(obj, field), obj.pk)
+    )
+    return objects[:limit], len(objects) > limit
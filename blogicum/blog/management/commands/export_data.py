@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.export import BATCH_SIZE, EXPORTS, export, FORMATS
+
+
+class Command(BaseCommand):
+    help = (
+        'Write posts and comments as NDJSON records that import_data '
+        'reads, or as CSV, without loading them into memory.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', choices=EXPORTS, dest='names',
+            help='What to export; may be repeated. Everything by default.'
+        )
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument(
+            '--gzip', action='store_true', help='Compress the output.'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '-o', '--output', help='File to write; standard output if unset.'
+        )
+
+    def handle(self, *args, names, format, gzip, batch_size, output,
+               **options):
+        try:
+            chunks = export(names or list(EXPORTS), format, gzip, batch_size)
+        except ValueError as error:
+            raise CommandError(error)
+        file = open(output, 'wb') if output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                file.write(chunk)
+            file.flush()
+        finally:
+            if output:
+                file.close()
@@ -0,0 +1,413 @@
+import contextlib
+import itertools
+import operator
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from blog.caching import (AUTHORS_SCOPE, bump_versions, INDEX_SCOPE,
+                          TAXONOMY_SCOPE)
+from blog.models import Category, Comment, Location, Post
+from blog.rendering import make_excerpt, render_text
+from blog.search import index_suspended
+
+WORDS = (
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod '
+    'tempor incididunt ut labore et dolore magna aliqua enim ad minim '
+    'veniam quis nostrud exercitation ullamco laboris nisi aliquip ex ea '
+    'commodo consequat duis aute irure in reprehenderit voluptate velit '
+    'esse cillum eu fugiat nulla pariatur excepteur sint occaecat '
+    'cupidatat non proident sunt culpa qui officia deserunt mollit anim '
+    'id est laborum'
+).split()
+# Texts and titles are drawn from pools, so that generating a row costs
+# a few random numbers.
+POOL_SIZE = 1000
+YEARS_OF_POSTS = 3
+SCHEDULED_SHARE = 0.05
+SCHEDULED_DAYS = 30
+UNPUBLISHED_POST_SHARE = 0.02
+UNPUBLISHED_TAXONOMY_SHARE = 0.1
+LOCATED_POST_SHARE = 0.7
+_EPOCH = datetime(1970, 1, 1)
+
+
+def zipf_weights(n, exponent):
+    """Cumulative weights of ranks ``1..n`` under Zipf's law."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, n + 1)
+    ))
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the database with generated users, categories, locations, '
+        'posts and comments. Equal seeds give equal data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--locations', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=500000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='Number of rows sent to the database at once.'
+        )
+        parser.add_argument(
+            '--transaction-size', type=int, default=200000,
+            help=(
+                'Number of rows per transaction; on SQLite, per savepoint '
+                'of the single transaction of the run.'
+            )
+        )
+        parser.add_argument(
+            '--password', default='password',
+            help='Password of every generated user.'
+        )
+        parser.add_argument(
+            '--prefix', default='user',
+            help='Prefix of the generated usernames.'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 and (options['posts'] or options['comments']):
+            raise CommandError('Posts and comments need at least one user.')
+        if options['posts'] < 1 and options['comments']:
+            raise CommandError('Comments need at least one post.')
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        self.batch_size = options['batch_size']
+        self.transaction_size = options['transaction_size']
+        # Looked up once: every access to ``connection`` costs a lookup
+        # of the current context.
+        self._adapt_datetime = connection.ops.adapt_datetimefield_value
+        self._sqlite = connection.vendor == 'sqlite'
+        self.started = started = time.perf_counter()
+        with self._fast_sqlite(), index_suspended(connection):
+            users = self._create_users(
+                options['users'], options['prefix'], options['password']
+            )
+            categories = self._create_categories(options['categories'])
+            locations = self._create_locations(options['locations'])
+            comments_per_post = self._spread_comments(
+                options['posts'], options['comments']
+            )
+            first_post_id, pub_dates = self._create_posts(
+                options['posts'], users, categories, locations,
+                comments_per_post,
+            )
+            self._create_comments(
+                first_post_id, pub_dates, users, comments_per_post
+            )
+        # Rows were inserted without signals: drop every cached page.
+        bump_versions(TAXONOMY_SCOPE, AUTHORS_SCOPE, INDEX_SCOPE)
+        elapsed = time.perf_counter() - started
+        total = sum(
+            options[name] for name in
+            ('users', 'categories', 'locations', 'posts', 'comments')
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rows created: {total} in {elapsed:.1f} s'
+            f' ({total / elapsed:.0f} rows/s).'
+        ))
+
+    def _fast_sqlite(self):
+        if connection.vendor != 'sqlite':
+            return contextlib.nullcontext()
+        stack = contextlib.ExitStack()
+        # Generated data can be generated again: do not wait for the disk
+        # on every commit. SQLite refuses to change this in a transaction.
+        if not connection.in_atomic_block:
+            stack.enter_context(
+                _Pragmas(synchronous='OFF', temp_store='MEMORY')
+            )
+        # Building an index once from all rows is much faster than
+        # updating it for every inserted row. They are dropped in the
+        # transaction of the inserts: other connections never see the
+        # tables without them, and a failed run gets them back.
+        stack.enter_context(transaction.atomic())
+        for model in (Post, Comment):
+            stack.enter_context(_indexes_dropped(model._meta.db_table))
+        return stack
+
+    def _insert(self, model, rows):
+        """Insert ``rows``, dicts of database-ready values by field name.
+
+        Every concrete field of the model gets a column: those missing
+        from the rows get their default, except the primary key, left to
+        the database. Rows go through ``executemany`` rather than
+        ``bulk_create``: with model instances, building the SQL costs ten
+        times more than running it.
+        """
+        opts = model._meta
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return 0
+        given = [
+            field for field in opts.concrete_fields if field.name in first
+        ]
+        defaulted = [
+            field for field in opts.concrete_fields
+            if field.name not in first and not field.primary_key
+        ]
+        fields = given + defaulted
+        defaults = tuple(
+            field.get_db_prep_save(field.get_default(), connection)
+            for field in defaulted
+        )
+        values = operator.itemgetter(*(field.name for field in given))
+        rows = (
+            values(row) + defaults
+            for row in itertools.chain((first,), rows)
+        )
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        sql = (
+            f'INSERT INTO {quote(opts.db_table)} ({columns})'
+            f' VALUES ({placeholders})'
+        )
+        count = 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                inserted = count
+                while count - inserted < self.transaction_size:
+                    batch = list(itertools.islice(rows, self.batch_size))
+                    if not batch:
+                        break
+                    cursor.executemany(sql, batch)
+                    count += len(batch)
+            if count == inserted:
+                return count
+            self.stdout.write(
+                f'{opts.verbose_name_plural}: {count}'
+                f' ({time.perf_counter() - self.started:.1f} s)'
+            )
+
+    def _datetime(self, value):
+        return self._adapt_datetime(value)
+
+    def _phrases(self, low, high, size=POOL_SIZE):
+        return [
+            ' '.join(
+                self.rng.choices(WORDS, k=self.rng.randint(low, high))
+            ).capitalize()
+            for _ in range(size)
+        ]
+
+    def _create_users(self, n, prefix, password):
+        first_id = next_id(User)
+        password = make_password(password)
+        now = self._datetime(self.now)
+        names = [word.title() for word in WORDS]
+        self._insert(User, (
+            {
+                'id': pk, 'password': password, 'username': f'{prefix}{pk}',
+                'first_name': self.rng.choice(names),
+                'last_name': self.rng.choice(names),
+                'email': f'{prefix}{pk}@example.com', 'date_joined': now,
+            }
+            for pk in range(first_id, first_id + n)
+        ))
+        return list(range(first_id, first_id + n))
+
+    def _create_categories(self, n):
+        first_id = next_id(Category)
+        now = self._datetime(self.now)
+        titles = self._phrases(1, 3, n)
+        descriptions = self._phrases(5, 20, n)
+        self._insert(Category, (
+            {
+                'id': first_id + i,
+                'is_published': (
+                    self.rng.random() >= UNPUBLISHED_TAXONOMY_SHARE
+                ),
+                'created_at': now, 'title': titles[i],
+                'description': descriptions[i],
+                'slug': f'category-{first_id + i}',
+            }
+            for i in range(n)
+        ))
+        return list(range(first_id, first_id + n))
+
+    def _create_locations(self, n):
+        first_id = next_id(Location)
+        now = self._datetime(self.now)
+        names = self._phrases(1, 2, n)
+        self._insert(Location, (
+            {
+                'id': first_id + i,
+                'is_published': (
+                    self.rng.random() >= UNPUBLISHED_TAXONOMY_SHARE
+                ),
+                'created_at': now, 'name': names[i].title(),
+            }
+            for i in range(n)
+        ))
+        return list(range(first_id, first_id + n))
+
+    def _spread_comments(self, n_posts, n_comments):
+        """Return the number of comments of each post, by post index.
+
+        A few hot posts gather most of the comments.
+        """
+        if not n_posts:
+            return Counter()
+        indexes = list(range(n_posts))
+        self.rng.shuffle(indexes)
+        return Counter(self.rng.choices(
+            indexes, cum_weights=zipf_weights(n_posts, 1.0), k=n_comments
+        ))
+
+    def _texts(self):
+        texts = []
+        for _ in range(POOL_SIZE):
+            sentences = self._phrases(
+                5, 15, max(1, round(self.rng.lognormvariate(2.3, 0.7)))
+            )
+            text = '\n'.join(
+                ' '.join(sentence + '.' for sentence in sentences[i:i + 4])
+                for i in range(0, len(sentences), 4)
+            )
+            texts.append((text, make_excerpt(text), render_text(text)))
+        return texts
+
+    def _create_posts(self, n, users, categories, locations,
+                      comments_per_post):
+        """Create the posts; return the first id and every pub_date."""
+        first_id = next_id(Post)
+        rng = self.rng
+        texts = self._texts()
+        titles = self._phrases(2, 8)
+        # A few prolific authors write most of the posts.
+        authors = users[:]
+        rng.shuffle(authors)
+        author_weights = zipf_weights(len(authors), 1.1)
+        past = timedelta(days=365 * YEARS_OF_POSTS).total_seconds()
+        scheduled = timedelta(days=SCHEDULED_DAYS).total_seconds()
+        now = self.now.timestamp()
+        pub_dates = []
+
+        def rows():
+            for index in range(n):
+                if rng.random() < SCHEDULED_SHARE:
+                    pub_date = now + rng.uniform(0, scheduled)
+                else:
+                    pub_date = now - rng.uniform(0, past)
+                pub_dates.append(pub_date)
+                text, excerpt, text_html = rng.choice(texts)
+                yield {
+                    'id': first_id + index,
+                    'is_published': rng.random() >= UNPUBLISHED_POST_SHARE,
+                    'created_at': self._timestamp(min(pub_date, now)),
+                    'title': rng.choice(titles),
+                    'text': text,
+                    'pub_date': self._timestamp(pub_date),
+                    'author': rng.choices(
+                        authors, cum_weights=author_weights
+                    )[0],
+                    'location': (
+                        rng.choice(locations)
+                        if locations and rng.random() < LOCATED_POST_SHARE
+                        else None
+                    ),
+                    'category': (
+                        rng.choice(categories) if categories else None
+                    ),
+                    'comments_count': comments_per_post[index],
+                    'excerpt': excerpt,
+                    'text_html': text_html,
+                }
+
+        self._insert(Post, rows())
+        return first_id, pub_dates
+
+    def _timestamp(self, timestamp):
+        if self._sqlite:
+            # What the backend would store for the aware datetime, for a
+            # fraction of the cost.
+            return str(_EPOCH + timedelta(seconds=timestamp))
+        return self._adapt_datetime(
+            datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+        )
+
+    def _create_comments(self, first_post_id, pub_dates, users,
+                         comments_per_post):
+        rng = self.rng
+        texts = self._phrases(3, 40)
+        now = self.now.timestamp()
+
+        def rows():
+            for index, count in sorted(comments_per_post.items()):
+                # Comments arrive between the publication and now.
+                published = min(pub_dates[index], now)
+                for created in sorted(
+                    rng.uniform(published, now) for _ in range(count)
+                ):
+                    yield {
+                        'post': first_post_id + index,
+                        'author': rng.choice(users),
+                        'text': rng.choice(texts),
+                        'created_at': self._timestamp(created),
+                    }
+
+        self._insert(Comment, rows())
+
+
+@contextlib.contextmanager
+def _indexes_dropped(table):
+    """Drop the secondary indexes of an SQLite table inside the block.
+
+    Use it inside a transaction, so that the indexes come back even when
+    the process dies in the block.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index'"
+            ' AND tbl_name = %s AND sql IS NOT NULL', [table]
+        )
+        indexes = cursor.fetchall()
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+
+
+class _Pragmas:
+    """Set SQLite pragmas for the duration of a block."""
+
+    def __init__(self, **pragmas):
+        self.pragmas = pragmas
+        self.previous = {}
+
+    def __enter__(self):
+        with connection.cursor() as cursor:
+            for name, value in self.pragmas.items():
+                cursor.execute(f'PRAGMA {name}')
+                self.previous[name] = cursor.fetchone()[0]
+                cursor.execute(f'PRAGMA {name} = {value}')
+
+    def __exit__(self, *exc_info):
+        with connection.cursor() as cursor:
+            for name, value in self.previous.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
@@ -0,0 +1,297 @@
+import contextlib
+import gzip
+import json
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+
+from blog.caching import (AUTHORS_SCOPE, bump_versions, INDEX_SCOPE,
+                          TAXONOMY_SCOPE)
+from blog.management.commands.recount import actual_comments_count
+from blog.models import Category, Comment, ImportCheckpoint, Location, Post
+from blog.search import index_suspended
+
+# Labels of the models that can be imported, and the field by which
+# other records may refer to their rows instead of the primary key.
+MODELS = {
+    'auth.user': (User, 'username'),
+    'blog.category': (Category, 'slug'),
+    'blog.location': (Location, 'name'),
+    'blog.post': (Post, None),
+    'blog.comment': (Comment, None),
+}
+CHUNK_SIZE = 1 << 20
+# A record larger than this is taken for malformed input.
+MAX_RECORD_SIZE = 64 * CHUNK_SIZE
+# Resolved references kept per model; enough for every category and
+# location, while users are looked up again once it is exceeded.
+REFERENCE_CACHE_SIZE = 100000
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_records(file, chunk_size=CHUNK_SIZE):
+    """Yield the objects of a JSON array or of NDJSON read from ``file``.
+
+    Only a chunk of the input and the record being decoded are kept in
+    memory at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof, in_array = '', 0, False, None
+    while True:
+        position = _SEPARATORS.match(buffer, position).end()
+        if position == len(buffer):
+            if eof:
+                return
+            buffer, position = file.read(chunk_size), 0
+            eof = not buffer
+            continue
+        if in_array is None:
+            in_array = buffer[position] == '['
+            position += in_array
+            continue
+        if in_array and buffer[position] == ']':
+            return
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            # The record goes on in the next chunk, unless there is none.
+            chunk = '' if eof else file.read(chunk_size)
+            if not chunk or len(buffer) - position > MAX_RECORD_SIZE:
+                raise
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield record
+
+
+class References:
+    """Primary keys of referenced rows, looked up a batch at a time.
+
+    A reference is a primary key or, for models with a lookup field in
+    ``MODELS``, the value of that field, alone or in a list as Django
+    writes natural keys.
+    """
+
+    def __init__(self):
+        self._known = defaultdict(dict)
+
+    @staticmethod
+    def key(value):
+        if isinstance(value, list) and len(value) == 1:
+            value = value[0]
+        return value
+
+    def resolve(self, model, lookup_field, values):
+        """Look up the references in ``values`` that are not known yet."""
+        known = self._known[model]
+        missing = {value for value in values if value not in known}
+        if not missing:
+            return
+        if len(known) + len(missing) > REFERENCE_CACHE_SIZE:
+            known.clear()
+        pks = {value for value in missing if isinstance(value, int)}
+        known.update(
+            (pk, pk) for pk in
+            model.objects.filter(pk__in=pks).values_list('pk', flat=True)
+        )
+        names = missing - pks
+        if names and lookup_field is not None:
+            # The first of several rows with the same name wins.
+            for name, pk in model.objects.filter(**{
+                f'{lookup_field}__in': names
+            }).order_by('-pk').values_list(lookup_field, 'pk'):
+                known[name] = pk
+
+    def get(self, model, value):
+        return self._known[model].get(value)
+
+
+@contextlib.contextmanager
+def _imported_timestamps(models):
+    """Keep ``auto_now_add`` dates of the input instead of the current time.
+
+    ``bulk_create`` has no raw mode; the fields are only switched for the
+    duration of the command.
+    """
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Import users, categories, locations, posts and comments from a '
+        'dump in the format of dumpdata, as a JSON array or as one JSON '
+        'object per line, without loading it into memory.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source',
+            help='Path of the dump, compressed if it ends in .gz, or - to '
+                 'read standard input.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Number of records inserted per transaction.'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Continue an interrupted import of the same source.'
+        )
+
+    def handle(self, *args, source, batch_size, resume, **options):
+        name = source if source == '-' else str(Path(source).resolve())
+        checkpoint, _ = ImportCheckpoint.objects.get_or_create(source=name)
+        if checkpoint.records and not resume:
+            raise CommandError(
+                f'An import of {name} stopped after {checkpoint.records} '
+                'records: pass --resume to continue it.'
+            )
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.verbosity = options['verbosity']
+        self.references = References()
+        self.now = timezone.now()
+        self.imported = Counter()
+        started = time.perf_counter()
+        models = [model for model, _ in MODELS.values()]
+        # Dates set on creation default to now when the input has none.
+        self.timestamp_fields = {
+            field for model in models for field in model._meta.concrete_fields
+            if getattr(field, 'auto_now_add', False)
+            or getattr(field, 'auto_now', False)
+        }
+        with self._open(source) as file, _imported_timestamps(models):
+            records = islice(iter_records(file), checkpoint.records, None)
+            self._import(records, checkpoint.records)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+        # Rows were inserted without signals: drop every cached page.
+        bump_versions(TAXONOMY_SCOPE, AUTHORS_SCOPE, INDEX_SCOPE)
+        checkpoint.delete()
+        elapsed = time.perf_counter() - started
+        summary = ', '.join(
+            f'{count} {label}' for label, count in self.imported.items()
+        ) or 'nothing'
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {summary} in {elapsed:.1f} s.'
+        ))
+
+    def _open(self, source):
+        if source == '-':
+            return contextlib.nullcontext(sys.stdin)
+        if source.endswith('.gz'):
+            return gzip.open(source, 'rt', encoding='utf-8')
+        return open(source, encoding='utf-8')
+
+    def _import(self, records, done):
+        """Insert consecutive records of one model together."""
+        batch, label = [], None
+        for number, record in enumerate(records, done + 1):
+            if not isinstance(record, dict) or record.get('model') not in (
+                MODELS
+            ):
+                raise CommandError(
+                    f'Record {number} is not an object of a known model.'
+                )
+            if not isinstance(record.get('fields'), dict):
+                raise CommandError(f'Record {number} has no fields.')
+            if batch and (
+                record['model'] != label or len(batch) >= self.batch_size
+            ):
+                self._flush(label, batch, number - 1)
+                batch = []
+            label = record['model']
+            batch.append(record)
+        if batch:
+            self._flush(label, batch, number)
+
+    def _flush(self, label, records, last_number):
+        model = MODELS[label][0]
+        first_number = last_number - len(records) + 1
+        foreign_keys = [
+            field for field in model._meta.concrete_fields
+            if field.is_relation
+        ]
+        for field in foreign_keys:
+            related = field.related_model
+            self.references.resolve(
+                related,
+                MODELS.get(related._meta.label_lower, (None, None))[1],
+                {
+                    References.key(record['fields'][field.name])
+                    for record in records
+                    if record['fields'].get(field.name) is not None
+                },
+            )
+        objects = [
+            self._build(model, foreign_keys, record, number)
+            for number, record in enumerate(records, first_number)
+        ]
+        # Posts are indexed for search once per batch, in its transaction.
+        indexing = (
+            index_suspended(connection, [obj.pk for obj in objects if obj.pk])
+            if model is Post else contextlib.nullcontext()
+        )
+        with transaction.atomic(), indexing:
+            model.objects.bulk_create(objects, batch_size=self.batch_size)
+            if model is Comment:
+                Post.objects.filter(
+                    pk__in={obj.post_id for obj in objects}
+                ).update(comments_count=actual_comments_count())
+            self.checkpoint.records = last_number
+            self.checkpoint.save(update_fields=('records', 'updated_at'))
+        self.imported[model._meta.verbose_name_plural.lower()] += len(
+            objects
+        )
+        if self.verbosity > 1:
+            self.stdout.write(f'{last_number} records imported.')
+
+    def _build(self, model, foreign_keys, record, number):
+        fields = record['fields']
+        values = {}
+        for field in model._meta.concrete_fields:
+            if field.primary_key:
+                if record.get('pk') is not None:
+                    values[field.attname] = field.to_python(record['pk'])
+            elif field in foreign_keys:
+                value = fields.get(field.name)
+                if value is None:
+                    continue
+                pk = self.references.get(
+                    field.related_model, References.key(value)
+                )
+                if pk is None:
+                    raise CommandError(
+                        f'Record {number}: {field.name} {value!r} does not '
+                        'exist.'
+                    )
+                values[field.attname] = pk
+            elif field.name in fields:
+                values[field.attname] = field.to_python(fields[field.name])
+            elif field in self.timestamp_fields:
+                values[field.attname] = self.now
+        obj = model(**values)
+        if model is Post:
+            # The stored HTML is output unescaped: never take it from
+            # the dump.
+            obj.render_text()
+        return obj
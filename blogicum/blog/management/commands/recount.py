@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from blog.caching import bump_versions, post_scope, post_scopes
+from blog.models import Comment, Post
+
+
+def actual_comments_count():
+    return Coalesce(
+        Subquery(
+            Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+                'post'
+            ).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored number of comments of every post.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drifted = Post.objects.annotate(
+                actual=actual_comments_count()
+            ).exclude(comments_count=F('actual'))
+            # Updates send no signals; pages show the counters.
+            scopes = set()
+            for post in drifted.values('pk', 'category_id', 'author_id'):
+                scopes.add(post_scope(post['pk']))
+                scopes.update(
+                    post_scopes(post['category_id'], post['author_id'])
+                )
+            fixed = Post.objects.filter(
+                pk__in=drifted.values('pk')
+            ).update(comments_count=actual_comments_count())
+            transaction.on_commit(lambda: bump_versions(*scopes))
+        self.stdout.write(
+            self.style.SUCCESS(f'Comment counters fixed: {fixed}.')
+        )
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from blog.caching import bump_versions, post_scope, post_scopes
+from blog.models import Post
+from blog.rendering import render_post_texts
+
+
+def invalidate_post_pages(posts):
+    # Bulk updates send no signals.
+    scopes = set()
+    for post in posts:
+        scopes.add(post_scope(post.pk))
+        scopes.update(post_scopes(post.category_id, post.author_id))
+    bump_versions(*scopes)
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored excerpt and rendered text of posts.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of posts updated per query.'
+        )
+        parser.add_argument(
+            '--missing', action='store_true',
+            help='Only render posts that have no rendered text yet.'
+        )
+
+    def handle(self, *args, batch_size, missing, **options):
+        posts = Post.objects.all()
+        if missing:
+            posts = posts.filter(text_html='')
+        updated = render_post_texts(
+            posts, batch_size=batch_size, on_batch=invalidate_post_pages
+        )
+        self.stdout.write(self.style.SUCCESS(f'Posts rendered: {updated}.'))
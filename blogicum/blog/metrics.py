@@ -0,0 +1,227 @@
+"""Counters and histograms shared by every worker process.
+
+Each process adds to its own file in ``settings.METRICS_DIR``, mapped
+into memory, so recording a value costs a few memory writes and needs no
+lock between processes. The exposition view sums the files of all
+processes, including those that have exited, so totals never go back.
+Clear the directory when deploying a new release.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+# Name: (type, help). Histograms are recorded as their Prometheus series.
+METRICS = {
+    'blog_request_duration_seconds': (
+        'histogram', 'Time to answer a request, by URL name and status.'
+    ),
+    'blog_db_queries_total': (
+        'counter', 'Database queries run by requests, by URL name.'
+    ),
+    'blog_page_cache_requests_total': (
+        'counter', 'Page cache lookups, by result.'
+    ),
+    'blog_fragment_cache_requests_total': (
+        'counter', 'Post card and comment list lookups, by result.'
+    ),
+    'blog_local_cache_evictions_total': (
+        'counter', 'Entries dropped from the cache of a process, by reason.'
+    ),
+    'blog_invalidation_changes_total': (
+        'counter', 'Row changes sent to and received from other processes,'
+        ' and receptions that missed some, by result.'
+    ),
+    'blog_thumbnail_jobs_total': (
+        'counter', 'Picture resizing jobs, by state.'
+    ),
+}
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+_USED = struct.Struct('<Q')
+_KEY_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+_INITIAL_SIZE = 64 * 1024
+
+
+def _padded(length):
+    return length + (-length % 8)
+
+
+def _read_entries(data):
+    """Yield ``(key, value, value offset)`` for every entry of a file."""
+    used = _USED.unpack_from(data, 0)[0] if len(data) >= _USED.size else 0
+    position = _USED.size
+    while position < used:
+        length = _KEY_LENGTH.unpack_from(data, position)[0]
+        key_start = position + _KEY_LENGTH.size
+        value_at = _padded(key_start + length)
+        key = bytes(data[key_start:key_start + length]).decode()
+        yield key, _VALUE.unpack_from(data, value_at)[0], value_at
+        position = value_at + _VALUE.size
+
+
+class MappedValues:
+    """Float values by key in a file that only this process writes.
+
+    Entries are appended as the key length, the key padded to 8 bytes
+    and the value. The number of bytes used, stored first, is updated
+    last, so readers in other processes never see half an entry.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size < _INITIAL_SIZE:
+            self._file.truncate(_INITIAL_SIZE)
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        self._positions = {}
+        self._used = _USED.size
+        for key, _, value_at in _read_entries(self._map):
+            self._positions[key] = value_at
+            self._used = value_at + _VALUE.size
+        self._lock = threading.Lock()
+
+    def _append(self, key):
+        encoded = key.encode()
+        value_at = _padded(self._used + _KEY_LENGTH.size + len(encoded))
+        end = value_at + _VALUE.size
+        if end > len(self._map):
+            self._map.close()
+            self._file.truncate(max(end, 2 * os.fstat(
+                self._file.fileno()
+            ).st_size))
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        _KEY_LENGTH.pack_into(self._map, self._used, len(encoded))
+        key_start = self._used + _KEY_LENGTH.size
+        self._map[key_start:key_start + len(encoded)] = encoded
+        _VALUE.pack_into(self._map, value_at, 0.0)
+        _USED.pack_into(self._map, 0, end)
+        self._used = end
+        self._positions[key] = value_at
+        return value_at
+
+    def add(self, key, amount):
+        with self._lock:
+            value_at = self._positions.get(key)
+            if value_at is None:
+                value_at = self._append(key)
+            value = _VALUE.unpack_from(self._map, value_at)[0]
+            _VALUE.pack_into(self._map, value_at, value + amount)
+
+    @staticmethod
+    def read(path):
+        with open(path, 'rb') as file:
+            data = file.read()
+        return {key: value for key, value, _ in _read_entries(data)}
+
+
+_values = None
+_values_lock = threading.Lock()
+
+
+def _get_values():
+    global _values
+    path = Path(settings.METRICS_DIR) / f'{os.getpid()}.metrics'
+    values = _values
+    # A forked worker or changed settings need a file of their own.
+    if values is None or values.path != path:
+        with _values_lock:
+            if _values is None or _values.path != path:
+                _values = MappedValues(path)
+            values = _values
+    return values
+
+
+def _key(name, labels):
+    return json.dumps([name, labels or {}], sort_keys=True)
+
+
+def inc(name, labels=None, amount=1):
+    _get_values().add(_key(name, labels), amount)
+
+
+def observe(name, value, labels=None, buckets=DURATION_BUCKETS):
+    """Record ``value`` in the cumulative buckets of a histogram."""
+    values = _get_values()
+    labels = labels or {}
+    for bound in buckets:
+        if value <= bound:
+            values.add(
+                _key(f'{name}_bucket', {**labels, 'le': str(bound)}), 1
+            )
+    values.add(_key(f'{name}_bucket', {**labels, 'le': '+Inf'}), 1)
+    values.add(_key(f'{name}_sum', labels), value)
+    values.add(_key(f'{name}_count', labels), 1)
+
+
+def collect():
+    """Return the sum over all processes of every recorded series."""
+    totals = defaultdict(float)
+    directory = Path(settings.METRICS_DIR)
+    for path in sorted(directory.glob('*.metrics')):
+        for key, value in MappedValues.read(path).items():
+            totals[key] += value
+    return totals
+
+
+def _metric_name(series):
+    for suffix in ('_bucket', '_sum', '_count'):
+        if series.endswith(suffix) and series[:-len(suffix)] in METRICS:
+            return series[:-len(suffix)]
+    return series
+
+
+def _format_value(value):
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _sort_key(item):
+    (series, labels), _ = item
+    bound = labels.get('le')
+    return (
+        series,
+        sorted((k, v) for k, v in labels.items() if k != 'le'),
+        float(bound) if bound is not None else 0.0,
+    )
+
+
+def render():
+    """Return every metric in the Prometheus text exposition format."""
+    by_metric = defaultdict(list)
+    for key, value in collect().items():
+        series, labels = json.loads(key)
+        by_metric[_metric_name(series)].append(((series, labels), value))
+    lines = []
+    for name in sorted(by_metric):
+        metric_type, description = METRICS.get(name, ('untyped', ''))
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {metric_type}')
+        for (series, labels), value in sorted(
+            by_metric[name], key=_sort_key
+        ):
+            label_text = ','.join(
+                f'{label}="{_escape(labels[label])}"'
+                for label in sorted(
+                    labels, key=lambda label: (label == 'le', label)
+                )
+            )
+            if label_text:
+                series = f'{series}{{{label_text}}}'
+            lines.append(f'{series} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return (
+        str(value).replace('\\', r'\\').replace('\n', r'\n')
+        .replace('"', r'\"')
+    )
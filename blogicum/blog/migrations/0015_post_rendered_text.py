@@ -0,0 +1,30 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:19
+
+from django.db import migrations, models
+
+from blog.rendering import render_post_texts
+
+
+def fill_rendered_text(apps, schema_editor):
+    render_post_texts(apps.get_model('blog', 'Post').objects.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0014_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=512, verbose_name='Excerpt'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Rendered text'),
+        ),
+        migrations.RunPython(fill_rendered_text, migrations.RunPython.noop),
+    ]
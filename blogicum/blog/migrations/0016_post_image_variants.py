@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_post_rendered_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Width, height and file name of each resized copy.', verbose_name='Resized pictures'),
+        ),
+    ]
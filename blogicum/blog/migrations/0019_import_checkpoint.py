@@ -0,0 +1,22 @@
+# Generated by Django 3.2.16 on 2026-10-18 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0018_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=1024, unique=True)),
+                ('records', models.PositiveBigIntegerField(default=0, help_text='Number of input records imported so far.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
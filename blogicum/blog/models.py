@@ -3,6 +3,7 @@ from django.db import models
 from django.urls import reverse
 
 from . import constants
+from .rendering import make_excerpt, render_text
 
 
 class StatusModel(models.Model):
@@ -29,6 +30,7 @@ class Location(StatusModel):
     class Meta:
         verbose_name = 'location'
         verbose_name_plural = 'Locations'
+        indexes = (models.Index(fields=('name',), name='location_name_idx'),)
 
     def __str__(self):
         return self.name[:constants.MAX_LEN]
@@ -54,6 +56,9 @@ class Category(StatusModel):
     class Meta:
         verbose_name = 'category'
         verbose_name_plural = 'Categories'
+        indexes = (
+            models.Index(fields=('title',), name='category_title_idx'),
+        )
 
     def __str__(self):
         return self.title[:constants.MAX_LEN]
@@ -95,14 +100,116 @@ class Post(StatusModel):
         'The picture of the publication',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Comments'
+    )
+    excerpt = models.CharField(
+        max_length=constants.EXCERPT_MAX_LENGTH,
+        blank=True,
+        editable=False,
+        verbose_name='Excerpt'
+    )
+    text_html = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='Rendered text'
+    )
+    image_variants = models.JSONField(
+        default=list,
+        blank=True,
+        editable=False,
+        verbose_name='Resized pictures',
+        help_text='Width, height and file name of each resized copy.'
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'publication'
         verbose_name_plural = 'Publications'
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                condition=models.Q(is_published=True),
+                name='post_feed_idx',
+            ),
+            models.Index(
+                fields=('category', '-pub_date', '-id'),
+                condition=models.Q(is_published=True),
+                name='post_category_feed_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_feed_idx',
+            ),
+            models.Index(fields=('title',), name='post_title_idx'),
+        )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded category, so that moving the post to another
+        # category can invalidate the cached pages of both.
+        instance._loaded_category_id = instance.__dict__.get('category_id')
+        instance._loaded_image_name = instance.__dict__.get('image')
+        return instance
+
+    def save(self, *args, update_fields=None, **kwargs):
+        deferred_fields = self.get_deferred_fields()
+        if 'text' not in deferred_fields and (
+            update_fields is None or 'text' in update_fields
+        ):
+            self.render_text()
+            if update_fields is not None:
+                update_fields = {*update_fields, 'excerpt', 'text_html'}
+        # Resized copies of a replaced picture are dropped at once; the
+        # original is shown until the new ones are ready.
+        image_changed = 'image' not in deferred_fields and (
+            (self.image.name or '')
+            != (getattr(self, '_loaded_image_name', None) or '')
+        )
+        if image_changed:
+            # The copies stored by a worker since this post was loaded are
+            # not in ``image_variants`` yet.
+            self._replaced_image_variants = self.pk and type(
+                self
+            ).objects.filter(pk=self.pk).values_list(
+                'image_variants', flat=True
+            ).first() or []
+            self.image_variants = []
+            if update_fields is not None:
+                update_fields = {*update_fields, 'image_variants'}
+        self._image_changed = image_changed
+        super().save(*args, update_fields=update_fields, **kwargs)
+        self._loaded_image_name = self.image.name
+
+    def render_text(self):
+        self.excerpt = make_excerpt(self.text)
+        self.text_html = render_text(self.text)
+
+    @property
+    def image_thumbnail(self):
+        """Return the resized picture used as ``src``, if there is one."""
+        if not self.image_variants:
+            return None
+        fitting = [
+            variant for variant in self.image_variants
+            if variant['width'] <= constants.IMAGE_THUMBNAIL_WIDTH
+        ]
+        variant = max(fitting or self.image_variants,
+                      key=lambda variant: variant['width'])
+        return {**variant, 'url': self.image.storage.url(variant['name'])}
+
+    @property
+    def image_srcset(self):
+        return ', '.join(
+            f"{self.image.storage.url(variant['name'])} {variant['width']}w"
+            for variant in self.image_variants
+        )
 
     def comment_count(self):
-        return self.comments.count()
+        return self.comments_count
 
     def __str__(self):
         return self.title[:constants.MAX_LEN]
@@ -122,3 +229,31 @@ class Comment(StatusModel):
 
     class Meta:
         ordering = ('created_at',)
+        indexes = (
+            models.Index(
+                fields=('post', 'created_at', 'id'),
+                name='comment_thread_idx',
+            ),
+        )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the post the comment was loaded with, so that moving it
+        # to another post can be reflected in both counters.
+        instance._loaded_post_id = instance.__dict__.get('post_id')
+        return instance
+
+
+class ImportCheckpoint(models.Model):
+    """How far an interrupted ``import_data`` run got through its input."""
+
+    source = models.CharField(max_length=1024, unique=True)
+    records = models.PositiveBigIntegerField(
+        default=0,
+        help_text='Number of input records imported so far.'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.source}: {self.records}'
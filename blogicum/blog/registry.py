@@ -0,0 +1,134 @@
+"""In-process registries of categories, locations and user ids.
+
+Both taxonomy tables are tiny and rarely change, so each worker keeps
+them in memory instead of joining them into every feed query. The
+registry is reloaded whenever the taxonomy version in the shared cache
+moves, which happens on every change to a category or a location in any
+process.
+
+The registered instances are shared between requests: treat them as
+read-only.
+"""
+import threading
+from collections import OrderedDict
+
+from . import constants, invalidation
+from .caching import get_versions, TAXONOMY_SCOPE
+
+
+class TaxonomyRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._categories = {}
+        self._categories_by_slug = {}
+        self._locations = {}
+
+    def _load(self):
+        from .models import Category, Location
+
+        version = get_versions((TAXONOMY_SCOPE,))[0]
+        if version == self._version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            # The version is read before the rows: a change committed in
+            # between moves the version again and triggers another load.
+            categories = {
+                category.pk: category
+                for category in Category.objects.only(
+                    'title', 'description', 'slug', 'is_published'
+                )
+            }
+            self._categories_by_slug = {
+                category.slug: category
+                for category in categories.values() if category.is_published
+            }
+            self._categories = categories
+            self._locations = {
+                location.pk: location
+                for location in Location.objects.only('name', 'is_published')
+            }
+            self._version = version
+
+    def get_published_category(self, slug):
+        """Return the published category with ``slug`` or ``None``."""
+        self._load()
+        return self._categories_by_slug.get(slug)
+
+    def attach(self, posts):
+        """Set the category and location of ``posts`` from the registry.
+
+        Posts must be fetched without ``select_related`` for these two
+        relations. Unknown ids are left to be loaded lazily.
+        """
+        self._load()
+        category_field = _post_field('category')
+        location_field = _post_field('location')
+        for post in posts:
+            for field, objects in (
+                (category_field, self._categories),
+                (location_field, self._locations),
+            ):
+                obj = objects.get(getattr(post, field.attname))
+                if obj is not None:
+                    field.set_cached_value(post, obj)
+        return posts
+
+
+class UserRegistry:
+    """Ids of users by username, the least recently used first.
+
+    Profile pages look their user up by username on every request,
+    including those answered with 304. Entries are dropped when the
+    invalidation bus reports a change of their user.
+    """
+
+    def __init__(self, max_size=constants.USER_REGISTRY_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._ids = OrderedDict()
+
+    def get_id(self, username):
+        """Return the id of the user named ``username`` or ``None``."""
+        from django.contrib.auth.models import User
+
+        with self._lock:
+            user_id = self._ids.get(username)
+            if user_id is not None:
+                self._ids.move_to_end(username)
+                return user_id
+        # Unknown names are not kept: the user may be created later.
+        user_id = User.objects.filter(
+            username=username
+        ).values_list('pk', flat=True).first()
+        if user_id is not None:
+            with self._lock:
+                self._ids[username] = user_id
+                if len(self._ids) > self.max_size:
+                    self._ids.popitem(last=False)
+        return user_id
+
+    def forget(self, user_ids):
+        with self._lock:
+            if user_ids is None:
+                self._ids.clear()
+                return
+            for username in [
+                username for username, user_id in self._ids.items()
+                if user_id in user_ids
+            ]:
+                del self._ids[username]
+
+
+def _post_field(name):
+    from .models import Post
+
+    return Post._meta.get_field(name)
+
+
+taxonomy = TaxonomyRegistry()
+users = UserRegistry()
+invalidation.subscribe('auth.user', users.forget)
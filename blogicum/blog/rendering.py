@@ -0,0 +1,42 @@
+from django.template.defaultfilters import linebreaksbr
+from django.utils.text import Truncator
+
+from . import constants
+
+
+def make_excerpt(text):
+    """Return the post text as shown on post cards."""
+    excerpt = Truncator(text).words(constants.EXCERPT_WORDS, truncate=' …')
+    return Truncator(excerpt).chars(constants.EXCERPT_MAX_LENGTH)
+
+
+def render_text(text):
+    """Return the escaped post text with line breaks as ``<br>`` tags."""
+    return linebreaksbr(text, autoescape=True)
+
+
+def render_post_texts(posts, batch_size=1000, on_batch=None):
+    """Store the excerpt and rendered text of every post in ``posts``.
+
+    Works in primary key order with bulk updates, so it can be used on
+    tables of any size and on historical models in migrations.
+    ``on_batch`` is called with every list of posts once it is stored.
+    """
+    posts = posts.only('id', 'text', 'category_id', 'author_id').order_by(
+        'pk'
+    )
+    last_pk = None
+    updated = 0
+    while True:
+        batch = posts if last_pk is None else posts.filter(pk__gt=last_pk)
+        batch = list(batch[:batch_size])
+        if not batch:
+            return updated
+        for post in batch:
+            post.excerpt = make_excerpt(post.text)
+            post.text_html = render_text(post.text)
+        type(batch[0]).objects.bulk_update(batch, ('excerpt', 'text_html'))
+        if on_batch is not None:
+            on_batch(batch)
+        updated += len(batch)
+        last_pk = batch[-1].pk
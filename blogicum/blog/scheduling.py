@@ -0,0 +1,62 @@
+import math
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .caching import get_versions, INDEX_SCOPE
+from .models import Post
+
+PUBLICATION_WINDOW_KEY = 'blog:publication_window:{}'
+
+
+def _timestamp(value):
+    return None if value is None else value.timestamp()
+
+
+def _datetime(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=dt_timezone.utc)
+
+
+def publication_window():
+    """Return the last and the next ``pub_date`` around the current time.
+
+    Either may be ``None``. The answer is cached until the next deferred
+    publication goes live and keyed by the index version, so any change
+    to a post makes it recalculated.
+    """
+    version, = get_versions((INDEX_SCOPE,))
+    key = PUBLICATION_WINDOW_KEY.format(version)
+    now = timezone.now()
+    window = cache.get(key)
+    if window is None or window[1] is not None and (
+        window[1] <= now.timestamp()
+    ):
+        published = Post.objects.filter(is_published=True)
+        last_published = published.filter(
+            pub_date__lte=now
+        ).order_by('-pub_date').values_list('pub_date', flat=True).first()
+        next_published = published.filter(
+            pub_date__gt=now
+        ).order_by('pub_date').values_list('pub_date', flat=True).first()
+        window = (_timestamp(last_published), _timestamp(next_published))
+        timeout = None
+        if next_published is not None:
+            timeout = math.ceil((next_published - now).total_seconds())
+        cache.set(key, window, timeout)
+    return _datetime(window[0]), _datetime(window[1])
+
+
+def next_publication_time():
+    """Return when the next deferred publication goes live, or ``None``."""
+    return publication_window()[1]
+
+
+def seconds_until_next_publication():
+    """Return how long feeds may be cached, ``None`` meaning forever."""
+    pub_date = next_publication_time()
+    if pub_date is None:
+        return None
+    return max(0, (pub_date - timezone.now()).total_seconds())
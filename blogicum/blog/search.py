@@ -0,0 +1,151 @@
+"""Full-text search over post titles and texts.
+
+On SQLite posts are indexed in an FTS5 table that reads its content from
+``blog_post`` itself, so the index only stores tokens. Triggers keep it in
+sync with every insert, update and delete, including ``bulk_create`` and
+``QuerySet.update``. Other databases fall back to ``icontains`` lookups.
+"""
+import re
+from contextlib import contextmanager
+
+from django.db import connections, transaction
+from django.db.models import Q
+
+from . import constants
+
+FTS_TABLE = 'blog_post_fts'
+
+_CREATE_TABLE = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, text,
+        content='blog_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+_CREATE_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON blog_post
+    BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON blog_post
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF title, text ON blog_post
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, text)
+        VALUES ('delete', old.id, old.title, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, title, text)
+        VALUES (new.id, new.title, new.text);
+    END
+    """,
+)
+# Matches in the title weigh more than matches in the text.
+_RANK = f'bm25({FTS_TABLE}, 10.0, 1.0)'
+
+
+def install_search_index(connection, rebuild=False):
+    """Create the index and its triggers where they are missing.
+
+    Safe to run any number of times. Django rebuilds ``blog_post`` from
+    scratch for some schema changes on SQLite, which drops its triggers,
+    so this also runs after every ``migrate``. A newly created index, or
+    any index when ``rebuild`` is set, is filled from the existing posts;
+    returns whether it was.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        exists = FTS_TABLE in connection.introspection.table_names(cursor)
+        cursor.execute(_CREATE_TABLE)
+        for statement in _CREATE_TRIGGERS:
+            cursor.execute(statement)
+        if rebuild or not exists:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+            )
+            return True
+    return False
+
+
+@contextmanager
+def index_suspended(connection, pks=()):
+    """Stop indexing posts inside the block and index the new ones after it.
+
+    For bulk loads: indexing the rows at once is much faster than running
+    the triggers for every inserted row. The block is a transaction, so
+    that posts written by others never miss the triggers and a failure
+    brings them back. New posts are those with an id above the largest
+    one before the block, and those with an id in ``pks``.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with transaction.atomic(using=connection.alias):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT coalesce(max(id), 0) FROM blog_post')
+            last_id = cursor.fetchone()[0]
+            for trigger in ('insert', 'delete', 'update'):
+                cursor.execute(
+                    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{trigger}'
+                )
+        yield
+        if install_search_index(connection):
+            return
+        pks = list(pks)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, title, text)'
+                ' SELECT id, title, text FROM blog_post WHERE id > %s'
+                f' OR id IN ({", ".join(["%s"] * len(pks)) or "NULL"})',
+                [last_id, *pks],
+            )
+
+
+def install_after_migrate(using, **kwargs):
+    install_search_index(connections[using])
+
+
+def build_match_expression(query):
+    """Turn free text into an FTS5 query that cannot be malformed.
+
+    Every word is quoted, so operators and punctuation typed by users are
+    searched for literally instead of raising syntax errors. All words
+    must match; the last one may be a prefix of a longer word.
+    """
+    terms = re.findall(r'\w+', query)[:constants.SEARCH_MAX_TERMS]
+    if not terms:
+        return ''
+    return ' '.join(f'"{term}"' for term in terms) + '*'
+
+
+def search_posts(queryset, query):
+    """Filter ``queryset`` to posts matching ``query``, best matches first.
+
+    The ordering of ``queryset`` is kept only as a tie breaker.
+    """
+    match = build_match_expression(query)
+    if not match:
+        return queryset.none()
+    ordering = queryset.query.order_by
+    if connections[queryset.db].vendor != 'sqlite':
+        for term in re.findall(r'\w+', query)[:constants.SEARCH_MAX_TERMS]:
+            queryset = queryset.filter(
+                Q(title__icontains=term) | Q(text__icontains=term)
+            )
+        return queryset
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        select={'search_rank': _RANK},
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+    ).order_by('search_rank', *ordering)
@@ -0,0 +1,145 @@
+import threading
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import invalidation
+from .caching import (AUTHORS_SCOPE, bump_versions, category_scope,
+                      post_scope, post_scopes, profile_scope, TAXONOMY_SCOPE,
+                      viewer_scope)
+from .models import Category, Comment, Location, Post
+from .thumbnails import delete_image_variants, schedule_image_variants
+
+_local = threading.local()
+
+
+def _posts_being_deleted():
+    if not hasattr(_local, 'posts'):
+        _local.posts = set()
+    return _local.posts
+
+
+def _bump_versions(*scopes):
+    # A page rendered between this bump and the commit still shows the
+    # old rows under the new versions, hence the second bump once they
+    # are visible.
+    bump_versions(*scopes)
+    transaction.on_commit(lambda: bump_versions(*scopes))
+
+
+def _invalidate_comment_pages(*post_ids):
+    # Post cards show the number of comments.
+    scopes = [post_scope(post_id) for post_id in post_ids]
+    for post in Post.objects.filter(pk__in=post_ids).values(
+        'category_id', 'author_id'
+    ):
+        scopes.extend(post_scopes(post['category_id'], post['author_id']))
+    _bump_versions(*scopes)
+
+
+def _change_comments_count(post_id, delta):
+    posts = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        posts = posts.filter(comments_count__gte=-delta)
+    posts.update(comments_count=F('comments_count') + delta)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    old_post_id = getattr(instance, '_loaded_post_id', None)
+    if created:
+        _change_comments_count(instance.post_id, 1)
+        _invalidate_comment_pages(instance.post_id)
+    elif old_post_id is not None and old_post_id != instance.post_id:
+        _change_comments_count(old_post_id, -1)
+        _change_comments_count(instance.post_id, 1)
+        _invalidate_comment_pages(old_post_id, instance.post_id)
+    else:
+        _bump_versions(post_scope(instance.post_id))
+    instance._loaded_post_id = instance.post_id
+
+
+@receiver(pre_delete, sender=Post)
+def remember_deleted_post(sender, instance, **kwargs):
+    _posts_being_deleted().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def forget_deleted_post(sender, instance, **kwargs):
+    _posts_being_deleted().discard(instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    # Comments removed together with their post need no counter update.
+    if instance.post_id in _posts_being_deleted():
+        return
+    _change_comments_count(instance.post_id, -1)
+    _invalidate_comment_pages(instance.post_id)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_pages(sender, instance, **kwargs):
+    scopes = [
+        post_scope(instance.pk),
+        *post_scopes(instance.category_id, instance.author_id),
+    ]
+    loaded_category_id = getattr(instance, '_loaded_category_id', None)
+    if loaded_category_id not in (None, instance.category_id):
+        scopes.append(category_scope(loaded_category_id))
+    instance._loaded_category_id = instance.category_id
+    _bump_versions(*scopes)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_taxonomy_pages(sender, instance, **kwargs):
+    # Workers reload the taxonomy registry when the version moves.
+    _bump_versions(TAXONOMY_SCOPE)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_pages(sender, instance, update_fields=None, **kwargs):
+    # Logging in only refreshes `last_login`, which no page displays.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    _bump_versions(
+        AUTHORS_SCOPE, profile_scope(instance.pk), viewer_scope(instance.pk)
+    )
+
+
+@receiver((post_save, post_delete), sender=Category)
+@receiver((post_save, post_delete), sender=Location)
+@receiver((post_save, post_delete), sender=Post)
+@receiver((post_save, post_delete), sender=User)
+def publish_change(sender, instance, update_fields=None, **kwargs):
+    # In-process caches of every worker drop what they hold of the row.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidation.publish(instance)
+
+
+@receiver(post_save, sender=Post)
+def resize_post_image(sender, instance, raw=False, **kwargs):
+    if raw or not getattr(instance, '_image_changed', False):
+        return
+    delete_image_variants(
+        instance.image.storage,
+        getattr(instance, '_replaced_image_variants', []),
+    )
+    if instance.image:
+        schedule_image_variants(instance)
+
+
+@receiver(post_delete, sender=Post)
+def delete_post_image_variants(sender, instance, **kwargs):
+    delete_image_variants(instance.image.storage, instance.image_variants)
@@ -0,0 +1,18 @@
+from django import template
+
+from blog.fragments import render_post_cards
+from blog.holes import marker
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Return the cached or freshly rendered cards of ``posts``."""
+    return render_post_cards(posts)
+
+
+@register.simple_tag
+def hole(name, **params):
+    """Leave a region that ``HoleMiddleware`` renders for each viewer."""
+    return marker(name, params)
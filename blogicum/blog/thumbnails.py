@@ -0,0 +1,150 @@
+"""Resized copies of post pictures, made in a pool of worker processes.
+
+Saving a post with a new picture schedules a job once the transaction
+commits, so the upload request returns before any resizing happens.
+Workers only touch files; the parent process stores the result on the
+post and invalidates its cached pages. Copies of a picture that is
+replaced or whose post is deleted are removed once that commits.
+"""
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path, PurePosixPath
+
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from . import constants, metrics
+from .caching import bump_versions, post_scope, post_scopes
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'variants'
+
+_executor = None
+_pending = set()
+_pending_changed = threading.Condition()
+
+
+def make_variants(source, widths, quality):
+    """Write resized JPEG copies of the picture at ``source``.
+
+    Runs in a worker process. Returns the width, height and file name,
+    relative to the picture's directory, of every copy made. Copies are
+    never wider than the original; a picture narrower than every width
+    is still re-encoded once at its own size.
+    """
+    source = Path(source)
+    destination_dir = source.parent / VARIANTS_DIR
+    destination_dir.mkdir(parents=True, exist_ok=True)
+    variants = []
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        widths = [width for width in widths if width < image.width]
+        for width in widths or [image.width]:
+            height = max(1, round(image.height * width / image.width))
+            name = f'{source.stem}_{width}w.jpg'
+            image.resize((width, height), Image.Resampling.LANCZOS).save(
+                destination_dir / name, 'JPEG',
+                quality=quality, optimize=True, progressive=True,
+            )
+            variants.append({
+                'width': width,
+                'height': height,
+                'name': f'{VARIANTS_DIR}/{name}',
+            })
+    return variants
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=constants.IMAGE_WORKERS)
+    return _executor
+
+
+def schedule_image_variants(post):
+    """Resize the picture of ``post`` after the current transaction.
+
+    Workers read and write files directly, so pictures kept in a storage
+    without local paths are left as they are.
+    """
+    post_id, name = post.pk, post.image.name
+    try:
+        path = post.image.path
+    except NotImplementedError:
+        return
+    transaction.on_commit(lambda: _submit(post_id, name, path))
+
+
+def delete_image_variants(storage, variants):
+    """Remove the resized copies in ``variants`` after the transaction."""
+    names = [variant['name'] for variant in variants]
+    if names:
+        transaction.on_commit(lambda: _delete_files(storage, names))
+
+
+def _delete_files(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.exception('Could not delete the resized picture %s', name)
+
+
+def _submit(post_id, name, path):
+    future = _get_executor().submit(
+        make_variants,
+        path,
+        constants.IMAGE_VARIANT_WIDTHS,
+        constants.IMAGE_VARIANT_QUALITY,
+    )
+    metrics.inc('blog_thumbnail_jobs_total', {'state': 'submitted'})
+    with _pending_changed:
+        _pending.add(future)
+    submitted_from = threading.get_ident()
+    future.add_done_callback(
+        lambda future: _store_variants(post_id, name, future, submitted_from)
+    )
+
+
+def _store_variants(post_id, name, future, submitted_from):
+    from .models import Post
+
+    try:
+        directory = PurePosixPath(name).parent
+        variants = [
+            {**variant, 'name': str(directory / variant['name'])}
+            for variant in future.result()
+        ]
+        # The picture may have been replaced while it was being resized.
+        post = Post.objects.filter(pk=post_id, image=name)
+        if post.update(image_variants=variants):
+            post = post.values('category_id', 'author_id').get()
+            bump_versions(
+                post_scope(post_id),
+                *post_scopes(post['category_id'], post['author_id']),
+            )
+        else:
+            _delete_files(
+                Post._meta.get_field('image').storage,
+                [variant['name'] for variant in variants],
+            )
+        metrics.inc('blog_thumbnail_jobs_total', {'state': 'done'})
+    except Exception:
+        logger.exception('Could not resize the picture %s', name)
+        metrics.inc('blog_thumbnail_jobs_total', {'state': 'failed'})
+    finally:
+        # Callbacks normally run in the executor's own thread, whose
+        # connection is not managed by the request cycle.
+        if threading.get_ident() != submitted_from:
+            connection.close()
+        with _pending_changed:
+            _pending.discard(future)
+            _pending_changed.notify_all()
+
+
+def wait_for_variants(timeout=None):
+    """Block until every scheduled picture has been processed and stored."""
+    with _pending_changed:
+        return _pending_changed.wait_for(lambda: not _pending, timeout)
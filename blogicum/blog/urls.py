@@ -3,14 +3,19 @@ from django.urls import path, reverse_lazy
 
 from .views import (add_comment, category_posts, create_post,
                     DeleteCommentView, DeletePostView, edit_comment,
-                    EditPostView, EditProfileView, index, post_detail,
-                    profile)
+                    EditPostView, EditProfileView, export_data, index,
+                    lookup_choices, metrics_exposition, post_comments,
+                    post_detail, profile, search)
 
 
 app_name = 'blog'
 
 urlpatterns = [
     path('', index, name='index'),
+    path('search/', search, name='search'),
+    path('lookup/<slug:source>/', lookup_choices, name='lookup'),
+    path('internal/metrics/', metrics_exposition, name='metrics'),
+    path('internal/export/', export_data, name='export'),
     path('posts/create/', create_post, name='create_post'),
     path('posts/<int:post_id>/', post_detail, name='post_detail'),
     path('category/<slug:category_slug>/', category_posts,
@@ -21,6 +26,8 @@ urlpatterns = [
     path('posts/<int:post_id>/delete/',
          DeletePostView.as_view(),
          name='delete_post'),
+    path('posts/<int:post_id>/comments/', post_comments,
+         name='post_comments'),
     path('posts/<post_id>/comment/', add_comment, name='add_comment'),
     path('posts/<post_id>/edit_comment/<comment_id>/',
          edit_comment,
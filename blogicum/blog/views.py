@@ -1,52 +1,236 @@
+import hmac
+
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.core.paginator import Paginator
-from django.db.models import Count
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from django.conf import settings
+from django.http import (Http404, HttpResponse, HttpResponseBadRequest,
+                         JsonResponse, StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse, reverse_lazy
+from django.utils.http import urlencode
 from django.utils import timezone
 from django.views.generic import DeleteView, UpdateView
 
+from .caching import (cache_feed_page, category_scope, conditional_page,
+                      INDEX_SCOPE, post_scope, profile_scope,
+                      stale_on_database_error)
 from .forms import CommentForm, EditCommentForm, EditProfileForm, PostForm
-from .models import Category, Comment, Post
-from . import constants
+from .fragments import render_comment_list
+from .lookups import lookup
+from .models import Category, Comment, Location, Post
+from .paginators import CursorPaginator
+from .registry import taxonomy, users
+from .search import search_posts
+from . import constants, export, metrics
+
+
+def get_paginated_posts(request, post_list,
+                        posts_limit=constants.POSTS_LIMIT):
+    # Cards only show the excerpt, so the full text is never fetched.
+    post_list = post_list.defer('text', 'text_html')
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        page_obj = Paginator(post_list, posts_limit).get_page(page_number)
+    else:
+        page_obj = CursorPaginator(post_list, posts_limit).get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    return taxonomy.attach(page_obj)
 
 
-def get_paginated_posts(post_list, posts_limit):
-    return Paginator(post_list, posts_limit)
+def get_published_condition():
+    return Q(
+        pub_date__lte=timezone.now(),
+        is_published=True,
+        category__is_published=True,
+    )
 
 
 def get_base_post_queryset():
+    # Categories and locations of the cards come from the registry.
     return Post.objects.filter(
-        pub_date__lte=timezone.now(),
-        is_published=True,
-        category__is_published=True,
-    ).select_related(
-        'author',
-        'location',
-        'category'
-    ).annotate(
-        comment_count=Count('comments')
-    ).order_by('-pub_date')
+        get_published_condition()
+    ).select_related('author').order_by('-pub_date')
+
+
+def get_published_category(category_slug):
+    category = taxonomy.get_published_category(category_slug)
+    if category is None:
+        raise Http404('No Category matches the given query.')
+    return category
+
 
+def get_category_scopes(category_slug):
+    category = taxonomy.get_published_category(category_slug)
+    return None if category is None else (category_scope(category.pk),)
 
+
+def get_profile_scopes(username):
+    user_id = users.get_id(username)
+    return None if user_id is None else (profile_scope(user_id),)
+
+
+@conditional_page(lambda: (INDEX_SCOPE,))
 def index(request):
-    post_list = get_base_post_queryset()
-    page_number = request.GET.get('page')
-    page_obj = get_paginated_posts(
-        post_list, constants.POSTS_LIMIT
-    ).get_page(page_number)
-    return render(request, 'blog/index.html', {'page_obj': page_obj})
+    def render_page():
+        post_list = get_base_post_queryset()
+        page_obj = get_paginated_posts(request, post_list)
+        return render(request, 'blog/index.html', {'page_obj': page_obj})
+
+    return cache_feed_page(request, (INDEX_SCOPE,), render_page)
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        posts = search_posts(
+            get_base_post_queryset().defer('text', 'text_html'), query
+        )
+        page_obj = taxonomy.attach(
+            Paginator(posts, constants.POSTS_LIMIT).get_page(
+                request.GET.get('page')
+            )
+        )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return render(request, 'blog/search.html', context)
+
 
+LOOKUP_SOURCES = {
+    'categories': (lambda user: Category.objects.all(), 'title'),
+    'locations': (lambda user: Location.objects.all(), 'name'),
+    'posts': (
+        lambda user: Post.objects.filter(
+            get_published_condition() | Q(author=user.pk)
+        ),
+        'title',
+    ),
+}
 
+
+@login_required
+def lookup_choices(request, source):
+    """Return choices for a lookup widget whose label starts with ``q``."""
+    if source not in LOOKUP_SOURCES:
+        raise Http404('Unknown lookup.')
+    get_queryset, field = LOOKUP_SOURCES[source]
+    objects, more = lookup(
+        get_queryset(request.user).only('pk', field),
+        field,
+        request.GET.get('q', ''),
+    )
+    return JsonResponse({
+        'results': [{'id': obj.pk, 'text': str(obj)} for obj in objects],
+        'more': more,
+    })
+
+
+def metrics_exposition(request):
+    """Serve the metrics of all workers to scrapers and staff.
+
+    Scrapers send ``settings.METRICS_TOKEN`` as a bearer token; the
+    address of the client proves nothing behind a proxy.
+    """
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not (
+        token and hmac.compare_digest(
+            authorization.encode(), f'Bearer {token}'.encode()
+        )
+        or request.user.is_staff
+    ):
+        raise Http404('No such page.')
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4'
+    )
+
+
+@staff_member_required
+def export_data(request):
+    """Stream an export as a file download, for staff only.
+
+    ``model`` may be repeated; ``format`` and ``gzip`` are as in the
+    ``export_data`` command.
+    """
+    names = request.GET.getlist('model') or list(export.EXPORTS)
+    format = request.GET.get('format', 'ndjson')
+    compress = request.GET.get('gzip', '').lower() in ('1', 'true', 'yes')
+    try:
+        chunks = export.export(names, format, compress)
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        chunks, content_type=export.content_type(format, compress)
+    )
+    response['Content-Disposition'] = 'attachment; filename="{}"'.format(
+        export.filename(names, format, compress, timezone.localdate())
+    )
+    return response
+
+
+def get_visible_post(user, post_id):
+    """Return the post if ``user`` may see it, in a single query.
+
+    Published posts are visible to everyone, the rest only to their author.
+    """
+    post = get_object_or_404(
+        Post.objects.select_related(
+            'author', 'location', 'category'
+        ).annotate(is_visible=ExpressionWrapper(
+            get_published_condition(), output_field=BooleanField()
+        )),
+        id=post_id,
+    )
+    if not post.is_visible and post.author_id != user.pk:
+        raise Http404('No Post matches the given query.')
+    return post
+
+
+def get_comment_page(post, after=None):
+    return CursorPaginator(
+        post.comments.select_related('author'),
+        constants.COMMENTS_LIMIT,
+        field='created_at',
+        descending=False,
+    ).get_page(after=after)
+
+
+@conditional_page(lambda post_id: (post_scope(post_id),))
+def post_comments(request, post_id):
+    """Return a further page of comments as an HTML fragment or JSON."""
+    post = get_visible_post(request.user, post_id)
+    if request.GET.get('format') == 'json':
+        comments = get_comment_page(post, after=request.GET.get('after'))
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.id,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created_at': comment.created_at.isoformat(),
+                }
+                for comment in comments
+            ],
+            'next': comments.next_cursor,
+        })
+    return HttpResponse(render_comment_list(
+        post, get_comment_page, request.GET.get('after')
+    ))
+
+
+@stale_on_database_error
+@conditional_page(lambda post_id: (post_scope(post_id),))
 def post_detail(request, post_id):
-    post = get_object_or_404(Post.objects.select_related(
-        'author', 'location', 'category'), id=post_id)
-    if request.user != post.author:
-        post = get_object_or_404(get_base_post_queryset(), id=post_id)
-    comments = post.comments.all()
-    form = CommentForm()
+    post = get_visible_post(request.user, post_id)
     if request.method == 'POST':
         form = CommentForm(request.POST)
         if form.is_valid():
@@ -54,27 +238,36 @@ def post_detail(request, post_id):
             comment.post = post
             comment.author = request.user
             comment.save()
-    context = {'user': request.user,
-               'post': post,
-               'comments': comments,
-               'form': form}
-    return render(request, 'blog/detail.html', context)
+        # Shown by the comment form hole instead of an empty form.
+        request.comment_form = form
+
+    def render_page():
+        context = {
+            'post': post,
+            'comment_list': render_comment_list(post, get_comment_page),
+        }
+        return render(request, 'blog/detail.html', context)
+
+    # Only the author sees a post that is not published.
+    return cache_feed_page(
+        request, (post_scope(post.pk),), render_page, shared=post.is_visible
+    )
 
 
+@stale_on_database_error
+@conditional_page(get_category_scopes)
 def category_posts(request, category_slug):
-    category = get_object_or_404(
-        Category,
-        slug=category_slug,
-        is_published=True
+    category = get_published_category(category_slug)
+
+    def render_page():
+        posts = get_base_post_queryset().filter(category=category)
+        page_obj = get_paginated_posts(request, posts)
+        context = {'category': category, 'page_obj': page_obj}
+        return render(request, 'blog/category.html', context)
+
+    return cache_feed_page(
+        request, (category_scope(category.pk),), render_page
     )
-    posts = get_base_post_queryset().filter(category=category)
-    page_number = request.GET.get('page')
-    page_obj = get_paginated_posts(
-        posts,
-        constants.POSTS_LIMIT
-    ).get_page(page_number)
-    context = {'category': category, 'page_obj': page_obj}
-    return render(request, 'blog/category.html', context)
 
 
 @login_required
@@ -124,24 +317,35 @@ class DeletePostView(DeleteView):
         return self.render_to_response(self.get_context_data())
 
 
+@stale_on_database_error
+@conditional_page(get_profile_scopes)
 def profile(request, username):
-    user_profile = get_object_or_404(User, username=username)
-    if user_profile != request.user:
-        post_list = get_base_post_queryset().filter(author__username=username)
-    else:
-        post_list = user_profile.posts.all().select_related(
-            'author', 'location', 'category'
-        ).annotate(
-            comment_count=Count('comments')).order_by('-pub_date')
-    paginator = Paginator(post_list, constants.POSTS_LIMIT)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {
-        'profile': user_profile,
-        'page_obj': page_obj,
-        'user': request.user,
-    }
-    return render(request, 'blog/profile.html', context)
+    user_id = users.get_id(username)
+    if user_id is None:
+        raise Http404('No User matches the given query.')
+
+    def render_page():
+        # The registry may lag behind a rename in another process.
+        user_profile = get_object_or_404(User, pk=user_id, username=username)
+        if user_profile != request.user:
+            post_list = get_base_post_queryset().filter(author=user_profile)
+        else:
+            post_list = user_profile.posts.select_related(
+                'author'
+            ).order_by('-pub_date')
+        page_obj = get_paginated_posts(request, post_list)
+        context = {
+            'profile': user_profile,
+            'page_obj': page_obj,
+            'user': request.user,
+        }
+        return render(request, 'blog/profile.html', context)
+
+    # Authors see their unpublished posts and profile controls.
+    return cache_feed_page(
+        request, (profile_scope(user_id),), render_page,
+        shared=user_id != request.user.pk,
+    )
 
 
 class EditProfileView(LoginRequiredMixin, UpdateView):
@@ -0,0 +1,47 @@
+from django import forms
+from django.core.exceptions import ValidationError
+
+
+class LookupSelect(forms.Select):
+    """A select for a model choice that only renders the chosen option.
+
+    Other options are fetched from ``lookup_url`` as the user types, so
+    rendering the form does not load the whole table.
+    """
+
+    class Media:
+        js = ('js/lookup.js',)
+
+    def __init__(self, lookup_url, attrs=None):
+        super().__init__(attrs)
+        self.lookup_url = lookup_url
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-lookup-url'] = str(self.lookup_url)
+        return context
+
+    def _selected_choices(self, value):
+        iterator = self.choices
+        choices = []
+        if iterator.field.empty_label is not None:
+            choices.append(('', iterator.field.empty_label))
+        selected = [pk for pk in value if pk not in ('', None)]
+        if selected:
+            try:
+                choices.extend(
+                    iterator.choice(obj)
+                    for obj in iterator.queryset.filter(pk__in=selected)
+                )
+            except (ValueError, TypeError, ValidationError):
+                # Submitted data may hold anything but a primary key.
+                pass
+        return choices
+
+    def optgroups(self, name, value, attrs=None):
+        choices = self.choices
+        self.choices = self._selected_choices(value)
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
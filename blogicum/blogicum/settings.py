@@ -24,6 +24,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'blog.invalidation.InvalidationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
@@ -32,6 +33,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'blog.instrumentation.InstrumentationMiddleware',
+    'blog.holes.HoleMiddleware',
 ]
 
 INTERNAL_IPS = [
@@ -114,3 +117,48 @@ CSRF_FAILURE_VIEW = 'pages.views.csrf_failure'
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'
+
+# Every process keeps recently used entries in memory in front of the
+# cache shared by all processes. A database file stands in for the
+# shared cache here; deployments point it at memcached.
+CACHES = {
+    'default': {
+        'BACKEND': 'blog.cache_backends.TieredCache',
+        'LOCATION': 'blog',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_SIZE': 64 * 1024 * 1024,
+        },
+    },
+    'shared': {
+        'BACKEND': 'blog.cache_backends.SQLiteCache',
+        'LOCATION': BASE_DIR / 'cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+# Changes of rows reach the in-process caches of every worker through
+# this transport, which each worker reads at most every POLL_INTERVAL
+# seconds (see blog.invalidation).
+INVALIDATION_BUS = {
+    'TRANSPORT': 'blog.invalidation.SQLiteTransport',
+    'OPTIONS': {'path': BASE_DIR / 'invalidation.sqlite3'},
+    'POLL_INTERVAL': 0.5,
+}
+
+# Every worker process keeps its metrics in a file in this directory.
+METRICS_DIR = BASE_DIR / 'metrics'
+
+# Scrapers read /internal/metrics/ with the header
+# "Authorization: Bearer <METRICS_TOKEN>"; without a token only staff can.
+METRICS_TOKEN = None
+
+# Per-view limits checked by blog.instrumentation.InstrumentationMiddleware:
+# number of queries, milliseconds spent in queries and in templates.
+VIEW_BUDGETS = {
+    'blog:index': {'queries': 8, 'query_ms': 100, 'render_ms': 250},
+    'blog:post_detail': {'queries': 6, 'query_ms': 100, 'render_ms': 250},
+    'blog:category_posts': {'queries': 6, 'query_ms': 100, 'render_ms': 250},
+    'blog:profile': {'queries': 8, 'query_ms': 100, 'render_ms': 250},
+    'blog:post_comments': {'queries': 6, 'query_ms': 100, 'render_ms': 250},
+}
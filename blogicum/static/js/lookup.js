@@ -0,0 +1,33 @@
+// Fills selects marked with data-lookup-url from the lookup endpoint
+// as the user types into the search box placed above them.
+document.addEventListener('DOMContentLoaded', function () {
+  document.querySelectorAll('select[data-lookup-url]').forEach(function (select) {
+    const search = document.createElement('input');
+    search.type = 'search';
+    search.className = 'form-control mb-1';
+    search.placeholder = 'Start typing to find more';
+    select.before(search);
+    let timer = null;
+    search.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(function () {
+        const url = new URL(select.dataset.lookupUrl, window.location.href);
+        url.searchParams.set('q', search.value);
+        fetch(url)
+          .then(function (response) { return response.json(); })
+          .then(function (data) {
+            Array.from(select.options).forEach(function (option) {
+              if (option.value && !option.selected) {
+                option.remove();
+              }
+            });
+            data.results.forEach(function (result) {
+              if (String(result.id) !== select.value) {
+                select.add(new Option(result.text, result.id));
+              }
+            });
+          });
+      }, 250);
+    });
+  });
+});
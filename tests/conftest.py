@@ -41,6 +41,46 @@ def enable_debug_false():
         yield
 
 
+@pytest.fixture(autouse=True)
+def shared_cache(settings, tmp_path):
+    settings.CACHES = {
+        **settings.CACHES,
+        "shared": {
+            **settings.CACHES["shared"],
+            "LOCATION": tmp_path / "cache.sqlite3",
+        },
+    }
+    return settings.CACHES["shared"]
+
+
+@pytest.fixture(autouse=True)
+def clear_cache(shared_cache):
+    from django.core.cache import cache
+
+    from blog.registry import users
+
+    cache.clear()
+    # Ids of users rolled back with a previous test.
+    users.forget(None)
+    yield
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(settings, tmp_path):
+    settings.METRICS_DIR = tmp_path / "metrics"
+    return settings.METRICS_DIR
+
+
+@pytest.fixture(autouse=True)
+def invalidation_bus(settings, tmp_path):
+    settings.INVALIDATION_BUS = {
+        "TRANSPORT": "blog.invalidation.SQLiteTransport",
+        "OPTIONS": {"path": tmp_path / "invalidation.sqlite3"},
+        "POLL_INTERVAL": 0,
+    }
+    return settings.INVALIDATION_BUS
+
+
 class SafeImportFromContextManager:
     def __init__(
             self,
@@ -0,0 +1,131 @@
+import pytest
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _tiered_cache(name, **options):
+    from blog.cache_backends import _tiers, TieredCache
+
+    _tiers.pop(name, None)
+    return TieredCache(name, {"OPTIONS": {"CHECK_INTERVAL": 0, **options}})
+
+
+def test_local_entries_are_bounded_by_size():
+    cache = _tiered_cache(
+        "test-size", MAX_SIZE=10_000, MAX_ENTRY_SIZE=5000
+    )
+    for number in range(10):
+        cache.set(f"key{number}", "x" * 2000)
+    cache.get("key9")
+    stats = cache.stats()
+    assert stats["size"] <= 10_000
+    assert stats["evicted_size"] == 6, (
+        "Убедитесь, что при превышении размера из памяти процесса"
+        " вытесняются давно не использованные записи."
+    )
+    assert stats["local_hits"] == 1
+    assert cache.get("key0") == "x" * 2000, (
+        "Убедитесь, что вытесненные записи читаются из общего кеша."
+    )
+    assert cache.stats()["shared_hits"] == 1
+
+
+def test_local_hits_skip_the_shared_cache():
+    from django.core.cache import caches
+
+    cache = _tiered_cache("test-hits")
+    cache.set("key", {"value": 1})
+    caches["shared"].delete("key")
+    value = cache.get("key")
+    assert value == {"value": 1}
+    value["value"] = 2
+    assert cache.get("key") == {"value": 1}, (
+        "Убедитесь, что значения в памяти процесса не меняются вместе с"
+        " возвращёнными объектами."
+    )
+
+
+def test_changes_reach_other_processes():
+    first = _tiered_cache("test-first")
+    second = _tiered_cache("test-second")
+    first.set("key", "old")
+    assert second.get("key") == "old"
+    first.set("key", "new")
+    assert second.get("key") == "new", (
+        "Убедитесь, что запись, изменённая в одном процессе, не остаётся"
+        " устаревшей в памяти другого."
+    )
+    first.delete("key")
+    assert second.get("key") is None
+    assert second.stats()["evicted_invalidated"] == 2
+
+
+def test_missed_changes_drop_every_entry():
+    from django.core.cache import caches
+
+    from blog.cache_backends import CHANGES_KEY, GENERATION_KEY
+
+    first = _tiered_cache("test-first")
+    second = _tiered_cache("test-second")
+    second.set_many({"a": 1, "b": 2})
+    first.set("a", 3)
+    caches["shared"].delete(
+        CHANGES_KEY.format(caches["shared"].get(GENERATION_KEY))
+    )
+    assert second.get("b") == 2
+    assert second.stats()["entries"] == 1, (
+        "Убедитесь, что процесс, пропустивший изменения, очищает свои"
+        " записи."
+    )
+
+
+def test_sqlite_cache_counters_and_locks():
+    import time
+
+    from django.core.cache import caches
+
+    shared = caches["shared"]
+    assert shared.add("lock", True, 1)
+    assert not shared.add("lock", True, 1), (
+        "Убедитесь, что add() не заменяет действующую запись."
+    )
+    shared.set("expired", "old", 0.01)
+    time.sleep(0.02)
+    assert shared.add("expired", "new")
+    assert shared.get("expired") == "new"
+    shared.set("counter", 1, None)
+    assert shared.incr("counter", 5) == 6
+    with pytest.raises(ValueError):
+        shared.incr("missing")
+    shared.set_many({"flag": True, "values": [1, 2]})
+    assert shared.get_many(["flag", "values", "missing"]) == {
+        "flag": True, "values": [1, 2]
+    }
+
+
+def test_value_read_during_invalidation_is_not_kept(monkeypatch):
+    from django.core.cache import caches
+
+    cache = _tiered_cache("test-race")
+    other = _tiered_cache("test-race-other")
+    other.set("key", "old")
+    cache.get("other-key")
+    shared = caches["shared"]
+    read = shared.get
+
+    def read_then_change(key, *args, **kwargs):
+        value = read(key, *args, **kwargs)
+        if key == "key":
+            # Another thread applies a change while this one reads.
+            other.set("key", "new")
+            cache._local.next_check = 0
+            cache._check_changes()
+        return value
+
+    monkeypatch.setattr(shared, "get", read_then_change)
+    assert cache.get("key") == "old"
+    monkeypatch.setattr(shared, "get", read)
+    assert cache.get("key") == "new", (
+        "Убедитесь, что значение, прочитанное во время применения"
+        " изменений, не сохраняется в памяти процесса."
+    )
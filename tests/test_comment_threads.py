@@ -0,0 +1,69 @@
+import re
+from http import HTTPStatus
+
+import pytest
+
+pytestmark = [pytest.mark.django_db]
+
+N_COMMENTS = 60
+
+
+@pytest.fixture
+def many_comments(mixer, post_with_published_location):
+    return mixer.cycle(N_COMMENTS).blend(
+        "blog.Comment", post=post_with_published_location
+    )
+
+
+def _load_more_url(content):
+    match = re.search(r'href="(/posts/\d+/comments/\?after=[\w-]+)"', content)
+    return match.group(1) if match else None
+
+
+def test_thread_is_paginated_without_n_plus_one(
+        client, post_with_published_location, many_comments,
+        django_assert_num_queries
+):
+    from blog.constants import COMMENTS_LIMIT
+
+    from blog.caching import bump_versions, post_scope
+
+    url = f"/posts/{post_with_published_location.id}/"
+    client.get(url)
+    # Drop the cached comment list, as a new comment would.
+    bump_versions(post_scope(post_with_published_location.id))
+    with django_assert_num_queries(2):
+        response = client.get(url)
+    content = response.content.decode("utf-8")
+    assert content.count('name="comment_') == COMMENTS_LIMIT, (
+        "Убедитесь, что на странице публикации выводится только первая"
+        " страница комментариев."
+    )
+    more_url = _load_more_url(content)
+    assert more_url, (
+        "Убедитесь, что под комментариями есть ссылка на загрузку"
+        " следующих комментариев."
+    )
+
+    fragment = client.get(more_url).content.decode("utf-8")
+    assert fragment.count('name="comment_') == N_COMMENTS - COMMENTS_LIMIT
+    assert "<html" not in fragment
+    assert _load_more_url(fragment) is None
+
+    data = client.get(more_url + "&format=json").json()
+    assert [item["id"] for item in data["comments"]] == [
+        comment.id for comment in many_comments[COMMENTS_LIMIT:]
+    ]
+    assert data["next"] is None
+
+
+def test_comments_of_hidden_post_are_not_found(
+        client, mixer, user, published_category
+):
+    hidden = mixer.blend(
+        "blog.Post", author=user, is_published=False,
+        category=published_category
+    )
+    mixer.blend("blog.Comment", post=hidden)
+    response = client.get(f"/posts/{hidden.id}/comments/")
+    assert response.status_code == HTTPStatus.NOT_FOUND
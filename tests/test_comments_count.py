@@ -0,0 +1,92 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _refreshed_count(post):
+    post.refresh_from_db(fields=["comments_count"])
+    return post.comments_count
+
+
+def test_counter_follows_comments(
+        mixer, post_with_published_location, post_of_another_author
+):
+    comments = mixer.cycle(3).blend(
+        "blog.Comment", post=post_with_published_location
+    )
+    assert _refreshed_count(post_with_published_location) == 3, (
+        "Убедитесь, что при создании комментария увеличивается счётчик"
+        " `comments_count` публикации."
+    )
+    assert post_with_published_location.comment_count() == 3
+
+    comments[0].delete()
+    assert _refreshed_count(post_with_published_location) == 2, (
+        "Убедитесь, что при удалении комментария уменьшается счётчик"
+        " `comments_count` публикации."
+    )
+
+    moved = comments[1]
+    moved.refresh_from_db()
+    moved.post = post_of_another_author
+    moved.save()
+    assert _refreshed_count(post_with_published_location) == 1
+    assert _refreshed_count(post_of_another_author) == 1
+
+
+def test_cascade_delete_keeps_other_counters(
+        mixer, user, another_user, post_with_published_location,
+        post_of_another_author
+):
+    mixer.blend(
+        "blog.Comment", post=post_of_another_author, author=user
+    )
+    mixer.blend(
+        "blog.Comment", post=post_with_published_location,
+        author=another_user
+    )
+    another_user.delete()
+    assert _refreshed_count(post_with_published_location) == 0
+
+
+def test_feed_does_not_aggregate_comments(
+        client, mixer, post_with_published_location
+):
+    mixer.blend("blog.Comment", post=post_with_published_location)
+    with CaptureQueriesContext(connection) as ctx:
+        content = client.get("/").content.decode("utf-8")
+    assert "Comments (1)" in content
+    assert not any(
+        "GROUP BY" in query["sql"] for query in ctx.captured_queries
+    ), "Убедитесь, что лента не подсчитывает комментарии через `GROUP BY`."
+
+
+def test_recount_repairs_drift(mixer, post_with_published_location):
+    mixer.cycle(2).blend("blog.Comment", post=post_with_published_location)
+    type(post_with_published_location).objects.update(comments_count=7)
+    call_command("recount", stdout=StringIO())
+    assert _refreshed_count(post_with_published_location) == 2
+
+
+def test_recount_invalidates_pages(
+        client, mixer, post_with_published_location,
+        django_capture_on_commit_callbacks
+):
+    post = post_with_published_location
+    mixer.cycle(2).blend("blog.Comment", post=post)
+    type(post).objects.update(comments_count=7)
+    urls = ("/", f"/category/{post.category.slug}/")
+    for url in urls:
+        assert "Comments (7)" in client.get(url).content.decode()
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command("recount", stdout=StringIO())
+    for url in urls:
+        assert "Comments (2)" in client.get(url).content.decode(), (
+            "Убедитесь, что команда `recount` сбрасывает кеш страниц с"
+            " исправленными счётчиками комментариев."
+        )
@@ -0,0 +1,89 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _page_urls(post):
+    return (
+        "/",
+        f"/posts/{post.id}/",
+        f"/category/{post.category.slug}/",
+        f"/profile/{post.author.username}/",
+    )
+
+
+def test_pages_send_validators(client, post_with_published_location):
+    for url in _page_urls(post_with_published_location):
+        response = client.get(url)
+        assert response.has_header("ETag"), (
+            f"Убедитесь, что страница `{url}` отдаёт заголовок `ETag`."
+        )
+        assert response.has_header("Last-Modified"), (
+            f"Убедитесь, что страница `{url}` отдаёт заголовок"
+            " `Last-Modified`."
+        )
+
+
+def test_matching_etag_gets_not_modified(
+        client, post_with_published_location
+):
+    for url in _page_urls(post_with_published_location):
+        etag = client.get(url)["ETag"]
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == HTTPStatus.NOT_MODIFIED, (
+            f"Убедитесь, что страница `{url}` отвечает 304 на запрос с"
+            " совпадающим `If-None-Match`."
+        )
+        assert not response.content
+        assert not any(
+            "blog_post" in query["sql"] and "text" in query["sql"]
+            for query in ctx.captured_queries
+        ), "Убедитесь, что при ответе 304 публикации не загружаются."
+
+
+def test_if_modified_since_gets_not_modified(
+        client, post_with_published_location
+):
+    last_modified = client.get("/")["Last-Modified"]
+    response = client.get("/", HTTP_IF_MODIFIED_SINCE=last_modified)
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+
+
+def test_changes_and_viewers_change_etag(
+        client, user_client, mixer, post_with_published_location
+):
+    url = f"/posts/{post_with_published_location.id}/"
+    etag = client.get(url)["ETag"]
+    assert user_client.get(url)["ETag"] != etag, (
+        "Убедитесь, что `ETag` страницы различается для анонимного и"
+        " авторизованного пользователя."
+    )
+
+    mixer.blend("blog.Comment", post=post_with_published_location)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK, (
+        "Убедитесь, что после добавления комментария страница публикации"
+        " отдаётся заново."
+    )
+
+
+def test_new_csrf_secret_changes_etag(user_client, post_with_published_location):
+    url = f"/posts/{post_with_published_location.id}/"
+    # The first page sets the CSRF cookie.
+    user_client.get(url)
+    etag = user_client.get(url)["ETag"]
+    assert user_client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == (
+        HTTPStatus.NOT_MODIFIED
+    )
+    # Logging in again rotates the secret the page's forms were made for.
+    user_client.cookies["csrftoken"] = "a" * 64
+    response = user_client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == HTTPStatus.OK, (
+        "Убедитесь, что после смены CSRF-токена страница с формами"
+        " отдаётся заново."
+    )
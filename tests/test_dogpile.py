@@ -0,0 +1,134 @@
+import threading
+import time
+
+import pytest
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_one_worker_computes_a_missing_value():
+    from blog.caching import get_or_compute
+
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return "value"
+
+    def worker():
+        results.append(get_or_compute("dogpile-test", compute, timeout=60))
+
+    workers = [threading.Thread(target=worker) for _ in range(5)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    assert len(calls) == 1, (
+        "Убедитесь, что отсутствующее в кеше значение вычисляет только один"
+        " из одновременных запросов."
+    )
+    assert sorted(results) == [("value", "hit")] * 4 + [("value", "miss")]
+
+
+def test_entry_is_refreshed_before_expiry(monkeypatch):
+    from django.core.cache import cache
+
+    from blog import caching
+
+    # A value that takes 10 seconds to compute and expires in one.
+    cache.set("dogpile-test", ("old", time.time() + 1, 10.0))
+    monkeypatch.setattr(caching.random, "random", lambda: 0.0)
+    assert caching.get_or_compute("dogpile-test", lambda: "new") == (
+        "old", "hit"
+    )
+    monkeypatch.setattr(caching.random, "random", lambda: 0.5)
+    assert caching.get_or_compute("dogpile-test", lambda: "new") == (
+        "new", "refresh"
+    ), (
+        "Убедитесь, что дорогое значение с близким сроком истечения"
+        " вычисляется заранее."
+    )
+
+
+def test_feed_is_served_stale_while_another_worker_renders(
+        client, monkeypatch, mixer, post_with_published_location
+):
+    from django.core.cache import cache
+
+    client.get("/")
+    new_post = mixer.blend(
+        "blog.Post", category=post_with_published_location.category,
+        location=post_with_published_location.location,
+    )
+    # Every lock is taken by another worker.
+    monkeypatch.setattr(cache, "add", lambda *args, **kwargs: False)
+    response = client.get("/")
+    assert response.status_code == 200
+    content = response.content.decode()
+    assert post_with_published_location.title in content
+    assert new_post.title not in content, (
+        "Убедитесь, что пока главная страница обновляется другим процессом,"
+        " отдаётся её предыдущая версия."
+    )
+    assert "no-store" in response["Cache-Control"]
+
+
+def test_feed_is_served_stale_on_database_error(
+        client, monkeypatch, mixer, post_with_published_location
+):
+    from django.db import OperationalError
+
+    from blog import views
+
+    client.get("/")
+    mixer.blend(
+        "blog.Post", category=post_with_published_location.category,
+        location=post_with_published_location.location,
+    )
+
+    def failing_render(*args, **kwargs):
+        raise OperationalError("database is locked")
+
+    monkeypatch.setattr(views, "render", failing_render)
+    response = client.get("/")
+    assert response.status_code == 200
+    assert post_with_published_location.title in response.content.decode(), (
+        "Убедитесь, что при ошибке базы данных отдаётся предыдущая версия"
+        " страницы."
+    )
+
+
+def test_pages_are_served_stale_when_their_lookups_fail(
+        client, monkeypatch, post_with_published_location
+):
+    from django.db import OperationalError
+
+    from blog import views
+
+    post = post_with_published_location
+    urls = (
+        f"/posts/{post.id}/",
+        f"/category/{post.category.slug}/",
+        f"/profile/{post.author.username}/",
+    )
+    for url in urls:
+        client.get(url)
+
+    def failing_lookup(*args, **kwargs):
+        raise OperationalError("database is locked")
+
+    monkeypatch.setattr(views, "get_visible_post", failing_lookup)
+    monkeypatch.setattr(
+        views.taxonomy, "get_published_category", failing_lookup
+    )
+    monkeypatch.setattr(views.users, "get_id", failing_lookup)
+    for url in urls:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert post.title in response.content.decode(), (
+            f"Убедитесь, что при ошибке базы данных в поиске объекта"
+            f" страницы `{url}` отдаётся её предыдущая версия."
+        )
+        assert "no-store" in response["Cache-Control"]
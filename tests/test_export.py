@@ -0,0 +1,82 @@
+import csv
+import gzip
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def corpus():
+    call_command("generate_data", users=5, categories=3, locations=3,
+                 posts=25, comments=60, stdout=io.StringIO())
+
+
+def _export(tmp_path, *args):
+    path = tmp_path / "export"
+    call_command("export_data", "-o", str(path), "--batch-size", "7", *args)
+    return path.read_bytes()
+
+
+def test_ndjson_export_is_imported_back(corpus, tmp_path):
+    from blog.models import Comment, Post
+
+    lines = _export(tmp_path).decode().splitlines()
+    records = [json.loads(line) for line in lines]
+    assert [record["model"] for record in records] == (
+        ["blog.post"] * 25 + ["blog.comment"] * 60
+    )
+    post = Post.objects.get(pk=records[0]["pk"])
+    assert records[0]["fields"]["author"] == post.author_id
+    assert "text_html" not in records[0]["fields"]
+
+    comments = [line for line in lines if '"blog.comment"' in line]
+    (tmp_path / "comments.ndjson").write_text("\n".join(comments))
+    Comment.objects.all().delete()
+    call_command("import_data", str(tmp_path / "comments.ndjson"),
+                 stdout=io.StringIO())
+    assert Comment.objects.count() == 60
+
+
+def test_csv_export(corpus, tmp_path):
+    from blog.models import Post
+
+    rows = list(csv.reader(io.StringIO(
+        gzip.decompress(
+            _export(tmp_path, "--model", "posts", "--format", "csv", "--gzip")
+        ).decode()
+    )))
+    assert rows[0][:3] == ["id", "title", "text"]
+    assert [int(row[0]) for row in rows[1:]] == list(
+        Post.objects.order_by("pk").values_list("pk", flat=True)
+    )
+
+
+def test_export_view(corpus, client, user_client, admin_client):
+    url = "/internal/export/"
+    assert client.get(url).status_code == 302
+    assert user_client.get(url).status_code == 302, (
+        "Убедитесь, что выгрузка доступна только сотрудникам."
+    )
+    assert admin_client.get(
+        url, {"format": "csv"}
+    ).status_code == 400
+
+    response = admin_client.get(url, {"model": "comments", "gzip": "1"})
+    assert response.streaming
+    assert response["Content-Type"] == "application/gzip"
+    assert ".ndjson.gz" in response["Content-Disposition"]
+    chunks = iter(response.streaming_content)
+    first = next(chunks)
+    assert first, "Убедитесь, что данные отдаются по частям."
+    content = gzip.decompress(first + b"".join(chunks))
+    assert len(content.splitlines()) == 60
+
+    for flag in ("0", "false", ""):
+        response = admin_client.get(url, {"model": "comments", "gzip": flag})
+        assert response["Content-Type"] != "application/gzip", (
+            "Убедитесь, что `gzip=0` и `gzip=false` отключают сжатие."
+        )
@@ -0,0 +1,67 @@
+import pytest
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _fragment_counts(fragment):
+    from blog import metrics
+
+    counts = {}
+    for result in ("hit", "miss"):
+        key = metrics._key(
+            "blog_fragment_cache_requests_total",
+            {"fragment": fragment, "result": result},
+        )
+        counts[result] = metrics.collect().get(key, 0)
+    return counts
+
+
+def test_cards_are_shared_between_pages(
+        client, user, many_posts_with_published_locations
+):
+    client.get("/")
+    misses = _fragment_counts("post_card")["miss"]
+    assert misses > 0
+    # The profile of the author shows the same posts.
+    client.get(f"/profile/{user.username}/")
+    counts = _fragment_counts("post_card")
+    assert counts["miss"] == misses, (
+        "Убедитесь, что карточки публикаций берутся из кеша фрагментов."
+    )
+    assert counts["hit"] == misses
+
+
+def test_card_follows_its_post_and_taxonomy(
+        user_client, mixer, post_with_published_location
+):
+    post = post_with_published_location
+    user_client.get("/")
+    post.location.name = "Renamed place"
+    post.location.save()
+    assert "Renamed place" in user_client.get("/").content.decode()
+    mixer.blend("blog.Comment", post=post)
+    assert "Comments (1)" in user_client.get("/").content.decode(), (
+        "Убедитесь, что карточка обновляется при новых комментариях."
+    )
+    post.author.username = "renamed_author"
+    post.author.save()
+    assert "@renamed_author" in user_client.get("/").content.decode()
+
+
+def test_comment_controls_are_filled_per_viewer(
+        client, user_client, another_user_client, mixer, user,
+        post_with_published_location
+):
+    post = post_with_published_location
+    own = mixer.blend("blog.Comment", post=post, author=user)
+    url = f"/posts/{post.id}/"
+    edit_url = f"/posts/{post.id}/edit_comment/{own.id}/"
+    assert edit_url not in client.get(url).content.decode()
+    assert edit_url in user_client.get(url).content.decode(), (
+        "Убедитесь, что автор видит ссылки для правки своего комментария."
+    )
+    assert edit_url not in another_user_client.get(url).content.decode()
+    comments_url = f"/posts/{post.id}/comments/"
+    assert edit_url in user_client.get(comments_url).content.decode()
+    assert edit_url not in client.get(comments_url).content.decode()
+    assert _fragment_counts("comment_list")["hit"] >= 1
@@ -0,0 +1,98 @@
+from collections import Counter
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+
+pytestmark = [pytest.mark.django_db]
+
+OPTIONS = {
+    "users": 30, "categories": 20, "locations": 10, "posts": 300,
+    "comments": 2000, "batch_size": 70, "transaction_size": 150,
+}
+
+
+def _generate(**options):
+    call_command("generate_data", stdout=StringIO(),
+                 **{**OPTIONS, **options})
+
+
+def _snapshot():
+    from blog.models import Post
+
+    return list(Post.objects.order_by("pk").values_list(
+        "title", "text", "comments_count", "is_published"
+    ))
+
+
+def test_generated_data_is_consistent():
+    from blog.models import Category, Comment, Location, Post
+
+    _generate()
+    assert Post.objects.count() == OPTIONS["posts"]
+    assert Comment.objects.count() == OPTIONS["comments"]
+    assert Location.objects.count() == OPTIONS["locations"]
+    counts = Counter(Comment.objects.values_list("post_id", flat=True))
+    assert {
+        post.pk: post.comments_count
+        for post in Post.objects.filter(comments_count__gt=0)
+    } == counts, "Убедитесь, что счётчики комментариев совпадают с данными."
+
+    assert Post.objects.filter(pub_date__gt=timezone.now()).exists()
+    assert Post.objects.filter(is_published=False).exists()
+    assert Category.objects.filter(is_published=False).exists()
+    assert all(post.excerpt and post.text_html for post in Post.objects.all())
+    authors = Counter(Post.objects.values_list("author_id", flat=True))
+    assert authors.most_common(1)[0][1] > 3 * OPTIONS["posts"] / 30, (
+        "Убедитесь, что у нескольких авторов больше всего публикаций."
+    )
+    assert counts.most_common(1)[0][1] > 10 * OPTIONS["comments"] / 300
+
+
+def test_generation_is_reproducible(client):
+    from blog.models import Post
+
+    _generate(seed=7)
+    first = _snapshot()
+    Post.objects.all().delete()
+    _generate(seed=7)
+    assert _snapshot() == first, (
+        "Убедитесь, что одинаковое зерно даёт одинаковые данные."
+    )
+    _generate(seed=8)
+    assert _snapshot()[len(first):] != first
+
+    word = first[0][0].split()[0]
+    response = client.get("/search/", {"q": word})
+    assert len(response.context["page_obj"]) > 0
+
+
+@pytest.mark.skipif(
+    connection.vendor != "sqlite",
+    reason="Indexes are only dropped on SQLite.",
+)
+def test_failed_generation_keeps_indexes(monkeypatch):
+    from blog.management.commands.generate_data import Command
+
+    def index_names():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+                " AND tbl_name IN ('blog_post', 'blog_comment')"
+            )
+            return {name for name, in cursor.fetchall()}
+
+    indexes = index_names()
+
+    def failing_comments(*args, **kwargs):
+        raise RuntimeError("interrupted")
+
+    monkeypatch.setattr(Command, "_create_comments", failing_comments)
+    with pytest.raises(RuntimeError):
+        _generate()
+    assert index_names() == indexes, (
+        "Убедитесь, что прерванная генерация данных не оставляет таблицы"
+        " без индексов."
+    )
@@ -0,0 +1,64 @@
+import pytest
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _page_cache_counts():
+    from blog import metrics
+
+    return {
+        result: metrics.collect().get(metrics._key(
+            "blog_page_cache_requests_total", {"result": result}
+        ), 0)
+        for result in ("hit", "miss")
+    }
+
+
+def test_signed_in_viewers_share_cached_pages(
+        client, user_client, another_user_client, user, another_user,
+        post_with_published_location
+):
+    for page in ("/", f"/posts/{post_with_published_location.id}/"):
+        client.get(page)
+        user_content = user_client.get(page).content.decode()
+        another_content = another_user_client.get(page).content.decode()
+        assert f">{user.username}</a>" in user_content
+        assert f">{another_user.username}</a>" in another_content
+        assert f">{user.username}</a>" not in another_content, (
+            "Убедитесь, что шапка страницы выводится для каждого"
+            " пользователя отдельно."
+        )
+        assert "<!--hole:" not in user_content
+    assert _page_cache_counts() == {"hit": 4, "miss": 2}, (
+        "Убедитесь, что авторизованные пользователи получают страницы из"
+        " общего кеша."
+    )
+
+
+def test_detail_regions_follow_the_viewer(
+        client, user_client, another_user_client,
+        post_with_published_location
+):
+    post = post_with_published_location
+    url = f"/posts/{post.id}/"
+    edit_url = f"/posts/{post.id}/edit/"
+    content = client.get(url).content.decode()
+    assert edit_url not in content
+    assert "csrfmiddlewaretoken" not in content
+
+    response = user_client.get(url)
+    content = response.content.decode()
+    assert edit_url in content, (
+        "Убедитесь, что автор видит кнопки правки своей публикации."
+    )
+    assert "csrfmiddlewaretoken" in content
+    assert "csrftoken" in response.cookies
+    assert edit_url not in another_user_client.get(url).content.decode()
+
+
+def test_own_profile_is_not_shared(
+        client, user_client, user, post_with_published_location
+):
+    url = f"/profile/{user.username}/"
+    assert "/profile/edit_profile/" in user_client.get(url).content.decode()
+    assert "/profile/edit_profile/" not in client.get(url).content.decode()
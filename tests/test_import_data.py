@@ -0,0 +1,160 @@
+import gzip
+import io
+import json
+
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _records():
+    yield {"model": "auth.user", "pk": 50, "fields": {
+        "username": "old_author", "password": "!", "email": "",
+        "date_joined": "2015-03-01T10:00:00Z", "groups": [],
+    }}
+    yield {"model": "blog.category", "pk": None, "fields": {
+        "title": "Travel", "description": "Trips", "slug": "travel",
+        "is_published": True, "created_at": "2015-03-01T10:00:00Z",
+    }}
+    yield {"model": "blog.location", "pk": 7, "fields": {
+        "name": "Lisbon", "is_published": True,
+    }}
+    for pk in range(100, 130):
+        yield {"model": "blog.post", "pk": pk, "fields": {
+            "title": f"Old post {pk}", "text": f"Imported text\n{pk}",
+            "pub_date": "2016-01-01T00:00:00Z",
+            "created_at": "2016-01-01T00:00:00Z",
+            "author": ["old_author"], "category": "travel", "location": 7,
+        }}
+    for number in range(45):
+        yield {"model": "blog.comment", "pk": None, "fields": {
+            "text": f"Comment {number}", "post": 100 + number % 3,
+            "author": 50, "created_at": "2016-01-02T00:00:00Z",
+        }}
+
+
+def _write(path, records, ndjson=True):
+    with open(path, "w") as file:
+        if ndjson:
+            file.writelines(json.dumps(record) + "\n" for record in records)
+        else:
+            json.dump(list(records), file, indent=2)
+    return path
+
+
+def _import(path, *args):
+    call_command("import_data", str(path), "--batch-size", "7", *args,
+                 stdout=io.StringIO())
+
+
+def test_records_are_read_across_chunks():
+    from blog.management.commands.import_data import iter_records
+
+    records = [{"n": n, "text": "ж" * n} for n in range(40)]
+    for text in (json.dumps(records, indent=1),
+                 "\n".join(json.dumps(record) for record in records)):
+        assert list(iter_records(io.StringIO(text), chunk_size=16)) == (
+            records
+        )
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_records(io.StringIO('[{"n": 1}, {"n": '), chunk_size=4))
+
+
+@pytest.mark.parametrize("ndjson", (True, False))
+def test_import(tmp_path, client, ndjson):
+    from blog.models import Comment, ImportCheckpoint, Post
+
+    _import(_write(tmp_path / "dump.json", _records(), ndjson))
+    assert Post.objects.count() == 30
+    assert Comment.objects.count() == 45
+    post = Post.objects.get(pk=100)
+    assert post.author.username == "old_author"
+    assert post.category.slug == "travel" and post.location_id == 7
+    assert post.created_at.year == 2016, (
+        "Убедитесь, что даты создания берутся из выгрузки."
+    )
+    assert post.text_html == "Imported text<br>100"
+    assert post.comments_count == 15
+    assert Comment.objects.first().created_at.year == 2016
+    assert not ImportCheckpoint.objects.exists()
+
+    response = client.get("/search/", {"q": "Imported"})
+    assert response.context["page_obj"].paginator.count == 30
+    assert client.get("/posts/101/").status_code == 200
+
+
+def test_import_renders_text_itself(tmp_path, client):
+    records = list(_records())
+    records[3] = {**records[3], "fields": {
+        **records[3]["fields"],
+        "text_html": "<script>alert(1)</script>",
+        "excerpt": "<script>alert(2)</script>",
+    }}
+    _import(_write(tmp_path / "dump.json", records))
+    for url in ("/", "/posts/100/"):
+        content = client.get(url).content.decode()
+        assert "Imported text" in content
+        assert "<script>alert(" not in content, (
+            "Убедитесь, что HTML публикаций при импорте создаётся из их"
+            " текста, а не берётся из выгрузки."
+        )
+
+
+def test_import_is_resumed(tmp_path):
+    from blog.models import Comment, ImportCheckpoint, Post
+
+    records = list(_records())
+    broken = [*records]
+    broken[40] = {**records[40], "fields": {
+        **records[40]["fields"], "post": 999,
+    }}
+    path = _write(tmp_path / "dump.json", broken)
+    with pytest.raises(CommandError, match="Record 41"):
+        _import(path)
+    # Batches of seven records commit one by one: the posts and the
+    # comments before the broken batch made it.
+    assert ImportCheckpoint.objects.get().records == 40
+    assert Post.objects.count() == 30
+    with pytest.raises(CommandError, match="--resume"):
+        _import(path)
+
+    _write(path, records)
+    _import(path, "--resume")
+    assert Comment.objects.count() == 45
+    assert Post.objects.get(pk=100).comments_count == 15
+    assert not ImportCheckpoint.objects.exists()
+
+
+def test_interrupted_import_keeps_search_index(
+        tmp_path, client, mixer, published_category, published_location
+):
+    records = list(_records())
+    records[40] = {"model": "blog.comment", "pk": None}
+    with pytest.raises(CommandError, match="Record 41 has no fields"):
+        _import(_write(tmp_path / "dump.json", records))
+    response = client.get("/search/", {"q": "Imported"})
+    assert response.context["page_obj"].paginator.count == 30, (
+        "Убедитесь, что публикации из завершённых пакетов импорта"
+        " находятся поиском."
+    )
+    mixer.blend(
+        "blog.Post", title="Заметка после импорта",
+        category=published_category, location=published_location,
+    )
+    response = client.get("/search/", {"q": "Заметка"})
+    assert response.context["page_obj"].paginator.count == 1, (
+        "Убедитесь, что прерванный импорт не отключает индексацию новых"
+        " публикаций."
+    )
+
+
+def test_import_of_compressed_dump(tmp_path):
+    from blog.models import Post
+
+    path = tmp_path / "dump.json.gz"
+    with gzip.open(path, "wt") as file:
+        file.writelines(json.dumps(record) + "\n" for record in _records())
+    _import(path)
+    assert Post.objects.count() == 30
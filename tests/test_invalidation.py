@@ -0,0 +1,95 @@
+import tempfile
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _sqlite_transport(directory):
+    from blog.invalidation import SQLiteTransport
+
+    return SQLiteTransport(f"{directory}/changes.sqlite3")
+
+
+def _socket_transport(directory):
+    from blog.invalidation import UnixSocketTransport
+
+    return UnixSocketTransport(directory)
+
+
+@pytest.mark.parametrize(
+    "make_transport", [_sqlite_transport, _socket_transport]
+)
+def test_transports_deliver_changes_to_other_processes(make_transport):
+    # Socket paths must be short, which pytest temporary paths are not.
+    with tempfile.TemporaryDirectory() as directory:
+        first = make_transport(directory)
+        second = make_transport(directory)
+        assert first.receive() == []
+        assert second.receive() == []
+        first.send([("auth.user", 1), ("blog.category", 2)])
+        assert second.receive() == [("auth.user", 1), ("blog.category", 2)], (
+            "Убедитесь, что изменения доходят до других процессов."
+        )
+        assert second.receive() == []
+        assert first.receive() == [], (
+            "Убедитесь, что процесс не получает обратно свои изменения."
+        )
+
+
+def test_late_receiver_drops_everything(tmp_path):
+    first = _sqlite_transport(tmp_path)
+    second = _sqlite_transport(tmp_path)
+    second.receive()
+    first.send([("auth.user", 1)])
+    second._received_at -= second.retention + 1
+    assert second.receive() is None, (
+        "Убедитесь, что процесс, который мог пропустить изменения, узнаёт"
+        " об этом."
+    )
+
+
+def test_profile_lookup_is_kept_in_process(
+        client, user, post_with_published_location
+):
+    url = f"/profile/{user.username}/"
+    client.get(url)
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url, HTTP_IF_NONE_MATCH=client.get(url)["ETag"])
+    assert response.status_code == HTTPStatus.NOT_MODIFIED
+    assert not ctx.captured_queries, (
+        "Убедитесь, что id пользователя по его имени берётся из памяти"
+        " процесса."
+    )
+
+
+def test_profile_lookup_follows_changes(
+        client, user, django_capture_on_commit_callbacks
+):
+    from django.conf import settings
+    from django.contrib.auth.models import User
+
+    from blog.invalidation import SQLiteTransport
+
+    old_url = f"/profile/{user.username}/"
+    assert client.get(old_url).status_code == HTTPStatus.OK
+    with django_capture_on_commit_callbacks(execute=True):
+        user.username = "renamed"
+        user.save()
+    assert client.get(old_url).status_code == HTTPStatus.NOT_FOUND
+    assert client.get("/profile/renamed/").status_code == HTTPStatus.OK
+
+    # Another worker renames the user and publishes the change.
+    User.objects.filter(pk=user.pk).update(username="renamed_again")
+    SQLiteTransport(**settings.INVALIDATION_BUS["OPTIONS"]).send(
+        [("auth.user", user.pk)]
+    )
+    assert client.get("/profile/renamed/").status_code == (
+        HTTPStatus.NOT_FOUND
+    ), (
+        "Убедитесь, что изменения пользователя в другом процессе сбрасывают"
+        " его запись в памяти процесса."
+    )
@@ -0,0 +1,91 @@
+from http import HTTPStatus
+
+import pytest
+from bs4 import BeautifulSoup
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _options(content, name):
+    select = BeautifulSoup(content, "html.parser").find(
+        "select", {"name": name}
+    )
+    assert select is not None and select.get("data-lookup-url"), (
+        f"Убедитесь, что поле `{name}` выводится виджетом с поиском."
+    )
+    return [option["value"] for option in select.find_all("option")]
+
+
+def test_post_form_renders_only_selected_choices(
+        user_client, mixer, post_with_published_location
+):
+    mixer.cycle(30).blend("blog.Category")
+    mixer.cycle(30).blend("blog.Location")
+    content = user_client.get("/posts/create/").content.decode()
+    assert _options(content, "category") == [""], (
+        "Убедитесь, что форма публикации не выводит все категории."
+    )
+    assert _options(content, "location") == [""]
+
+    post = post_with_published_location
+    content = user_client.get(f"/posts/{post.id}/edit/").content.decode()
+    assert _options(content, "category") == ["", str(post.category_id)]
+    assert _options(content, "location") == ["", str(post.location_id)]
+
+
+def test_edit_comment_form_does_not_load_every_post(
+        user_client, mixer, user, post_with_published_location,
+        django_assert_max_num_queries
+):
+    comment = mixer.blend(
+        "blog.Comment", author=user, post=post_with_published_location
+    )
+    mixer.cycle(30).blend("blog.Post", author=user)
+    url = f"/posts/{comment.post_id}/edit_comment/{comment.id}/"
+    with django_assert_max_num_queries(6):
+        content = user_client.get(url).content.decode()
+    assert _options(content, "post") == ["", str(comment.post_id)], (
+        "Убедитесь, что форма комментария не выводит все публикации."
+    )
+    response = user_client.post(
+        url, {"text": "Новый текст", "post": "not a number"}
+    )
+    assert response.status_code == HTTPStatus.OK
+    assert _options(response.content.decode(), "post") == [""]
+
+
+def test_lookup_endpoints(
+        user_client, client, mixer, user, published_category
+):
+    from blog.constants import LOOKUP_LIMIT
+
+    mixer.cycle(LOOKUP_LIMIT + 5).blend(
+        "blog.Location", name=(f"Москва {i:02d}" for i in range(100))
+    )
+    mixer.blend("blog.Location", name="Мурманск")
+    data = user_client.get("/lookup/locations/", {"q": "моск"}).json()
+    assert len(data["results"]) == LOOKUP_LIMIT and data["more"], (
+        "Убедитесь, что поиск вариантов выдаёт ограниченное число записей."
+    )
+    assert data["results"][0]["text"] == "Москва 00"
+    data = user_client.get("/lookup/locations/", {"q": "Мур"}).json()
+    assert [item["text"] for item in data["results"]] == ["Мурманск"]
+    assert not data["more"]
+
+    visible = mixer.blend(
+        "blog.Post", title="Лето", category=published_category
+    )
+    mixer.blend(
+        "blog.Post", title="Лес", category=published_category,
+        is_published=False
+    )
+    own = mixer.blend(
+        "blog.Post", title="Лебедь", author=user, is_published=False
+    )
+    data = user_client.get("/lookup/posts/", {"q": "ле"}).json()
+    assert [item["id"] for item in data["results"]] == [own.id, visible.id]
+
+    assert user_client.get("/lookup/users/").status_code == (
+        HTTPStatus.NOT_FOUND
+    )
+    assert client.get("/lookup/posts/").status_code == HTTPStatus.FOUND
@@ -0,0 +1,101 @@
+import multiprocessing
+import re
+from http import HTTPStatus
+
+import pytest
+
+pytestmark = [pytest.mark.django_db]
+
+TOKEN = "scraper-token"
+
+
+@pytest.fixture(autouse=True)
+def metrics_token(settings):
+    settings.METRICS_TOKEN = TOKEN
+
+
+def _scrape(client):
+    return client.get(
+        "/internal/metrics/", HTTP_AUTHORIZATION=f"Bearer {TOKEN}"
+    )
+
+
+def _series(client):
+    response = _scrape(client)
+    assert response.status_code == HTTPStatus.OK
+    assert response["Content-Type"].startswith("text/plain")
+    values = {}
+    for line in response.content.decode().splitlines():
+        if line and not line.startswith("#"):
+            series, value = line.rsplit(" ", 1)
+            values[series] = float(value)
+    return values
+
+
+def test_requests_are_measured(client, post_with_published_location):
+    client.get("/")
+    client.get("/")
+    values = _series(client)
+    labels = 'status="200",view="blog:index"'
+    assert values[f"blog_request_duration_seconds_count{{{labels}}}"] == 2, (
+        "Убедитесь, что длительность запросов учитывается по имени URL"
+        " и статусу."
+    )
+    assert values[
+        f'blog_request_duration_seconds_bucket{{{labels},le="+Inf"}}'
+    ] == 2
+    assert values['blog_db_queries_total{view="blog:index"}'] > 0
+    assert values['blog_page_cache_requests_total{result="miss"}'] == 1
+    assert values['blog_page_cache_requests_total{result="hit"}'] == 1
+
+
+def _record_in_child():
+    from blog import metrics
+
+    for _ in range(5):
+        metrics.inc("blog_thumbnail_jobs_total", {"state": "done"})
+
+
+def test_metrics_of_all_processes_are_summed(client):
+    from blog import metrics
+
+    metrics.inc("blog_thumbnail_jobs_total", {"state": "done"})
+    child = multiprocessing.get_context("fork").Process(
+        target=_record_in_child
+    )
+    child.start()
+    child.join()
+    assert child.exitcode == 0
+    assert _series(client)[
+        'blog_thumbnail_jobs_total{state="done"}'
+    ] == 6, "Убедитесь, что метрики всех процессов суммируются."
+
+
+def test_exposition_format(client):
+    client.get("/")
+    content = _scrape(client).content.decode()
+    assert "# TYPE blog_request_duration_seconds histogram" in content
+    assert re.search(
+        r'^blog_request_duration_seconds_sum\{[^}]+\} \d', content, re.M
+    )
+
+
+def test_metrics_need_token_or_staff(client, admin_client, settings):
+    # Behind a proxy every request comes from an internal address.
+    response = client.get("/internal/metrics/", REMOTE_ADDR="127.0.0.1")
+    assert response.status_code == HTTPStatus.NOT_FOUND, (
+        "Убедитесь, что метрики не отдаются по одному адресу клиента."
+    )
+    for authorization in ("Bearer wrong", "Bearer жетон"):
+        response = client.get(
+            "/internal/metrics/", HTTP_AUTHORIZATION=authorization
+        )
+        assert response.status_code == HTTPStatus.NOT_FOUND
+    assert admin_client.get("/internal/metrics/").status_code == (
+        HTTPStatus.OK
+    )
+    settings.METRICS_TOKEN = None
+    assert _scrape(client).status_code == HTTPStatus.NOT_FOUND, (
+        "Убедитесь, что без `METRICS_TOKEN` метрики доступны только"
+        " сотрудникам."
+    )
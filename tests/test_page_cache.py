@@ -0,0 +1,108 @@
+import time
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_repeated_feed_hit_skips_database(
+        client, post_with_published_location
+):
+    client.get("/")
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get("/")
+    assert response.status_code == 200
+    assert post_with_published_location.title in response.content.decode()
+    assert not ctx.captured_queries, (
+        "Убедитесь, что повторный запрос главной страницы анонимным"
+        " пользователем отдаётся из кеша без обращений к базе данных."
+    )
+
+
+def test_post_changes_invalidate_feed(
+        client, mixer, post_with_published_location
+):
+    client.get("/")
+    post_with_published_location.title = "Renamed post title"
+    post_with_published_location.save()
+    assert "Renamed post title" in client.get("/").content.decode()
+
+    mixer.blend("blog.Comment", post=post_with_published_location)
+    assert "Comments (1)" in client.get("/").content.decode(), (
+        "Убедитесь, что после добавления комментария кеш ленты сбрасывается."
+    )
+
+    category = post_with_published_location.category
+    category_url = f"/category/{category.slug}/"
+    client.get(category_url)
+    category.title = "Renamed category"
+    category.save()
+    assert "Renamed category" in client.get(category_url).content.decode()
+
+
+def test_owner_sees_own_unpublished_posts(
+        client, user, user_client, mixer, published_category
+):
+    hidden = mixer.blend(
+        "blog.Post", author=user, is_published=False,
+        category=published_category
+    )
+    url = f"/profile/{user.username}/"
+    assert hidden.title not in client.get(url).content.decode()
+    assert hidden.title in user_client.get(url).content.decode(), (
+        "Убедитесь, что кеш страницы пользователя не скрывает от автора его"
+        " снятые с публикации посты."
+    )
+
+
+def test_scheduled_post_appears_when_it_goes_live(
+        client, mixer, user, published_category, post_with_published_location
+):
+    go_live = timezone.now() + timedelta(seconds=1.5)
+    scheduled = mixer.blend(
+        "blog.Post", author=user, category=published_category,
+        pub_date=go_live
+    )
+    assert scheduled.title not in client.get("/").content.decode()
+    with CaptureQueriesContext(connection) as ctx:
+        client.get("/")
+    assert not ctx.captured_queries, (
+        "Убедитесь, что до публикации отложенного поста лента отдаётся из"
+        " кеша."
+    )
+
+    time.sleep(max(0, (go_live - timezone.now()).total_seconds()) + 0.1)
+    assert scheduled.title in client.get("/").content.decode(), (
+        "Убедитесь, что отложенный пост появляется в закешированной ленте"
+        " сразу после наступления даты публикации."
+    )
+
+
+def test_changes_bump_versions_again_on_commit(
+        mixer, user, post_with_published_location,
+        django_capture_on_commit_callbacks
+):
+    from blog.caching import (get_versions, INDEX_SCOPE, post_scope,
+                              profile_scope)
+
+    post = post_with_published_location
+    changes = {
+        "публикации": (lambda: post.save(), post_scope(post.pk)),
+        "комментария": (
+            lambda: mixer.blend("blog.Comment", post=post), INDEX_SCOPE
+        ),
+        "пользователя": (lambda: user.save(), profile_scope(user.pk)),
+    }
+    for description, (change, scope) in changes.items():
+        with django_capture_on_commit_callbacks(execute=True):
+            change()
+            # A page rendered now may read rows of before the commit.
+            before_commit = get_versions((scope,))
+        assert get_versions((scope,)) != before_commit, (
+            f"Убедитесь, что после фиксации транзакции изменения"
+            f" {description} версии страниц меняются ещё раз."
+        )
@@ -0,0 +1,124 @@
+import re
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from conftest import N_PER_PAGE
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _next_link(content: str, param: str):
+    match = re.search(rf'href="\?{param}=([\w-]+)"', content)
+    return match.group(1) if match else None
+
+
+def test_cursor_pages_cover_feed(
+        client, many_posts_with_published_locations
+):
+    response = client.get("/")
+    first_page = list(response.context["page_obj"])
+    assert len(first_page) == N_PER_PAGE, (
+        "Убедитесь, что на первой странице ленты выводится "
+        f"{N_PER_PAGE} публикаций."
+    )
+    after = _next_link(response.content.decode("utf-8"), "after")
+    assert after, (
+        "Убедитесь, что пагинатор ленты содержит ссылку `?after=` "
+        "на следующую страницу."
+    )
+
+    response = client.get(f"/?after={after}")
+    second_page = list(response.context["page_obj"])
+    assert len(second_page) == N_PER_PAGE
+    assert not set(first_page) & set(second_page), (
+        "Убедитесь, что страницы ленты по курсору не пересекаются."
+    )
+    assert set(first_page) | set(second_page) == set(
+        many_posts_with_published_locations
+    )
+    content = response.content.decode("utf-8")
+    assert _next_link(content, "after") is None
+    before = _next_link(content, "before")
+    assert before, (
+        "Убедитесь, что пагинатор ленты содержит ссылку `?before=` "
+        "на предыдущую страницу."
+    )
+
+    response = client.get(f"/?before={before}")
+    assert list(response.context["page_obj"]) == first_page
+
+
+def test_cursor_page_skips_count_and_offset(
+        client, many_posts_with_published_locations
+):
+    after = _next_link(client.get("/").content.decode("utf-8"), "after")
+    with CaptureQueriesContext(connection) as ctx:
+        client.get(f"/?after={after}")
+    sql = " ".join(query["sql"] for query in ctx.captured_queries)
+    assert "COUNT(*)" not in sql, (
+        "Убедитесь, что при пагинации по курсору не выполняется `COUNT(*)`."
+    )
+    assert "OFFSET" not in sql, (
+        "Убедитесь, что при пагинации по курсору не используется `OFFSET`."
+    )
+
+
+def test_page_number_links_still_work(
+        client, many_posts_with_published_locations
+):
+    response = client.get("/?page=2")
+    page_obj = response.context["page_obj"]
+    assert page_obj.number == 2
+    assert len(page_obj) == N_PER_PAGE
+
+
+def test_invalid_cursor_falls_back_to_first_page(
+        client, many_posts_with_published_locations
+):
+    response = client.get("/?after=not-a-cursor")
+    assert response.status_code == 200
+    assert not response.context["page_obj"].has_previous()
+
+
+def test_cursor_with_huge_id_falls_back_to_first_page(
+        client, many_posts_with_published_locations
+):
+    import base64
+
+    post = many_posts_with_published_locations[0]
+    for pk in (2 ** 64, 0):
+        token = base64.urlsafe_b64encode(
+            f"{post.pub_date.isoformat()}|{pk}".encode()
+        ).decode().rstrip("=")
+        response = client.get("/", {"after": token})
+        assert response.status_code == 200, (
+            "Убедитесь, что курсор с недопустимым id не приводит к ошибке."
+        )
+        assert not response.context["page_obj"].has_previous()
+
+
+@pytest.mark.parametrize("reorder", (True, False))
+def test_cursor_bound_comes_first(
+        monkeypatch, reorder, many_posts_with_published_locations
+):
+    from blog import paginators
+    from blog.paginators import CursorPaginator, encode_cursor
+    from blog.views import get_base_post_queryset
+
+    monkeypatch.setattr(paginators, "REORDER_CONDITIONS", reorder)
+    feed = get_base_post_queryset()
+    posts = list(feed.order_by("-pub_date", "-id"))
+    with CaptureQueriesContext(connection) as ctx:
+        page = CursorPaginator(feed, N_PER_PAGE).get_page(
+            after=encode_cursor(posts[3])
+        )
+    assert list(page) == posts[4:4 + N_PER_PAGE]
+    if reorder:
+        where = ctx.captured_queries[0]["sql"].split(" WHERE ", 1)[1]
+        assert where.startswith('("blog_post"."pub_date" <= '), (
+            "Убедитесь, что условие курсора идёт в запросе первым: по"
+            " нему SQLite выбирает диапазон индекса."
+        )
+        assert where.index('"pub_date" <= ') < where.index("is_published")
@@ -0,0 +1,48 @@
+from http import HTTPStatus
+
+import pytest
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_post_detail_is_one_post_query(
+        client, another_user_client, post_with_published_location,
+        django_assert_num_queries
+):
+    from blog.caching import bump_versions, post_scope
+
+    url = f"/posts/{post_with_published_location.id}/"
+    # Warm up the publication window, which is cached between requests.
+    client.get(url)
+    bump_versions(post_scope(post_with_published_location.id))
+    # One query for the post with its visibility, one for the comments.
+    with django_assert_num_queries(2):
+        response = client.get(url)
+    assert response.status_code == HTTPStatus.OK
+    # The comment list now comes from the fragment cache.
+    with django_assert_num_queries(1):
+        assert client.get(url).status_code == HTTPStatus.OK
+
+
+def test_hidden_post_visible_only_to_author(
+        client, user_client, mixer, user, published_category
+):
+    hidden = mixer.blend(
+        "blog.Post", author=user, is_published=False,
+        category=published_category
+    )
+    url = f"/posts/{hidden.id}/"
+    assert client.get(url).status_code == HTTPStatus.NOT_FOUND, (
+        "Убедитесь, что снятый с публикации пост недоступен другим"
+        " пользователям."
+    )
+    assert user_client.get(url).status_code == HTTPStatus.OK, (
+        "Убедитесь, что автор видит свой снятый с публикации пост."
+    )
+
+
+def test_post_without_category_is_hidden(client, mixer, user):
+    post = mixer.blend("blog.Post", author=user, category=None)
+    assert client.get(f"/posts/{post.id}/").status_code == (
+        HTTPStatus.NOT_FOUND
+    )
@@ -0,0 +1,194 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.utils import timezone
+
+from conftest import N_PER_PAGE
+
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(
+        connection.vendor != "sqlite",
+        reason="Query plans are checked with SQLite `EXPLAIN QUERY PLAN`.",
+    ),
+]
+
+
+def assert_uses_index(queryset, description):
+    plan = queryset.explain()
+    full_scans = [
+        line for line in plan.splitlines()
+        if "SCAN blog_" in line and "USING" not in line
+    ]
+    assert not full_scans, (
+        f"Убедитесь, что запрос {description} не просматривает таблицу"
+        f" целиком. План запроса:\n{plan}"
+    )
+    assert "TEMP B-TREE" not in plan, (
+        f"Убедитесь, что запрос {description} не сортирует строки во"
+        f" временном B-дереве. План запроса:\n{plan}"
+    )
+
+
+def paginated(queryset):
+    from blog.paginators import CursorPaginator
+
+    paginator = CursorPaginator(queryset, N_PER_PAGE)
+    return paginator.object_list[:N_PER_PAGE + 1]
+
+
+def run_page(get_page):
+    """Return ``(sql, params)`` of the first query ``get_page()`` runs."""
+    queries = []
+
+    def capture(execute, sql, params, many, context):
+        queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(capture):
+        get_page()
+    return queries[0]
+
+
+def explain(sql, params):
+    # Parameters stay parameters: literals let SQLite pick the tighter
+    # of two bounds, which it cannot do for the real query.
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+        return "\n".join(row[-1] for row in cursor.fetchall())
+
+
+def assert_enters_index_at_cursor(get_page, table, bound, description):
+    plan = explain(*run_page(get_page))
+    searches = [
+        line for line in plan.splitlines()
+        if line.startswith(f"SEARCH {table} USING")
+    ]
+    assert searches and bound in searches[0], (
+        f"Убедитесь, что запрос {description} начинает чтение индекса с"
+        f" курсора ({bound}?). План запроса:\n{plan}"
+    )
+    assert "TEMP B-TREE" not in plan, (
+        f"Убедитесь, что запрос {description} не сортирует строки во"
+        f" временном B-дереве. План запроса:\n{plan}"
+    )
+
+
+def test_feed_query_plans(user, published_category):
+    from blog.views import get_base_post_queryset
+
+    feed = get_base_post_queryset()
+    assert_uses_index(paginated(feed), "главной страницы")
+    assert_uses_index(
+        paginated(feed.filter(category=published_category)),
+        "страницы категории",
+    )
+    assert_uses_index(
+        paginated(feed.filter(author=user)),
+        "страницы пользователя",
+    )
+    assert_uses_index(
+        paginated(user.posts.select_related(
+            "author", "location", "category"
+        )),
+        "страницы пользователя для её владельца",
+    )
+
+
+def test_cursor_query_plans(post_with_published_location):
+    from blog.paginators import CursorPaginator, encode_cursor
+    from blog.views import get_base_post_queryset
+
+    post = post_with_published_location
+    feed = get_base_post_queryset()
+    lists = {
+        "главной страницы": feed,
+        "страницы категории": feed.filter(category=post.category),
+        "страницы пользователя": feed.filter(author=post.author),
+        "страницы пользователя для её владельца": post.author.posts.all(),
+    }
+    cursor = encode_cursor(post)
+    for description, queryset in lists.items():
+        paginator = CursorPaginator(queryset, N_PER_PAGE)
+        assert_enters_index_at_cursor(
+            lambda: list(paginator.get_page(after=cursor)),
+            "blog_post", "pub_date<", f"следующей {description}",
+        )
+        assert_enters_index_at_cursor(
+            lambda: list(paginator.get_page(before=cursor)),
+            "blog_post", "pub_date>", f"предыдущей {description}",
+        )
+
+
+def test_comment_query_plan(mixer, post_with_published_location):
+    from blog.paginators import encode_cursor
+    from blog.views import get_comment_page
+
+    post = post_with_published_location
+    assert_uses_index(post.comments.all(), "комментариев к публикации")
+    comment = mixer.blend("blog.Comment", post=post)
+    assert_enters_index_at_cursor(
+        lambda: list(get_comment_page(
+            post, encode_cursor(comment, "created_at")
+        )),
+        "blog_comment", "created_at>", "следующих комментариев",
+    )
+
+
+def test_deep_pages_cost_as_much_as_shallow_ones(
+        user, published_category, published_location
+):
+    from blog.models import Post
+    from blog.paginators import CursorPaginator, encode_cursor
+    from blog.views import get_base_post_queryset
+
+    now = timezone.now()
+    Post.objects.bulk_create(
+        Post(
+            title=f"Публикация {i}", text="Текст", author=user,
+            category=published_category, location=published_location,
+            pub_date=now - timedelta(minutes=i),
+        )
+        for i in range(500)
+    )
+    feed = get_base_post_queryset()
+    posts = list(feed.order_by("-pub_date", "-id"))
+    steps = []
+    connection.connection.set_progress_handler(lambda: steps.append(1), 10)
+    try:
+        costs = []
+        for post in (posts[N_PER_PAGE], posts[-N_PER_PAGE - 1]):
+            steps.clear()
+            list(CursorPaginator(feed, N_PER_PAGE).get_page(
+                after=encode_cursor(post)
+            ))
+            costs.append(len(steps))
+    finally:
+        connection.connection.set_progress_handler(None, 10)
+    shallow, deep = costs
+    assert deep <= 2 * shallow, (
+        "Убедитесь, что глубокие страницы ленты читают индекс с курсора,"
+        " а не с самой новой публикации."
+    )
+
+
+def test_lookup_query_plans(user):
+    from blog.lookups import prefix_condition
+    from blog.models import Category, Location
+    from blog.views import LOOKUP_SOURCES
+
+    for model, field in ((Category, "title"), (Location, "name")):
+        assert_uses_index(
+            model.objects.filter(
+                prefix_condition(field, "Мо")
+            ).order_by(field, "pk")[:21],
+            f"поиска {model._meta.verbose_name_plural}",
+        )
+    get_posts, field = LOOKUP_SOURCES["posts"]
+    assert_uses_index(
+        get_posts(user).filter(
+            prefix_condition(field, "Мо")
+        ).order_by(field, "pk")[:21],
+        "поиска публикаций",
+    )
@@ -0,0 +1,61 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = [pytest.mark.django_db]
+
+TEXT = "<b>one</b> two three four five six seven eight nine ten eleven\nend"
+
+
+def test_rendered_text_is_stored_on_save(post_with_published_location):
+    post_with_published_location.text = TEXT
+    post_with_published_location.save()
+    post_with_published_location.refresh_from_db()
+    assert post_with_published_location.excerpt == (
+        "<b>one</b> two three four five six seven eight nine ten …"
+    )
+    assert post_with_published_location.text_html == (
+        "&lt;b&gt;one&lt;/b&gt; two three four five six seven eight nine"
+        " ten eleven<br>end"
+    ), "Убедитесь, что сохранённый HTML текста поста экранирован."
+
+
+def test_feed_does_not_load_post_text(client, post_with_published_location):
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get("/")
+    assert post_with_published_location.excerpt in response.content.decode()
+    post_queries = [
+        query["sql"] for query in ctx.captured_queries
+        if 'FROM "blog_post"' in query["sql"]
+    ]
+    assert post_queries
+    assert not any('"blog_post"."text"' in sql for sql in post_queries), (
+        "Убедитесь, что лента не загружает полный текст публикаций."
+    )
+
+
+def test_render_posts_backfills(post_with_published_location):
+    type(post_with_published_location).objects.update(
+        excerpt="", text_html=""
+    )
+    call_command("render_posts", "--missing", stdout=StringIO())
+    post_with_published_location.refresh_from_db()
+    assert post_with_published_location.text_html
+    assert post_with_published_location.excerpt
+
+
+def test_render_posts_invalidates_pages(client, post_with_published_location):
+    post = post_with_published_location
+    urls = ("/", f"/posts/{post.id}/", f"/category/{post.category.slug}/")
+    for url in urls:
+        client.get(url)
+    type(post).objects.filter(pk=post.pk).update(text="Новый текст")
+    call_command("render_posts", stdout=StringIO())
+    for url in urls:
+        assert "Новый текст" in client.get(url).content.decode(), (
+            "Убедитесь, что команда `render_posts` сбрасывает кеш страниц"
+            " с обновлёнными публикациями."
+        )
@@ -0,0 +1,73 @@
+from http import HTTPStatus
+
+import pytest
+from django.utils import timezone
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def searchable_posts(mixer, user, published_category, published_location):
+    def blend(title, text, **kwargs):
+        return mixer.blend(
+            "blog.Post", title=title, text=text, author=user,
+            category=published_category, location=published_location,
+            **kwargs
+        )
+
+    return {
+        "title": blend("Зимний лес", "Прогулка по снегу"),
+        "text": blend("Прогулка", "Зимний вечер у камина"),
+        "other": blend("Летний пляж", "Море и солнце"),
+        "hidden": blend("Зимний сад", "Черновик", is_published=False),
+        "deferred": blend(
+            "Зимний парк", "Отложено",
+            pub_date=timezone.now() + timezone.timedelta(days=1)
+        ),
+    }
+
+
+def _found_ids(client, query, **params):
+    response = client.get("/search/", {"q": query, **params})
+    assert response.status_code == HTTPStatus.OK
+    return [post.id for post in response.context["page_obj"]]
+
+
+def test_search_is_ranked_and_respects_visibility(client, searchable_posts):
+    assert _found_ids(client, "зимний") == [
+        searchable_posts["title"].id, searchable_posts["text"].id
+    ], (
+        "Убедитесь, что поиск находит только опубликованные посты и ставит"
+        " совпадения в заголовке выше совпадений в тексте."
+    )
+    assert _found_ids(client, "зимн") == _found_ids(client, "зимний")
+    assert _found_ids(client, 'лес" (') == [searchable_posts["title"].id]
+    assert _found_ids(client, "осень") == []
+
+
+def test_search_index_follows_changes(client, searchable_posts):
+    post = searchable_posts["other"]
+    post.text = "Осенний дождь"
+    post.save()
+    assert _found_ids(client, "осенний") == [post.id]
+    assert _found_ids(client, "солнце") == []
+    post.delete()
+    assert _found_ids(client, "осенний") == []
+
+
+def test_search_pages_keep_query(client, mixer, user, published_category):
+    mixer.cycle(15).blend(
+        "blog.Post", title="Закат", author=user, category=published_category
+    )
+    content = client.get("/search/", {"q": "закат"}).content.decode()
+    assert "?q=%D0%B7%D0%B0%D0%BA%D0%B0%D1%82&amp;page=2" in content
+    assert len(_found_ids(client, "закат", page=2)) == 5
+
+
+def test_admin_search_uses_index(admin_client, searchable_posts):
+    response = admin_client.get("/admin/blog/post/", {"q": "зимний"})
+    assert response.status_code == HTTPStatus.OK
+    assert {post.id for post in response.context["cl"].result_list} == {
+        searchable_posts[name].id
+        for name in ("title", "text", "hidden", "deferred")
+    }
@@ -0,0 +1,55 @@
+import json
+import logging
+import re
+
+import pytest
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _timings(response):
+    header = response["Server-Timing"]
+    return {
+        metric.split(";")[0].strip(): metric
+        for metric in header.split(",")
+    }
+
+
+def test_feed_timings(client, post_with_published_location):
+    timings = _timings(client.get("/"))
+    for phase in ("resolve", "view", "db", "template", "total"):
+        assert re.search(r";dur=\d+\.\d\d", timings.get(phase, "")), (
+            f"Убедитесь, что заголовок `Server-Timing` содержит фазу `{phase}`."
+        )
+    assert re.search(r'desc="\d+ queries"', timings["db"])
+
+
+def test_form_and_image_timings(
+        user_client, mixer, user, published_category
+):
+    assert "forms" in _timings(user_client.get("/posts/create/")), (
+        "Убедитесь, что время отрисовки форм учитывается отдельно."
+    )
+    mixer.blend(
+        "blog.Post", author=user, category=published_category,
+        image="post_image.jpg"
+    )
+    assert "images" in _timings(user_client.get("/"))
+
+
+def test_request_is_logged(client, caplog, post_with_published_location):
+    with caplog.at_level(logging.INFO, logger="blog.instrumentation"):
+        client.get("/", {"page": 1})
+    records = [
+        json.loads(record.getMessage()) for record in caplog.records
+        if record.name == "blog.instrumentation"
+    ]
+    assert len(records) == 1, (
+        "Убедитесь, что для каждого запроса пишется одна строка журнала."
+    )
+    record = records[0]
+    assert record["view"] == "blog:index"
+    assert record["status"] == 200
+    assert record["path"] == "/"
+    for key in ("total_ms", "db_ms", "template_ms", "serialize_ms"):
+        assert isinstance(record[key], float)
@@ -0,0 +1,64 @@
+from http import HTTPStatus
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_feed_reads_taxonomy_from_registry(
+        client, post_with_published_location
+):
+    post = post_with_published_location
+    url = f"/category/{post.category.slug}/"
+    client.get(url)
+    # Another page misses the page cache but finds the loaded registry.
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url, {"page": 1})
+    assert response.status_code == HTTPStatus.OK
+    assert any('FROM "blog_post"' in q["sql"] for q in ctx.captured_queries)
+    content = response.content.decode()
+    assert post.location.name in content
+    assert post.category.title in content
+    for query in ctx.captured_queries:
+        assert 'FROM "blog_category"' not in query["sql"]
+        assert '"blog_location"' not in query["sql"], (
+            "Убедитесь, что категории и места публикаций берутся из"
+            " реестра, а не из базы данных."
+        )
+
+
+def test_registry_follows_changes(client, post_with_published_location):
+    from blog.caching import bump_versions, TAXONOMY_SCOPE
+    from blog.models import Category
+
+    category = post_with_published_location.category
+    url = f"/category/{category.slug}/"
+    assert client.get(url).status_code == HTTPStatus.OK
+
+    category.title = "Новое название"
+    category.save()
+    assert "Новое название" in client.get(url).content.decode()
+
+    # Changes made by another worker arrive as a version bump.
+    Category.objects.filter(pk=category.pk).update(is_published=False)
+    bump_versions(TAXONOMY_SCOPE)
+    assert client.get(url).status_code == HTTPStatus.NOT_FOUND
+
+
+def test_registry_keeps_category_description(
+        client, post_with_published_location
+):
+    from blog.registry import taxonomy
+
+    category = post_with_published_location.category
+    taxonomy.get_published_category(category.slug)
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(f"/category/{category.slug}/")
+    assert category.description in response.content.decode()
+    for query in ctx.captured_queries:
+        assert 'FROM "blog_category"' not in query["sql"], (
+            "Убедитесь, что реестр загружает описание категории вместе с"
+            " остальными её полями."
+        )
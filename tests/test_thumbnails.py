@@ -0,0 +1,129 @@
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from PIL import Image
+from bs4 import BeautifulSoup
+from django.core.files.images import ImageFile
+
+
+def _image_file(width, height, name="thumbnail_source.jpg"):
+    image_io = BytesIO()
+    Image.new("RGB", (width, height), color=(73, 109, 137)).save(
+        image_io, format="JPEG"
+    )
+    return ImageFile(image_io, name=name)
+
+
+def test_make_variants_keeps_aspect_ratio(tmp_path):
+    from blog.thumbnails import make_variants
+
+    source = tmp_path / "picture.jpg"
+    Image.new("RGB", (1000, 500)).save(source)
+    variants = make_variants(source, (320, 640, 1280), 80)
+    assert [(v["width"], v["height"]) for v in variants] == [
+        (320, 160), (640, 320)
+    ], "Убедитесь, что уменьшенные копии не шире оригинала."
+    for variant in variants:
+        with Image.open(tmp_path / variant["name"]) as image:
+            assert image.size == (variant["width"], variant["height"])
+
+    small = tmp_path / "small.jpg"
+    Image.new("RGB", (100, 50)).save(small)
+    assert [(v["width"], v["height"]) for v in make_variants(
+        small, (320,), 80
+    )] == [(100, 50)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_variants_are_made_after_upload(
+        client, mixer, user, published_category
+):
+    from blog.thumbnails import wait_for_variants
+
+    post = mixer.blend(
+        "blog.Post", author=user, category=published_category,
+        image=_image_file(1500, 1000)
+    )
+    assert wait_for_variants(timeout=30), (
+        "Убедитесь, что уменьшенные копии изображения создаются в фоне."
+    )
+    post.refresh_from_db()
+    assert [v["width"] for v in post.image_variants] == [320, 640, 960, 1280]
+    media_root = Path(post.image.path).parent
+    for variant in post.image_variants:
+        assert (media_root / variant["name"]).exists()
+
+    img = BeautifulSoup(client.get("/").content, "html.parser").find("img", {
+        "srcset": True
+    })
+    assert img is not None, (
+        "Убедитесь, что в карточке поста изображение выводится с `srcset`."
+    )
+    assert img["loading"] == "lazy"
+    assert (img["width"], img["height"]) == ("640", "427")
+    assert "1280w" in img["srcset"]
+
+    variants = [media_root / v["name"] for v in post.image_variants]
+    post.image = None
+    post.save()
+    post.refresh_from_db()
+    assert post.image_variants == []
+    assert not any(path.exists() for path in variants), (
+        "Убедитесь, что уменьшенные копии заменённого изображения удаляются."
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_variants_are_deleted_with_post(mixer, user, published_category):
+    from blog.thumbnails import wait_for_variants
+
+    post = mixer.blend(
+        "blog.Post", author=user, category=published_category,
+        image=_image_file(800, 600)
+    )
+    assert wait_for_variants(timeout=30)
+    post.refresh_from_db()
+    media_root = Path(post.image.path).parent
+    variants = [media_root / v["name"] for v in post.image_variants]
+    assert variants and all(path.exists() for path in variants)
+    post.delete()
+    assert not any(path.exists() for path in variants), (
+        "Убедитесь, что уменьшенные копии удаляются вместе с постом."
+    )
+
+
+@pytest.mark.django_db
+def test_storage_without_paths_is_skipped(
+        monkeypatch, mixer, user, published_category,
+        django_capture_on_commit_callbacks
+):
+    from django.core.files.storage import FileSystemStorage
+
+    post = mixer.blend("blog.Post", author=user, category=published_category)
+    name = post.image.storage.save(
+        "thumbnail_source.jpg", _image_file(800, 600)
+    )
+
+    def path(self, name):
+        raise NotImplementedError
+
+    submitted = []
+    monkeypatch.setattr(FileSystemStorage, "path", path)
+    monkeypatch.setattr(
+        "blog.thumbnails._submit", lambda *args: submitted.append(args)
+    )
+    post.image = name
+    with django_capture_on_commit_callbacks(execute=True):
+        post.save()
+    monkeypatch.undo()
+    post.image.storage.delete(name)
+    post.refresh_from_db()
+    assert post.image.name == name, (
+        "Убедитесь, что пост сохраняется, даже если у хранилища нет "
+        "локальных путей."
+    )
+    assert not submitted, (
+        "Убедитесь, что уменьшенные копии не создаются, если у хранилища "
+        "нет локальных путей."
+    )
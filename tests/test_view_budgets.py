@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+import pytest
+from django.conf import settings
+from django.test import Client, override_settings
+from django.utils import timezone
+
+pytestmark = [pytest.mark.django_db]
+
+N_POSTS = 300
+N_COMMENTS = 200
+
+
+@pytest.fixture
+def seeded(mixer, user, published_category, published_location):
+    from blog.models import Comment, Post
+
+    commenters = mixer.cycle(5).blend("auth.User")
+    now = timezone.now()
+    Post.objects.bulk_create(
+        Post(
+            title=f"Публикация {i}", text="Текст публикации " * 50,
+            author=user, category=published_category,
+            location=published_location,
+            pub_date=now - timedelta(minutes=i),
+            comments_count=N_COMMENTS if i == 0 else 0,
+        )
+        for i in range(N_POSTS)
+    )
+    post = Post.objects.order_by("-pub_date").first()
+    Comment.objects.bulk_create(
+        Comment(
+            post=post, author=commenters[i % len(commenters)],
+            text=f"Комментарий {i}",
+        )
+        for i in range(N_COMMENTS)
+    )
+    return post
+
+
+def _urls(post):
+    return {
+        "blog:index": "/",
+        "blog:post_detail": f"/posts/{post.id}/",
+        "blog:category_posts": f"/category/{post.category.slug}/",
+        "blog:profile": f"/profile/{post.author.username}/",
+        "blog:post_comments": f"/posts/{post.id}/comments/",
+    }
+
+
+@pytest.mark.parametrize("signed_in", (False, True))
+def test_views_stay_within_budget(seeded, user, signed_in):
+    client = Client()
+    if signed_in:
+        client.force_login(user)
+    for view_name, url in _urls(seeded).items():
+        for params in ({}, {"page": 2}):
+            response = client.get(url, params)
+            assert response.status_code == 200
+            stats = response.wsgi_request.stats
+            assert stats.view_name == view_name
+            exceeded = stats.over_budget(settings.VIEW_BUDGETS[view_name])
+            assert not exceeded, (
+                f"Убедитесь, что `{view_name}` укладывается в бюджет:"
+                f" {', '.join(exceeded)}."
+            )
+
+
+def test_exceeded_budget_is_logged(client, seeded, caplog):
+    with override_settings(VIEW_BUDGETS={"blog:index": {"queries": 0}}):
+        client.get("/")
+    assert "is over budget: queries" in caplog.text